@@ -6,6 +6,7 @@ from urllib.parse import urlencode, parse_qsl
 from django.urls import resolve, Resolver404
 from django.utils import translation
 from goods.models import Products
+from common.lookup_cache import lookup_stats
 
 
 class ProductURLRedirectMiddleware:
@@ -156,3 +157,26 @@ class LanguagePrefixMiddleware:
             pass
 
         return response
+
+
+class MediaLookupStatsMiddleware:
+    """
+    DEBUG only: report the media/static lookup memo (common.lookup_cache) per response as
+    `Server-Timing: media-lookups;desc="media 12/3"` (hits/misses during this
+    request, approximate under the threaded dev server), visible in the browser's network panel.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        before = lookup_stats()
+        response = self.get_response(request)
+        parts = [
+            f"{after['name']} {after['hits'] - prev['hits']}/{after['misses'] - prev['misses']}"
+            for prev, after in zip(before, lookup_stats())
+        ]
+        response["Server-Timing"] = ", ".join(
+            filter(None, [response.get("Server-Timing"), f'media-lookups;desc="{" ".join(parts)}"'])
+        )
+        return response
@@ -89,6 +89,8 @@ MIDDLEWARE = [
 
 if DEBUG:
     MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+    # Server-Timing header with per-request hits/misses of the media_extras lookup memo
+    MIDDLEWARE.append('app.middleware.MediaLookupStatsMiddleware')
 
 ROOT_URLCONF = 'app.urls'
 
@@ -128,7 +130,22 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
         "LOCATION": BASE_DIR / "cache",
-    }
+    },
+    # Adaptive AVIF/WebP quality per image content hash (common.image_utils.adaptive_quality);
+    # one small entry per output, kept apart so page-cache culling does not trigger re-searches
+    "image_quality": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "image_quality",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 200000},
+    },
+    # Rendered <picture> fragments of media_extras (IMAGE_FRAGMENT_CACHE); per process, so a tag render
+    # costs no filesystem work, and apart from "default" so its culling never drops other keys
+    "image_fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "image-fragments",
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
 }
 
 # Password validation
@@ -188,6 +205,37 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Image variants (AVIF/WebP) are generated by `manage.py run_image_worker` from a DB queue.
+# Set IMAGE_JOBS_EAGER=True to run them inline on save instead (local dev without a worker).
+IMAGE_JOBS_EAGER = os.environ.get('IMAGE_JOBS_EAGER', 'False').lower() in ('1', 'true', 'yes', 'on')
+# Originals (and their no-resize AVIF/WebP) are downscaled to this long side on ingest; 0 keeps full size.
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '2560'))
+# Hard limit of pixels a worker decodes at once (JPEG is decoded reduced first); larger uploads fail the job.
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', '24000000'))
+
+# /media/v/<root>_<WxH>.<avif|webp> generates a missing variant of a registered size (common.image_specs).
+# With IMAGE_VARIANTS_ON_DEMAND=True the <picture> tags link sizes that were not generated yet to it.
+IMAGE_VARIANTS_ON_DEMAND = os.environ.get('IMAGE_VARIANTS_ON_DEMAND', 'False').lower() in ('1', 'true', 'yes', 'on')
+# nginx `internal` location aliased to MEDIA_ROOT (e.g. /media-internal/); empty -> Django streams the file
+IMAGE_VARIANTS_ACCEL_PREFIX = os.environ.get('IMAGE_VARIANTS_ACCEL_PREFIX', '')
+# Card/thumbnail/icon tags emit one <img src="/media/n/..."> instead of a <picture> with AVIF/WebP
+# <source>s; the view picks the format from the Accept header (responses carry Vary: Accept)
+IMAGE_NEGOTIATED_SRC = os.environ.get('IMAGE_NEGOTIATED_SRC', 'False').lower() in ('1', 'true', 'yes', 'on')
+
+# Per-process memo of storage existence checks made by media_extras (common.lookup_cache):
+# entries, and seconds before a file written by another process (image worker, generate_* commands) shows up
+MEDIA_LOOKUP_CACHE_SIZE = int(os.environ.get('MEDIA_LOOKUP_CACHE_SIZE', '4096'))
+MEDIA_LOOKUP_CACHE_TTL = int(os.environ.get('MEDIA_LOOKUP_CACHE_TTL', '300'))
+
+# <picture> html of the card/responsive/category-icon tags is kept in this cache alias under a key
+# that includes the image revision (ImageAsset.updated_at), so re-encoded images get new entries;
+# seconds to keep a fragment, 0 disables
+IMAGE_FRAGMENT_CACHE = os.environ.get('IMAGE_FRAGMENT_CACHE', 'image_fragments')
+IMAGE_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('IMAGE_FRAGMENT_CACHE_TIMEOUT', str(24 * 3600)))
+
+# Largest image accepted by the article editor upload (articles/upload/), in bytes
+ARTICLE_IMAGE_MAX_BYTES = int(os.environ.get('ARTICLE_IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+
 INTERNAL_IPS = [
     # ...
     "127.0.0.1",
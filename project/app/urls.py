@@ -23,7 +23,7 @@ from .sitemaps import sitemaps
 from .views import robots_txt
 
 from django.conf import settings
-from goods.views import ProductView
+from goods.views import ProductView, media_negotiated, media_variant
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -47,6 +47,11 @@ urlpatterns = [
     path('robots.txt', robots_txt, name='robots'),
     
     path('tinymce/', include('tinymce.urls')),
+
+    # On-demand and negotiated image variants; MUST be before the DEBUG media pattern below
+    path('media/v/<path:name>', media_variant, name='media_variant'),
+    # AVIF/WebP/original chosen from the Accept header (IMAGE_NEGOTIATED_SRC)
+    path('media/n/<str:size>/<path:name>', media_negotiated, name='media_negotiated'),
 ]
 
 if settings.DEBUG:
@@ -5,3 +5,7 @@ class ArticlesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'articles'
     verbose_name = 'Статьи'
+
+    def ready(self):
+        # Import signals to ensure post_save handlers are registered
+        from . import signals  # noqa: F401
@@ -0,0 +1,153 @@
+"""
+Article body HTML as it is rendered.
+
+TinyMCE stores plain <img> tags pointing at the uploaded originals. render_body()
+wraps every media image in a <picture> with the AVIF/WebP siblings the
+article_image job writes (goods.image_jobs), adds intrinsic width/height and
+lazy loading, and caches the result per article revision, so the HTML is
+parsed once per edit instead of once per request.
+"""
+from __future__ import annotations
+
+import posixpath
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils import translation
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+from PIL import Image
+
+from goods.image_jobs import ARTICLE_IMAGE_EXTENSIONS
+from goods.manifest import load_assets
+
+# A revision's HTML never changes, so it is kept for a long time; a body whose
+# uploads are still queued for the image worker is re-rendered shortly instead
+BODY_CACHE_TIMEOUT = 7 * 24 * 3600
+PENDING_CACHE_TIMEOUT = 60
+
+# <source> order: the first type the browser supports wins
+SOURCE_FORMATS = ('avif', 'webp')
+
+
+class _ImgFinder(HTMLParser):
+    """Collects (line, column, start tag text, attrs) of every <img> not already inside a <picture>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found: list[tuple[int, int, str, list]] = []
+        self._picture_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'picture':
+            self._picture_depth += 1
+        elif tag == 'img' and not self._picture_depth:
+            line, col = self.getpos()
+            self.found.append((line, col, self.get_starttag_text(), attrs))
+
+    def handle_endtag(self, tag):
+        if tag == 'picture' and self._picture_depth:
+            self._picture_depth -= 1
+
+
+def _media_name(src: str) -> Optional[str]:
+    """Storage name behind a MEDIA_URL src; TinyMCE may have made it relative ('../../media/...')."""
+    parts = urlsplit(src or '')
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    media_prefix = urlsplit(settings.MEDIA_URL).path
+    path = posixpath.normpath('/' + unquote(parts.path).lstrip('./'))
+    if not path.startswith(media_prefix):
+        return None
+    return path[len(media_prefix):] or None
+
+
+def _dimensions(name: str, asset) -> Optional[tuple[int, int]]:
+    if asset is not None and asset.width and asset.height:
+        return asset.width, asset.height
+    try:
+        # Header only, no decode
+        with Image.open(default_storage.path(name)) as im:  # type: ignore[attr-defined]
+            return im.size
+    except Exception:
+        return None
+
+
+def _render_img(attrs: dict) -> str:
+    return '<img' + ''.join(
+        f' {key}' if value is None else f' {key}="{escape(value)}"' for key, value in attrs.items()
+    ) + '>'
+
+
+def rewrite_images(html: str, eager_first: bool = False) -> tuple[str, bool]:
+    """Return (`html` with its media <img> tags wrapped in <picture>, complete).
+
+    Every image gets loading="lazy" except the first one when `eager_first`
+    (nothing above it in the page). `complete` is False while a JPEG/PNG upload
+    has no AVIF/WebP siblings yet, i.e. its image job has not run.
+    """
+    if '<img' not in html:
+        return html, True
+    finder = _ImgFinder()
+    finder.feed(html)
+    finder.close()
+    if not finder.found:
+        return html, True
+
+    line_starts = [0]
+    line_starts.extend(i + 1 for i, ch in enumerate(html) if ch == '\n')
+    tags = []
+    for line, col, text, attrs in finder.found:
+        offset = line_starts[line - 1] + col
+        if html.startswith(text, offset):
+            tags.append((offset, text, dict(attrs)))
+
+    names = {tag[2].get('src'): _media_name(tag[2].get('src') or '') for tag in tags}
+    assets = load_assets(n for n in names.values() if n)
+
+    out, pos, complete = [], 0, True
+    for index, (offset, text, attrs) in enumerate(tags):
+        out.append(html[pos:offset])
+        pos = offset + len(text)
+
+        name = names.get(attrs.get('src'))
+        asset = assets.get(name) if name else None
+        variants = {(v.size, v.format): v for v in asset.variants.all()} if asset is not None else {}
+        if name and 'width' not in attrs and 'height' not in attrs:
+            dims = _dimensions(name, asset)
+            if dims:
+                attrs['width'], attrs['height'] = str(dims[0]), str(dims[1])
+        if index or not eager_first:
+            attrs.setdefault('loading', 'lazy')
+        attrs.setdefault('decoding', 'async')
+
+        sources = [
+            f'<source srcset="{escape(default_storage.url(v.name))}" type="image/{fmt}">'
+            for fmt in SOURCE_FORMATS
+            if (v := variants.get(('', fmt)))
+        ]
+        if name and not sources and name.lower().endswith(ARTICLE_IMAGE_EXTENSIONS):
+            complete = False
+        if sources:
+            out.append('<picture>' + ''.join(sources) + _render_img(attrs) + '</picture>')
+        else:
+            out.append(_render_img(attrs))
+    out.append(html[pos:])
+    return ''.join(out), complete
+
+
+def render_body(article, lang: str | None = None) -> SafeString:
+    """Article.body() with responsive images, cached per (article, language, updated_at)."""
+    lang = 'ru' if (lang or translation.get_language() or 'uk')[:2] == 'ru' else 'uk'
+    revision = article.updated_at.timestamp() if article.updated_at else 0
+    key = f'article-body:{article.pk}:{lang}:{revision:.6f}'
+    html = cache.get(key)
+    if html is None:
+        # The cover is rendered above the body, so then every body image is below the fold
+        html, complete = rewrite_images(article.body(lang), eager_first=not article.cover_image)
+        cache.set(key, html, BODY_CACHE_TIMEOUT if complete else PENDING_CACHE_TIMEOUT)
+    return mark_safe(html)
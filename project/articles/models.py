@@ -4,6 +4,8 @@ from django.urls import reverse
 from tinymce.models import HTMLField
 from django.utils import timezone, translation
 
+from common.mixins import FieldTrackerMixin
+
 
 class ArticleCategory(models.Model):
     name_uk = models.CharField("Назва (укр)", max_length=200)
@@ -42,7 +44,7 @@ class ArticleQuerySet(models.QuerySet):
         return self.filter(status=Article.Status.PUBLISHED, published_at__lte=now)
 
 
-class Article(models.Model):
+class Article(FieldTrackerMixin, models.Model):
     class Status(models.TextChoices):
         DRAFT = 'draft', 'Draft'
         PUBLISHED = 'published', 'Published'
@@ -77,6 +79,8 @@ class Article(models.Model):
     meta_description_ru = models.CharField(max_length=300, blank=True, default="")
 
     objects = ArticleQuerySet.as_manager()
+    # Image signals enqueue work only when the cover changes
+    tracked_fields = ('cover_image',)
 
     class Meta:
         verbose_name = "Статья"
@@ -105,6 +109,10 @@ class Article(models.Model):
         return self._pick('excerpt', lang)
     def body(self, lang: str | None = None) -> str:
         return self._pick('body', lang)
+    def body_html(self, lang: str | None = None):
+        """Body with <img> tags turned into AVIF/WebP <picture>s (cached per revision)."""
+        from .body_html import render_body
+        return render_body(self, lang)
     def meta_title(self, lang: str | None = None) -> str:
         return self._pick('meta_title', lang)
     def meta_description(self, lang: str | None = None) -> str:
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from goods.image_jobs import enqueue
+from .models import Article
+
+
+@receiver(post_save, sender=Article)
+def articles_generate_cover_variants(sender, instance: Article, created=False, **kwargs):
+    """On article save, queue AVIF/WebP generation for a new or replaced cover.
+    Editing the text costs no image work."""
+    if created or instance.has_changed("cover_image"):
+        enqueue(instance.cover_image.name if instance.cover_image else "", "article_cover")
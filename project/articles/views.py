@@ -7,11 +7,13 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.urls import reverse
+from PIL import Image
 import os
 import uuid
 
+from common.image_utils import ImageTooLarge, check_pixel_budget, draft_for_scale, side_cap_scale
+from goods.image_jobs import ARTICLE_IMAGE_EXTENSIONS, enqueue
 from .models import Article, ArticleCategory
 
 
@@ -60,20 +62,47 @@ class ArticleByCategoryView(ListView):
 @login_required
 @csrf_exempt
 def tinymce_image_upload(request):
+    max_bytes = settings.ARTICLE_IMAGE_MAX_BYTES
+    too_large = JsonResponse({'error': f'File is larger than {max_bytes / (1024 * 1024):.1f} MB'}, status=413)
+    # Refuse oversized bodies before Django reads them
+    try:
+        if int(request.META.get('CONTENT_LENGTH') or 0) > max_bytes + 64 * 1024:
+            return too_large
+    except ValueError:
+        pass
+
     # Expect field name 'file' from TinyMCE
     f = request.FILES.get('file')
     if not f:
         return HttpResponseBadRequest('No file uploaded')
+    if f.size > max_bytes:
+        return too_large
 
     # Basic allowlist
     name = f.name.lower()
     if not (name.endswith('.jpg') or name.endswith('.jpeg') or name.endswith('.png') or name.endswith('.webp') or name.endswith('.gif') or name.endswith('.avif')):
         return HttpResponseBadRequest('Unsupported file type')
 
-    # Path: media/articles/content/<uuid>_<orig>
+    # Header only: reject non-images and images the worker could not decode within its budget
+    try:
+        with Image.open(f) as probe:
+            draft_for_scale(probe, side_cap_scale(probe.size))
+            check_pixel_budget(probe)
+    except ImageTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except Exception:
+        return HttpResponseBadRequest('Not an image')
+    f.seek(0)
+
+    # Path: media/articles/content/<uuid>_<orig>; the upload is copied in chunks, never read whole
     filename = f"{uuid.uuid4().hex}_{os.path.basename(name)}"
     rel_path = os.path.join('articles', 'content', filename)
-    saved_path = default_storage.save(rel_path, ContentFile(f.read()))
+    saved_path = default_storage.save(rel_path, f)
+
+    # The image worker (article_image job) downscales the file in place and writes
+    # its AVIF/WebP siblings, so this URL already points at the optimized original
+    if name.endswith(ARTICLE_IMAGE_EXTENSIONS):
+        enqueue(saved_path, 'article_image')
 
     url = settings.MEDIA_URL + saved_path.replace('\\', '/')
 
@@ -0,0 +1,86 @@
+"""
+Objective quality metrics: the adaptive-quality encoder search (common.image_utils)
+and `manage.py benchmark_images --suite encoders`.
+
+PSNR needs only Pillow. SSIM needs numpy; without it ssim() returns None,
+reports carry PSNR only and encoders fall back to fixed qualities.
+"""
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+from PIL import Image, ImageChops, ImageStat
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# PSNR of identical images is infinite; cap it so reports stay valid JSON
+PSNR_MAX = 100.0
+
+# SSIM constants (Wang et al. 2004) with a 7x7 uniform window, as scikit-image uses by default
+SSIM_WINDOW = 7
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def flatten(img: Image.Image, background=(255, 255, 255)) -> Image.Image:
+    """RGB view of `img`; transparent areas are composited over `background`."""
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        out = Image.new("RGB", rgba.size, background)
+        out.paste(rgba, mask=rgba.getchannel("A"))
+        return out
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+
+def _pair(reference: Image.Image, candidate: Image.Image) -> tuple[Image.Image, Image.Image]:
+    if reference.size != candidate.size:
+        raise ValueError(f"Size mismatch: {reference.size} vs {candidate.size}")
+    return flatten(reference), flatten(candidate)
+
+
+def psnr(reference: Image.Image, candidate: Image.Image) -> float:
+    """Peak signal-to-noise ratio in dB over RGB (higher is better)."""
+    ref, cand = _pair(reference, candidate)
+    stat = ImageStat.Stat(ImageChops.difference(ref, cand))
+    mse = sum(s / stat.count[0] for s in stat.sum2) / len(stat.sum2)
+    if mse == 0:
+        return PSNR_MAX
+    return min(PSNR_MAX, round(10 * math.log10(255 ** 2 / mse), 2))
+
+
+def _box_mean(a, k: int):
+    """Mean over every k x k window (valid positions only), via a summed-area table."""
+    s = np.pad(a, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    return (s[k:, k:] - s[:-k, k:] - s[k:, :-k] + s[:-k, :-k]) / (k * k)
+
+
+def _luma(img: Image.Image, max_side: Optional[int]):
+    luma = img.convert("L")
+    if max_side and max(luma.size) > max_side:
+        scale = max_side / max(luma.size)
+        luma = luma.resize((max(1, round(luma.width * scale)), max(1, round(luma.height * scale))), Image.BOX)
+    return np.asarray(luma, dtype=np.float64)
+
+
+def ssim(reference: Image.Image, candidate: Image.Image, max_side: Optional[int] = None) -> Optional[float]:
+    """Mean structural similarity of the luma planes (1.0 = identical); None without numpy.
+
+    With `max_side` both planes are box-downscaled to it first (much cheaper on
+    large images, slightly more forgiving to fine-grain artifacts).
+    """
+    if not NUMPY_AVAILABLE:
+        return None
+    ref, cand = _pair(reference, candidate)
+    x, y = _luma(ref, max_side), _luma(cand, max_side)
+    k = min(SSIM_WINDOW, *x.shape)
+    mu_x, mu_y = _box_mean(x, k), _box_mean(y, k)
+    var_x = _box_mean(x * x, k) - mu_x ** 2
+    var_y = _box_mean(y * y, k) - mu_y ** 2
+    cov = _box_mean(x * y, k) - mu_x * mu_y
+    score = ((2 * mu_x * mu_y + _C1) * (2 * cov + _C2)) / ((mu_x ** 2 + mu_y ** 2 + _C1) * (var_x + var_y + _C2))
+    return round(float(score.mean()), 5)
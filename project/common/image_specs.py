@@ -0,0 +1,152 @@
+"""
+Registry of generated image variants, per model field.
+
+Keys are '<app_label>.<Model>.<field>'. The same entries drive the image jobs
+(what gets generated), the media_extras tags (which sizes a <picture> may ask
+for) and check_media_variants (what should exist), so the three cannot drift.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from common.image_utils import VariantSpec
+
+# Quality presets (AVIF, WebP)
+Q_ICON = (70, 82)
+Q_CARD = (60, 82)
+Q_PHOTO = (None, 80)  # None -> save_avif_optimized() product preset
+Q_PRESENTATION = (70, 82)
+
+# Product photos: quality is searched per image for this SSIM (common.image_utils.adaptive_quality);
+# the presets above apply only when numpy is not installed
+TARGET_SSIM_PHOTO = 0.95
+
+
+def _sized(sizes, fit: str, quality, image_type: str = "product",
+           target_ssim: Optional[float] = None) -> list[VariantSpec]:
+    q_avif, q_webp = quality
+    return [
+        VariantSpec(size=size, fit=fit, quality_avif=q_avif, quality_webp=q_webp, image_type=image_type,
+                    target_ssim=target_ssim)
+        for size in sizes
+    ]
+
+
+# Card canvases (product_card_picture): desktop >=768px, then mobile/default
+CARD_SIZES = ((230, 160), (200, 160))
+
+# responsive_*_picture breakpoints, widest first; the last one has no media query
+RESPONSIVE_BREAKPOINTS = (
+    ("(min-width: 1200px)", (1200, 900)),
+    ("(min-width: 992px)", (1024, 768)),
+    ("(min-width: 768px)", (800, 600)),
+    ("", (640, 480)),
+)
+RESPONSIVE_SIZES = tuple(size for _media, size in RESPONSIVE_BREAKPOINTS)
+
+# product_image_picture / field_image_picture: product page thumbs, related products, order summary
+THUMB_SIZES = ((256, 192), (400, 300), (128, 128))
+
+# category_icon_picture: catalog sidebar, home grid; 800x450 presentation block
+CATEGORY_ICON_SIZES = ((128, 128), (256, 256))
+PRESENTATION_SIZE = (800, 450)
+
+# components/reviews.html grid: screenshots of any aspect ratio on a uniform 3:4 card
+# (up to ~260 CSS px wide, so 2x); the lightbox opens the capped original canvas
+REVIEW_CARD_SIZE = (480, 640)
+
+# users/profile.html avatar: 150 CSS px circle, 2x
+AVATAR_SIZE = (300, 300)
+
+ORIGINAL_PRODUCT = VariantSpec(image_type="product", target_ssim=TARGET_SSIM_PHOTO)
+ORIGINAL_BACKGROUND = VariantSpec(image_type="background")
+
+IMAGE_SPECS: dict[str, list[VariantSpec]] = {
+    "goods.Products.image": [
+        ORIGINAL_PRODUCT,
+        # product_card_picture falls back to the main image when there is no card_image
+        *_sized(CARD_SIZES, "cover", Q_CARD, target_ssim=TARGET_SSIM_PHOTO),
+        *_sized(RESPONSIVE_SIZES, "contain", Q_PHOTO, target_ssim=TARGET_SSIM_PHOTO),
+        *_sized(THUMB_SIZES, "contain", Q_ICON),
+    ],
+    "goods.Products.card_image": [
+        *_sized(CARD_SIZES, "cover", Q_CARD, target_ssim=TARGET_SSIM_PHOTO),
+    ],
+    "goods.ProductImage.image": [
+        ORIGINAL_PRODUCT,
+        *_sized(RESPONSIVE_SIZES, "contain", Q_PHOTO, target_ssim=TARGET_SSIM_PHOTO),
+        *_sized(THUMB_SIZES, "contain", Q_ICON),
+    ],
+    "goods.Categories.image": [
+        *_sized(CATEGORY_ICON_SIZES, "contain", Q_ICON),
+        # Presentation block falls back to the icon when there is no seo_image
+        *_sized([PRESENTATION_SIZE], "cover", Q_PRESENTATION),
+    ],
+    "goods.Categories.seo_image": [
+        ORIGINAL_BACKGROUND,
+        *_sized([PRESENTATION_SIZE], "cover", Q_PRESENTATION),
+    ],
+    # Images uploaded from the editor into body_uk/body_ru (articles/content/); arbitrary
+    # aspect ratios, so only the (capped) original canvas
+    "articles.Article.body": [
+        ORIGINAL_PRODUCT,
+    ],
+    # Article page cover: shown at up to 66% of the content column, so the (capped) original canvas
+    "articles.Article.cover_image": [
+        ORIGINAL_PRODUCT,
+    ],
+    "reviews.Review.image": [
+        ORIGINAL_PRODUCT,
+        *_sized([REVIEW_CARD_SIZE], "blur", Q_CARD),
+    ],
+    "users.User.image": [
+        *_sized([AVATAR_SIZE], "cover", Q_CARD),
+    ],
+}
+
+
+def field_key(image_field) -> Optional[str]:
+    """Registry key of a bound FieldFile (e.g. product.image), or None."""
+    field = getattr(image_field, "field", None)
+    model = getattr(field, "model", None)
+    if field is None or model is None:
+        return None
+    return f"{model._meta.label}.{field.name}"
+
+
+def specs_for(key: Optional[str]) -> list[VariantSpec]:
+    return list(IMAGE_SPECS.get(key or "", []))
+
+
+def sizes_for(key: Optional[str]) -> list[str]:
+    """Registered size names ('WxH') of a field, without the no-resize output."""
+    return [spec.size_name for spec in specs_for(key) if spec.size]
+
+
+def is_registered(image_field, size: str) -> bool:
+    return size in sizes_for(field_key(image_field))
+
+
+def _index_by_size(registry: dict[str, list[VariantSpec]]) -> dict[str, VariantSpec]:
+    """{'WxH': spec} over all fields. The on-demand endpoint renders a variant from its
+    size alone, so fields that register the same size must register the same spec."""
+    index: dict[str, tuple[str, VariantSpec]] = {}
+    for key, specs in registry.items():
+        for spec in specs:
+            if not spec.size:
+                continue
+            seen = index.setdefault(spec.size_name, (key, spec))
+            if seen[1] != spec:
+                raise ValueError(
+                    f"image_specs: {key} registers {spec.size_name} as {spec!r}, "
+                    f"but {seen[0]} registers it as {seen[1]!r}"
+                )
+    return {size: spec for size, (_key, spec) in index.items()}
+
+
+_SPECS_BY_SIZE = _index_by_size(IMAGE_SPECS)
+
+
+def spec_for_size(size: str) -> Optional[VariantSpec]:
+    """Registered spec with this size name (identical for every field that uses it)."""
+    return _SPECS_BY_SIZE.get(size)
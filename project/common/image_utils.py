@@ -1,8 +1,19 @@
+import base64
+import hashlib
+import math
 import os
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Tuple, Literal
+from typing import Iterable, Optional, Tuple, Literal
 
-from PIL import Image, ImageFilter
+from django.conf import settings
+from django.core.cache import caches
+from PIL import Image, ImageFilter, ImageOps
+
+from common.image_metrics import NUMPY_AVAILABLE, ssim
+
+if NUMPY_AVAILABLE:
+    import numpy as np
 
 try:
     import pillow_avif  # noqa: F401  # registers AVIF
@@ -11,6 +22,51 @@ except Exception:
     AVIF_AVAILABLE = False
 
 
+# Decode limits (overridable in settings): long side of stored originals and no-resize
+# outputs, and the most pixels one worker may decode at once (~4 bytes each as RGBA)
+DEFAULT_MAX_SIDE = 2560
+DEFAULT_MAX_PIXELS = 24_000_000
+
+
+class ImageTooLarge(ValueError):
+    """The source cannot be decoded within IMAGE_MAX_PIXELS."""
+
+
+def max_side() -> int:
+    """IMAGE_MAX_SIDE; 0 disables the cap."""
+    return int(getattr(settings, "IMAGE_MAX_SIDE", DEFAULT_MAX_SIDE) or 0)
+
+
+def max_pixels() -> int:
+    """IMAGE_MAX_PIXELS; 0 disables the budget."""
+    return int(getattr(settings, "IMAGE_MAX_PIXELS", DEFAULT_MAX_PIXELS) or 0)
+
+
+def side_cap_scale(size: Tuple[int, int]) -> float:
+    """Scale that brings `size` within IMAGE_MAX_SIDE (1.0 when it already fits)."""
+    cap = max_side()
+    longest = max(size) if size else 0
+    return min(1.0, cap / longest) if cap and longest else 1.0
+
+
+def check_pixel_budget(img: Image.Image) -> None:
+    """Raise ImageTooLarge if decoding `img` at its current (possibly drafted) size exceeds the budget."""
+    budget = max_pixels()
+    if budget and img.width * img.height > budget:
+        raise ImageTooLarge(
+            f"{img.width}x{img.height} ({img.width * img.height / 1e6:.1f} MP) exceeds "
+            f"IMAGE_MAX_PIXELS={budget / 1e6:.1f} MP"
+        )
+
+
+def draft_for_scale(img: Image.Image, scale: float, gap: float = 1.0) -> None:
+    """Let the JPEG decoder downscale (1/2..1/8) to at least `scale` * `gap` of the source. No-op otherwise."""
+    if scale >= 1.0 or img.format != "JPEG":
+        return
+    want = (max(1, math.ceil(img.width * scale * gap)), max(1, math.ceil(img.height * scale * gap)))
+    img.draft(img.mode if img.mode in ("RGB", "L") else None, want)
+
+
 def ensure_dir(path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
@@ -21,8 +77,13 @@ def _open_image(path: str) -> Image.Image:
     return img
 
 
-def _fit_box(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
-    # cover-like resize with center crop to exact size
+def _as_rgba(img: Image.Image) -> Image.Image:
+    # convert() always copies; skip it when the pipeline already handed us RGBA
+    return img if img.mode == "RGBA" else img.convert("RGBA")
+
+
+def _fit_box(img: Image.Image, size: Tuple[int, int], focus: Optional[Tuple[float, float]] = None) -> Image.Image:
+    # cover-like resize with crop to exact size: centered, or around `focus` (x, y in 0..1, see focal_point())
     target_w, target_h = size
     src_w, src_h = img.size
     src_ratio = src_w / src_h if src_h else 1
@@ -37,10 +98,15 @@ def _fit_box(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
         new_w = target_w
         new_h = int(round(new_w / src_ratio))
 
-    resized = img.convert("RGBA").resize((new_w, new_h), Image.LANCZOS)
-    # crop center
-    left = (new_w - target_w) // 2
-    top = (new_h - target_h) // 2
+    resized = _as_rgba(img).resize((new_w, new_h), Image.LANCZOS)
+    if focus is None:
+        # crop center
+        left = (new_w - target_w) // 2
+        top = (new_h - target_h) // 2
+    else:
+        # crop window centered on the focal point, kept inside the image
+        left = min(max(int(round(focus[0] * new_w - target_w / 2)), 0), new_w - target_w)
+        top = min(max(int(round(focus[1] * new_h - target_h / 2)), 0), new_h - target_h)
     box = (left, top, left + target_w, top + target_h)
     return resized.crop(box)
 
@@ -59,7 +125,7 @@ def _fit_box_contain(img: Image.Image, size: Tuple[int, int], background=(0, 0,
     new_h = max(1, int(round(src_h * scale)))
 
     base = Image.new("RGBA", (target_w, target_h), background)
-    resized = img.convert("RGBA").resize((new_w, new_h), Image.LANCZOS)
+    resized = _as_rgba(img).resize((new_w, new_h), Image.LANCZOS)
 
     left = (target_w - new_w) // 2
     top = (target_h - new_h) // 2
@@ -67,7 +133,76 @@ def _fit_box_contain(img: Image.Image, size: Tuple[int, int], background=(0, 0,
     return base
 
 
-def save_webp(img: Image.Image, out_path: str, quality: int = 80) -> None:
+# Adaptive quality: search range per format, step between tried qualities and the
+# resolution SSIM is measured at. Results are cached by pixel content hash.
+QUALITY_RANGES = {"avif": (30, 80), "webp": (50, 92)}
+QUALITY_STEP = 2
+QUALITY_SSIM_MAX_SIDE = 1024
+QUALITY_CACHE = "image_quality"
+
+
+def _encode_bytes(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = BytesIO()
+    if fmt == "webp":
+        img.save(buf, format="WEBP", quality=quality, method=6)
+    else:
+        img.save(buf, format="AVIF", quality=quality)
+    return buf.getvalue()
+
+
+def _quality_cache():
+    return caches[QUALITY_CACHE] if QUALITY_CACHE in settings.CACHES else caches["default"]
+
+
+def adaptive_quality(img: Image.Image, fmt: str, target_ssim: float) -> Tuple[int, Optional[bytes]]:
+    """Smallest quality whose `fmt` encoding of `img` keeps SSIM >= `target_ssim`.
+
+    Binary search over QUALITY_RANGES[fmt] in QUALITY_STEP steps (~5 encodes); SSIM
+    is measured on the luma plane downscaled to QUALITY_SSIM_MAX_SIDE. When no
+    quality reaches the target the top of the range is used. Returns (quality,
+    encoded bytes); bytes are None when the quality came from the cache, so an
+    image is searched only once per format and target.
+    """
+    lo, hi = QUALITY_RANGES[fmt]
+    digest = hashlib.sha256(f"{img.mode}:{img.size}:".encode("ascii"))
+    digest.update(img.tobytes())
+    key = f"imgq:{ENCODER_VERSION}:{fmt}:{target_ssim}:{lo}-{hi}:{digest.hexdigest()}"
+    cached = _quality_cache().get(key)
+    if cached is not None:
+        return int(cached), None
+
+    candidates = list(range(lo, hi, QUALITY_STEP)) + [hi]
+    best_q, best_data = hi, None
+    low, high = 0, len(candidates) - 1
+    while low <= high:
+        mid = (low + high) // 2
+        data = _encode_bytes(img, fmt, candidates[mid])
+        with Image.open(BytesIO(data)) as encoded:
+            score = ssim(img, encoded, max_side=QUALITY_SSIM_MAX_SIDE)
+        if score is not None and score >= target_ssim:
+            best_q, best_data = candidates[mid], data
+            high = mid - 1
+        else:
+            low = mid + 1
+    _quality_cache().set(key, best_q, timeout=None)
+    return best_q, best_data
+
+
+def _save_adaptive(img: Image.Image, out_path: str, fmt: str, target_ssim: Optional[float]) -> Optional[int]:
+    """Write `img` at its adaptive quality; returns the quality, or None when adaptive mode is off."""
+    if not target_ssim or not NUMPY_AVAILABLE:
+        return None
+    quality, data = adaptive_quality(img, fmt, target_ssim)
+    ensure_dir(out_path)
+    with open(out_path, "wb") as f:
+        f.write(data if data is not None else _encode_bytes(img, fmt, quality))
+    return quality
+
+
+def save_webp(img: Image.Image, out_path: str, quality: int = 80, target_ssim: float | None = None) -> None:
+    """With `target_ssim` (and numpy) the quality is searched per image and `quality` is ignored."""
+    if _save_adaptive(img, out_path, "webp", target_ssim) is not None:
+        return
     ensure_dir(out_path)
     img.save(out_path, format="WEBP", quality=quality, method=6)
 
@@ -81,7 +216,8 @@ def save_avif(img: Image.Image, out_path: str, quality: int = 50) -> None:
     img.save(out_path, format="AVIF", quality=quality)
 
 
-def save_avif_optimized(img: Image.Image, out_path: str, image_type: str = "background", quality: int | None = None) -> None:
+def save_avif_optimized(img: Image.Image, out_path: str, image_type: str = "background", quality: int | None = None,
+                        target_ssim: float | None = None) -> None:
     """
     Optimized AVIF saver expected by management commands.
     Chooses sensible defaults depending on image type.
@@ -89,9 +225,14 @@ def save_avif_optimized(img: Image.Image, out_path: str, image_type: str = "back
     image_type:
       - 'background' -> aggressive compression for large backdrops
       - 'product'    -> conservative to preserve detail
+
+    With `target_ssim` (and numpy) the smallest quality meeting it is searched
+    instead (adaptive_quality()); the presets and `quality` are then ignored.
     """
     if not AVIF_AVAILABLE:
         return
+    if _save_adaptive(img, out_path, "avif", target_ssim) is not None:
+        return
 
     # Normalize type
     kind = (image_type or "background").strip().lower()
@@ -125,6 +266,22 @@ def build_variant_paths(original_path: str, size_name: str, out_ext: str) -> str
     return f"{root}_{size_name}.{out_ext}"
 
 
+def icon_spec(
+    size: Tuple[int, int] = (128, 128),
+    mode: Literal["contain", "cover"] = "contain",
+    quality_avif: int | None = None,
+    quality_webp: int | None = None,
+) -> "VariantSpec":
+    """Spec used by generate_icon_variants(); exposed for callers that batch several sizes."""
+    return VariantSpec(
+        size=size,
+        fit="cover" if mode == "cover" else "contain",
+        formats=("webp", "avif"),
+        quality_avif=int(quality_avif) if isinstance(quality_avif, int) else 70,
+        quality_webp=int(quality_webp) if isinstance(quality_webp, int) else 82,
+    )
+
+
 def generate_icon_variants(
     original_fs_path: str,
     size: Tuple[int, int] = (128, 128),
@@ -137,66 +294,394 @@ def generate_icon_variants(
     Returns dict with keys: 'webp', 'avif' (values are absolute FS paths that exist).
     Missing formats may be absent if plugin not available.
     """
-    if not original_fs_path or not os.path.exists(original_fs_path):
-        return {}
+    spec = icon_spec(size, mode, quality_avif, quality_webp)
+    created = generate_variants(original_fs_path, [spec], overwrite=True).get(spec.size_name, {})
+    return {fmt: res.path for fmt, res in created.items()}
+
+
+# The blurred card background is computed at 1/BLUR_DOWNSCALE of the card size and
+# upscaled: a blurred image has no detail to lose, and the blur gets ~BLUR_DOWNSCALE^2 cheaper
+BLUR_DOWNSCALE = 8
 
-    img = _open_image(original_fs_path)
-    if mode == "cover":
-        fitted = _fit_box(img, size)
-    else:
-        fitted = _fit_box_contain(img, size)
 
-    size_name = f"{size[0]}x{size[1]}"
+def _blur_extend_canvas(img: Image.Image, size: Tuple[int, int], blur_radius: int = 24) -> Image.Image:
+    """Make a canvas of size WxH with a blurred cover background from img and a contained sharp foreground.
+    Useful for horizontal card canvases when the source is vertical — prevents awkward crops.
 
-    out = {}
+    The source is resized once (the foreground); the background is cut from that foreground
+    at low resolution, blurred with a proportionally smaller radius and upscaled.
+    """
+    target_w, target_h = size
+    src_w, src_h = img.size
+    if not src_w or not src_h:
+        return _fit_box_contain(img, size)
 
-    webp_q = int(quality_webp) if isinstance(quality_webp, int) else 82
-    webp_path = build_variant_paths(original_fs_path, size_name, "webp")
-    save_webp(fitted, webp_path, quality=webp_q)
-    if os.path.exists(webp_path):
-        out["webp"] = webp_path
+    # Foreground: contain, centered
+    scale = min(target_w / src_w, target_h / src_h)
+    fg = _as_rgba(img).resize((max(1, int(round(src_w * scale))), max(1, int(round(src_h * scale)))), Image.LANCZOS)
 
-    if AVIF_AVAILABLE:
-        avif_q = int(quality_avif) if isinstance(quality_avif, int) else 70
-        avif_path = build_variant_paths(original_fs_path, size_name, "avif")
-        save_avif(fitted, avif_path, quality=avif_q)
-        if os.path.exists(avif_path):
-            out["avif"] = avif_path
+    # Background: cover + blur at low resolution, then upscale
+    small = (max(1, math.ceil(target_w / BLUR_DOWNSCALE)), max(1, math.ceil(target_h / BLUR_DOWNSCALE)))
+    bg = _fit_box(fg, small).filter(ImageFilter.GaussianBlur(blur_radius / BLUR_DOWNSCALE))
+    out = bg.resize((target_w, target_h), Image.BILINEAR)
 
+    # Composite: foreground over blurred background
+    out.alpha_composite(fg, ((target_w - fg.width) // 2, (target_h - fg.height) // 2))
     return out
 
 
-def _resize_cover(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
-    """Resize to fully cover target box, cropping overflow (no canvas)."""
-    target_w, target_h = size
-    src_w, src_h = img.size
+# ---------------------------------------------------------------------------
+# Decode-once variant pipeline
+# ---------------------------------------------------------------------------
+
+# Bump when _render()/_encode() change their output for an unchanged spec (forces re-encoding)
+ENCODER_VERSION = 1
+# Per-fit versions: bump when only that fit's rendering changes, so other outputs stay current
+FIT_VERSIONS = {"blur": 2, "cover": 1}
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    """One requested output family: a size (None = original canvas), a fit mode and formats.
+
+    fit:
+      - 'contain' -> whole image inside the box, transparent bars
+      - 'cover'   -> fill the box, crop around the focal point of the source (focal_point())
+      - 'blur'    -> contained image over a blurred cover background
+    Qualities left as None use the defaults of save_avif_optimized()/save_webp() for `image_type`.
+    With `target_ssim` the quality is searched per image instead (adaptive_quality()).
+    """
+    size: Optional[Tuple[int, int]] = None
+    fit: Literal["contain", "cover", "blur"] = "contain"
+    formats: Tuple[str, ...] = ("avif", "webp")
+    quality_avif: Optional[int] = None
+    quality_webp: Optional[int] = None
+    image_type: Literal["product", "background"] = "product"
+    target_ssim: Optional[float] = None
+
+    @property
+    def size_name(self) -> str:
+        return f"{self.size[0]}x{self.size[1]}" if self.size else ""
+
+    def out_path(self, original_fs_path: str, fmt: str) -> str:
+        if self.size:
+            return build_variant_paths(original_fs_path, self.size_name, fmt)
+        root, _ext = os.path.splitext(original_fs_path)
+        return f"{root}.{fmt}"
+
+    def params_hash(self, fmt: str) -> str:
+        """Hash of everything that shapes the encoded `fmt` file; a change means the file is stale."""
+        quality = self.quality_avif if fmt == "avif" else self.quality_webp
+        key = (ENCODER_VERSION, self.size, self.fit, fmt, quality, self.image_type)
+        if self.target_ssim is not None:
+            key += (self.target_ssim,)
+        if self.fit in FIT_VERSIONS:
+            key += (FIT_VERSIONS[self.fit],)
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class VariantResult:
+    path: str
+    format: str
+    width: int
+    height: int
+    bytes: int
+    created: bool  # False when an existing file was kept (overwrite=False)
+
+
+def _needed_scale(src_size: Tuple[int, int], spec: VariantSpec) -> float:
+    """Fraction of the source resolution this spec needs (1.0 = full resolution)."""
+    if not spec.size:
+        return side_cap_scale(src_size)
+    src_w, src_h = src_size
     if not src_w or not src_h:
-        return img.copy()
-    scale = max(target_w / src_w, target_h / src_h)
-    new_size = (max(1, int(round(src_w * scale))), max(1, int(round(src_h * scale))))
-    return img.convert("RGBA").resize(new_size, Image.LANCZOS)
+        return 1.0
+    target_w, target_h = spec.size
+    cover = max(target_w / src_w, target_h / src_h)
+    contain = min(target_w / src_w, target_h / src_h)
+    # blur-extend uses a cover background and a contained foreground
+    return min(1.0, cover if spec.fit in ("cover", "blur") else contain)
+
+
+def _decode_at_scale(path: str, scale: float) -> Image.Image:
+    """Open `path` decoding only as many pixels as `scale` needs, within IMAGE_MAX_PIXELS.
+
+    JPEG is decoded at 1/2..1/8 via draft mode; anything still >= 2x larger than
+    needed is box-reduced by an integer factor. A 2x margin is kept so the final
+    LANCZOS pass has real detail to work with, unless keeping it would break the
+    pixel budget. Raises ImageTooLarge before decoding when even the closest draft
+    does not fit (e.g. a huge PNG, which cannot be reduced while decoding).
+    """
+    img = Image.open(path)
+    src_w, src_h = img.size
+    draft_for_scale(img, scale, gap=2.0)
+    try:
+        check_pixel_budget(img)
+    except ImageTooLarge:
+        if img.format != "JPEG" or scale >= 1.0:
+            img.close()
+            raise
+        img.close()
+        img = Image.open(path)
+        draft_for_scale(img, scale)
+        check_pixel_budget(img)
+    img.load()
+    if scale < 1.0:
+        want = (min(src_w, math.ceil(src_w * scale * 2)), min(src_h, math.ceil(src_h * scale * 2)))
+        factor = int(min(img.width / max(1, want[0]), img.height / max(1, want[1])))
+        if factor >= 2:
+            img = img.reduce(factor)
+    return img
 
 
-def _blur_extend_canvas(img: Image.Image, size: Tuple[int, int], blur_radius: int = 24) -> Image.Image:
-    """Make a canvas of size WxH with a blurred cover background from img and a contained sharp foreground.
-    Useful for horizontal card canvases when the source is vertical — prevents awkward crops.
+# Modes Image.reduce()/resize() handle natively; others are converted before shrinking
+_RESAMPLE_MODES = ("RGB", "RGBA", "L", "LA", "CMYK")
+
+
+def _downscale(img: Image.Image, scale_of_source: float, source_size: Tuple[int, int]) -> Image.Image:
+    """Aspect-preserving copy at `scale_of_source`, shrunk in the decoded mode (RGB is 3 bytes/px, not 4)."""
+    target = (
+        max(1, math.ceil(source_size[0] * scale_of_source)),
+        max(1, math.ceil(source_size[1] * scale_of_source)),
+    )
+    if img.mode not in _RESAMPLE_MODES:
+        img = _as_rgba(img)
+    if target[0] >= img.width or target[1] >= img.height:
+        return img
+    factor = int(min(img.width / target[0], img.height / target[1]) // 2)
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img.resize(target, Image.LANCZOS)
+
+
+def _shared_downscale(img: Image.Image, scale_of_source: float, source_size: Tuple[int, int]) -> Image.Image:
+    """Aspect-preserving RGBA copy at the resolution the largest sized output needs."""
+    return _as_rgba(_downscale(img, scale_of_source, source_size))
+
+
+def _render(base: Image.Image, spec: VariantSpec, focus: Optional[Tuple[float, float]] = None) -> Image.Image:
+    if spec.fit == "blur":
+        return _blur_extend_canvas(base, spec.size)
+    if spec.fit == "cover":
+        return _fit_box(base, spec.size, focus)
+    return _fit_box_contain(base, spec.size)
+
+
+def _encode(img: Image.Image, out_path: str, fmt: str, spec: VariantSpec) -> None:
+    # Write to a temp name and rename, so a file served while being regenerated is never truncated
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    if fmt == "avif":
+        save_avif_optimized(img, tmp_path, image_type=spec.image_type,
+                            quality=int(spec.quality_avif) if isinstance(spec.quality_avif, int) else None,
+                            target_ssim=spec.target_ssim)
+    elif fmt == "webp":
+        default_q = 82 if spec.image_type == "background" else 80
+        save_webp(img, tmp_path, quality=int(spec.quality_webp) if isinstance(spec.quality_webp, int) else default_q,
+                  target_ssim=spec.target_ssim)
+    else:
+        raise ValueError(f"Unsupported variant format '{fmt}'")
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, out_path)
+
+
+def _capped(size: Tuple[int, int]) -> Tuple[int, int]:
+    scale = side_cap_scale(size)
+    if scale >= 1.0:
+        return size
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+
+def generate_variants(original_fs_path: str, outputs: Iterable[VariantSpec], overwrite: bool = False,
+                      focus: Optional[Tuple[float, float]] = None) -> dict:
     """
-    target_w, target_h = size
-    # Background: cover + blur
-    bg = _resize_cover(img, size)
-    # center-crop to exact size
-    left = max(0, (bg.width - target_w) // 2)
-    top = max(0, (bg.height - target_h) // 2)
-    bg = bg.crop((left, top, left + target_w, top + target_h)).filter(ImageFilter.GaussianBlur(blur_radius))
+    Produce every requested variant of one source image, decoding it once.
+
+    The source is decoded at the resolution the largest output needs (JPEG draft +
+    Image.reduce), downscaled once to a shared RGBA base and every sized output is
+    cut from that base. No-resize outputs keep the source canvas, capped to
+    IMAGE_MAX_SIDE. Raises ImageTooLarge when the source does not fit IMAGE_MAX_PIXELS.
+    'cover' outputs are cropped around `focus`; when it is not given it is computed
+    from the base (focal_point()).
+
+    Returns {size_name: {fmt: VariantResult}} where size_name is '' for no-resize outputs,
+    e.g. {'': {'avif': ..., 'webp': ...}, '230x160': {'avif': ..., 'webp': ...}}.
+    Formats that cannot be written (AVIF plugin missing) are absent.
+    """
+    if not original_fs_path or not os.path.exists(original_fs_path):
+        return {}
 
-    # Foreground: contain, centered
-    fg = _fit_box_contain(img, size)
+    specs = list(outputs)
+    todo: list[tuple[VariantSpec, str, str]] = []
+    result: dict = {}
+    for spec in specs:
+        for fmt in spec.formats:
+            if fmt == "avif" and not AVIF_AVAILABLE:
+                continue
+            out_path = spec.out_path(original_fs_path, fmt)
+            if not overwrite and os.path.exists(out_path):
+                result.setdefault(spec.size_name, {})[fmt] = None  # filled below
+            else:
+                todo.append((spec, fmt, out_path))
+
+    with Image.open(original_fs_path) as probe:
+        source_size = probe.size
+
+    if todo:
+        scales = [_needed_scale(source_size, spec) for spec, _fmt, _p in todo]
+        img = _decode_at_scale(original_fs_path, max(scales))
+
+        sized_scales = [sc for (spec, _f, _p), sc in zip(todo, scales) if spec.size]
+        base = _shared_downscale(img, max(sized_scales), source_size) if sized_scales else None
+        if len(sized_scales) == len(todo):
+            img = None  # only sized outputs: drop the decode, keep just the shared base
+        if focus is None and any(spec.fit == "cover" and spec.size for spec, _f, _p in todo):
+            focus = focal_point(base)
+
+        full = None
+        rendered: dict[VariantSpec, Image.Image] = {}
+        for spec, fmt, out_path in todo:
+            if spec not in rendered:
+                if spec.size:
+                    rendered[spec] = _render(base, spec, focus)
+                else:
+                    if full is None:
+                        # Preserve transparency: keep RGBA/LA; convert palette to RGBA; fallback to RGB
+                        full = img.convert("RGBA") if img.mode == "P" else img
+                        if full.mode not in ("RGB", "RGBA", "LA"):
+                            full = full.convert("RGB")
+                        full = _downscale(full, side_cap_scale(source_size), source_size)
+                    rendered[spec] = full
+            canvas = rendered[spec]
+            _encode(canvas, out_path, fmt, spec)
+            if os.path.exists(out_path):
+                result.setdefault(spec.size_name, {})[fmt] = VariantResult(
+                    path=out_path, format=fmt, width=canvas.width, height=canvas.height,
+                    bytes=os.path.getsize(out_path), created=True,
+                )
+
+    # Kept files: report them without decoding anything
+    for spec in specs:
+        for fmt, res in list(result.get(spec.size_name, {}).items()):
+            if res is None:
+                out_path = spec.out_path(original_fs_path, fmt)
+                width, height = spec.size or _capped(source_size)
+                result[spec.size_name][fmt] = VariantResult(
+                    path=out_path, format=fmt, width=width, height=height,
+                    bytes=os.path.getsize(out_path), created=False,
+                )
 
-    # Composite: paste foreground over blurred background
-    out = Image.new("RGBA", (target_w, target_h))
-    out.paste(bg, (0, 0))
-    out.alpha_composite(fg if fg.mode == "RGBA" else fg.convert("RGBA"))
-    return out
+    return result
+
+
+# Inline placeholders (ImageAsset.dominant_color / lqip): a few-pixel WebP that the
+# browser upscales smoothly behind the <img> until the real file has loaded
+LQIP_SIDE = 16
+LQIP_QUALITY = 40
+
+
+def image_placeholder(path: str) -> Tuple[str, str]:
+    """('#rrggbb' average color, data: URI of a LQIP_SIDE px WebP) of the image at `path`.
+
+    JPEG is decoded at the smallest draft that still covers LQIP_SIDE. Sources with
+    transparent pixels get the color only: a LQIP would show through them.
+    """
+    with Image.open(path) as img:
+        draft_for_scale(img, min(1.0, 2 * LQIP_SIDE / max(1, *img.size)))
+        check_pixel_budget(img)
+        img = _as_rgba(ImageOps.exif_transpose(img))
+    color = img.resize((1, 1), Image.BOX).getpixel((0, 0))
+    dominant = "#{:02x}{:02x}{:02x}".format(*color[:3])
+    if img.getchannel("A").getextrema()[0] < 255:
+        return dominant, ""
+    img.thumbnail((LQIP_SIDE, LQIP_SIDE), Image.BOX)
+    buf = BytesIO()
+    img.convert("RGB").save(buf, format="WEBP", quality=LQIP_QUALITY, method=6)
+    return dominant, "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+# Focal point for 'cover' crops: saliency is measured on a copy of at most FOCAL_SIDE px,
+# the focal point is the centroid of its FOCAL_TOP most salient share, and a Gaussian
+# center prior (sigma FOCAL_CENTER_SIGMA of the image size) damps busy edges
+FOCAL_SIDE = 96
+FOCAL_TOP = 0.1
+FOCAL_CENTER_SIGMA = 0.5
+FOCAL_CENTER = (0.5, 0.5)
+
+
+def focal_point(img: Image.Image) -> Tuple[float, float]:
+    """(x, y) in 0..1 of the most salient region of `img`, the center of 'cover' crops.
+
+    Saliency of a pixel is its color distance from the mean color of the image
+    (frequency-tuned saliency) plus the local luminance gradient (detail/entropy),
+    both normalized and weighted by alpha. Without numpy the center is returned.
+    """
+    if not NUMPY_AVAILABLE or not img.width or not img.height:
+        return FOCAL_CENTER
+    scale = min(1.0, FOCAL_SIDE / max(img.size))
+    small = _as_rgba(img).resize(
+        (max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BOX
+    ).filter(ImageFilter.GaussianBlur(1))
+    arr = np.asarray(small, dtype=np.float32)
+    rgb, alpha = arr[..., :3], arr[..., 3] / 255.0
+    opaque = alpha.sum()
+    if opaque <= 0:
+        return FOCAL_CENTER
+
+    mean = (rgb * alpha[..., None]).sum(axis=(0, 1)) / opaque
+    color = np.sqrt(((rgb - mean) ** 2).sum(axis=-1))
+    luma = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    if min(luma.shape) > 1:
+        grad_y, grad_x = np.gradient(luma)
+        detail = np.hypot(grad_x, grad_y)
+    else:
+        detail = np.zeros_like(luma)
+    saliency = color / (color.max() or 1.0) + detail / (detail.max() or 1.0)
+
+    h, w = saliency.shape
+    xs = (np.arange(w, dtype=np.float32) + 0.5) / w
+    ys = (np.arange(h, dtype=np.float32) + 0.5) / h
+    prior = np.exp(-((xs[None, :] - 0.5) ** 2 + (ys[:, None] - 0.5) ** 2) / (2 * FOCAL_CENTER_SIGMA ** 2))
+    saliency *= alpha * prior
+
+    weights = np.clip(saliency - np.quantile(saliency, 1 - FOCAL_TOP), 0, None)
+    total = float(weights.sum())
+    if total <= 0:
+        return FOCAL_CENTER
+    return (
+        round(float((weights.sum(axis=0) * xs).sum()) / total, 3),
+        round(float((weights.sum(axis=1) * ys).sum()) / total, 3),
+    )
+
+
+def image_focal_point(path: str) -> Tuple[float, float]:
+    """focal_point() of the image at `path`; JPEG is decoded at the smallest draft that covers FOCAL_SIDE."""
+    with Image.open(path) as img:
+        draft_for_scale(img, min(1.0, 2 * FOCAL_SIDE / max(1, *img.size)))
+        check_pixel_budget(img)
+        img.load()
+        return focal_point(img)
+
+
+def card_specs(
+    size_desktop: Tuple[int, int] = (230, 160),
+    size_mobile: Tuple[int, int] = (200, 160),
+    background_blur: bool = True,
+    quality_webp: int | None = None,
+    quality_avif: int | None = None,
+) -> list[VariantSpec]:
+    """Specs used by generate_card_variants() (desktop + mobile canvases)."""
+    # If blur-extend is disabled, use cover-crop to fully fill canvas (no transparent side bars)
+    return [
+        VariantSpec(
+            size=size,
+            fit="blur" if background_blur else "cover",
+            formats=("webp", "avif"),
+            quality_webp=int(quality_webp) if isinstance(quality_webp, int) else 82,
+            quality_avif=int(quality_avif) if isinstance(quality_avif, int) else 60,
+        )
+        for size in (size_desktop, size_mobile)
+    ]
 
 
 def generate_card_variants(
@@ -210,33 +695,22 @@ def generate_card_variants(
     """Generate AVIF/WebP card variants (desktop+mobile) with blur-extend canvas.
     Returns dict of created paths per size: {'230x160': {'webp': path, 'avif': path}, '200x160': {...}}
     """
-    if not original_fs_path or not os.path.exists(original_fs_path):
-        return {}
+    specs = card_specs(size_desktop, size_mobile, background_blur, quality_webp, quality_avif)
+    created = generate_variants(original_fs_path, specs, overwrite=True)
+    return {
+        spec.size_name: {fmt: res.path for fmt, res in created.get(spec.size_name, {}).items()}
+        for spec in specs
+    } if created else {}
 
-    img = _open_image(original_fs_path)
-    sizes = [size_desktop, size_mobile]
-    result = {}
-    for w, h in sizes:
-        size_name = f"{w}x{h}"
-        # If blur-extend is disabled, use cover-crop to fully fill canvas (no transparent side bars)
-        canvas = _blur_extend_canvas(img, (w, h)) if background_blur else _fit_box(img, (w, h))
-
-        out_webp = build_variant_paths(original_fs_path, size_name, "webp")
-        out_avif = build_variant_paths(original_fs_path, size_name, "avif")
-
-        # Save formats
-        save_webp(canvas, out_webp, quality=int(quality_webp) if isinstance(quality_webp, int) else 82)
-        if AVIF_AVAILABLE:
-            save_avif(canvas, out_avif, quality=int(quality_avif) if isinstance(quality_avif, int) else 60)
-
-        created = {}
-        if os.path.exists(out_webp):
-            created["webp"] = out_webp
-        if AVIF_AVAILABLE and os.path.exists(out_avif):
-            created["avif"] = out_avif
-        result[size_name] = created
 
-    return result
+def _original_mime(path: str) -> str:
+    ext_lower = os.path.splitext(path)[1].lower()
+    if ext_lower in (".jpg", ".jpeg"):
+        return "image/jpeg"
+    if ext_lower == ".png":
+        return "image/png"
+    # default to jpeg to be safe in <img>
+    return "image/jpeg"
 
 
 def generate_formats_noresize(
@@ -260,55 +734,20 @@ def generate_formats_noresize(
         'mime_order': [('image/avif', avif_path), ('image/webp', webp_path), ('image/jpeg', original) | ('image/png', original)]
       }
     """
-    if not original_fs_path or not os.path.exists(original_fs_path):
+    spec = VariantSpec(size=None, image_type=image_type, quality_avif=quality_avif, quality_webp=quality_webp)
+    created = generate_variants(original_fs_path, [spec], overwrite=overwrite)
+    if not created:
         return {}
 
-    root, ext = os.path.splitext(original_fs_path)
-    ext_lower = (ext or "").lower()
-
-    out_avif = f"{root}.avif"
-    out_webp = f"{root}.webp"
-
-    # Decide mime for original as fallback
-    if ext_lower in (".jpg", ".jpeg"):
-        original_mime = "image/jpeg"
-    elif ext_lower == ".png":
-        original_mime = "image/png"
-    else:
-        # default to jpeg to be safe in <img>
-        original_mime = "image/jpeg"
-
-    img = _open_image(original_fs_path)
-
-    # Preserve transparency: keep RGBA/LA; convert palette to RGBA; fallback to RGB
-    if img.mode == "P":
-        img = img.convert("RGBA")
-    if img.mode not in ("RGB", "RGBA", "LA"):
-        img = img.convert("RGB")
-
-    created_avif = None
-    created_webp = None
-
-    # Save AVIF
-    if AVIF_AVAILABLE:
-        if overwrite or (not os.path.exists(out_avif)):
-            save_avif_optimized(img, out_avif, image_type=image_type, quality=quality_avif if isinstance(quality_avif, int) else None)
-        if os.path.exists(out_avif):
-            created_avif = out_avif
-
-    # Save WebP
-    webp_q = int(quality_webp) if isinstance(quality_webp, int) else (82 if image_type == "background" else 80)
-    if overwrite or (not os.path.exists(out_webp)):
-        save_webp(img, out_webp, quality=webp_q)
-    if os.path.exists(out_webp):
-        created_webp = out_webp
+    created_avif = created[""]["avif"].path if "avif" in created[""] else None
+    created_webp = created[""]["webp"].path if "webp" in created[""] else None
 
     mime_order = []
     if created_avif:
         mime_order.append(("image/avif", created_avif))
     if created_webp:
         mime_order.append(("image/webp", created_webp))
-    mime_order.append((original_mime, original_fs_path))
+    mime_order.append((_original_mime(original_fs_path), original_fs_path))
 
     return {
         "original": original_fs_path,
@@ -337,13 +776,5 @@ def build_prioritized_picture_sources(original_fs_path: str) -> list[tuple[str,
     if os.path.exists(webp):
         sources.append(("image/webp", webp))
 
-    # infer original mime
-    ext_lower = _ext.lower()
-    if ext_lower in (".jpg", ".jpeg"):
-        original_mime = "image/jpeg"
-    elif ext_lower == ".png":
-        original_mime = "image/png"
-    else:
-        original_mime = "image/jpeg"
-    sources.append((original_mime, original_fs_path))
+    sources.append((_original_mime(original_fs_path), original_fs_path))
     return sources
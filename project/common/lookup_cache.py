@@ -0,0 +1,98 @@
+"""
+Bounded per-process memo for the media file lookups template tags make while rendering.
+
+Entries expire after MEDIA_LOOKUP_CACHE_TTL seconds, so files written by another
+process (the image worker, generate_* commands) show up without any messaging;
+saves in this process drop the affected keys right away (goods.signals,
+goods.manifest). Each cache counts hits and misses; `lookup_stats()` reports them.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from django.conf import settings
+
+DEFAULT_MAXSIZE = 4096
+DEFAULT_TTL = 300
+
+_MISSING = object()
+
+
+class LookupCache:
+    """LRU of string keys with a TTL and hit/miss counters. Thread-safe; loaders run outside the lock."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    @staticmethod
+    def _limits() -> tuple[int, float]:
+        return (
+            int(getattr(settings, "MEDIA_LOOKUP_CACHE_SIZE", DEFAULT_MAXSIZE)),
+            float(getattr(settings, "MEDIA_LOOKUP_CACHE_TTL", DEFAULT_TTL)),
+        )
+
+    def get_or_load(self, key: str, loader: Callable[[], object]):
+        """Cached value of `key`, calling `loader()` on a miss or after expiry. TTL 0 disables caching."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        maxsize, ttl = self._limits()
+        if ttl > 0 and maxsize > 0:
+            with self._lock:
+                self._data[key] = (now + ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every key starting with `prefix`; returns how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._data if key.startswith(prefix)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+# default_storage existence/URL of media files, keyed by storage name
+media_lookups = LookupCache("media")
+
+
+def invalidate_source(name: Optional[str]) -> None:
+    """Forget lookups of a media source and its variants (<root>.<fmt>, <root>_<WxH>.<fmt>)."""
+    if name:
+        media_lookups.invalidate_prefix(os.path.splitext(name)[0])
+
+
+def lookup_stats() -> list[dict]:
+    return [media_lookups.stats()]
@@ -9,4 +9,59 @@ class CacheMixin:
             data = query
             cache.set(cache_name, data, cache_time)
 
-        return data
\ No newline at end of file
+        return data
+
+
+# Marks a tracked field that was deferred (.only()/.defer()) when the row was loaded
+_DEFERRED = object()
+
+
+class FieldTrackerMixin:
+    """Model mixin that remembers the loaded values of `tracked_fields`.
+
+    Signal receivers call `has_changed('image')` to act only when a field really
+    changed; instances that were never loaded from the DB report every tracked
+    field as changed. File fields are compared by their storage name.
+    """
+    tracked_fields: tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def _tracked_value(self, name):
+        attname = self._meta.get_field(name).attname
+        if attname not in self.__dict__:
+            return _DEFERRED
+        value = self.__dict__[attname]
+        return getattr(value, "name", value)
+
+    def _snapshot_tracked_fields(self):
+        self._tracked_initial = {name: self._tracked_value(name) for name in self.tracked_fields}
+
+    def changed_fields(self) -> set:
+        initial = getattr(self, "_tracked_initial", None)
+        if initial is None:
+            return set(self.tracked_fields)
+        changed = set()
+        for name, old in initial.items():
+            new = self._tracked_value(name)
+            # A field deferred at load time and never touched cannot have changed
+            if new is not _DEFERRED and new != old:
+                changed.add(name)
+        return changed
+
+    def has_changed(self, name: str) -> bool:
+        return name in self.changed_fields()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have already seen the changes; start over from the saved state
+        self._snapshot_tracked_fields()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_tracked_fields()
+
@@ -0,0 +1,145 @@
+"""
+Process-pool runner shared by the bulk image management commands.
+
+Work items are (key, payload) pairs; `func(payload)` runs in a worker process and
+must be a module-level function (it is pickled by reference). Items are sent in
+chunks to amortize IPC, results come back in input order regardless of which
+worker finished first, so summaries are deterministic.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+
+@dataclass
+class TaskResult:
+    key: str
+    ok: bool
+    value: Any = None
+    error: str = ""
+    elapsed: float = 0.0
+
+
+def _run_one(func: Callable[[Any], Any], key: str, payload: Any) -> TaskResult:
+    started = time.perf_counter()
+    try:
+        value = func(payload)
+        return TaskResult(key, True, value, elapsed=time.perf_counter() - started)
+    except Exception as e:
+        # Keep the last frame for context; full tracebacks from N workers are unreadable
+        tb = traceback.extract_tb(e.__traceback__)
+        where = f" ({os.path.basename(tb[-1].filename)}:{tb[-1].lineno})" if tb else ""
+        return TaskResult(key, False, error=f"{type(e).__name__}: {e}{where}",
+                          elapsed=time.perf_counter() - started)
+
+
+def _run_chunk(func: Callable[[Any], Any], chunk: Sequence[Tuple[int, str, Any]]) -> list[Tuple[int, TaskResult]]:
+    return [(idx, _run_one(func, key, payload)) for idx, key, payload in chunk]
+
+
+def default_chunksize(n_items: int, workers: int) -> int:
+    # ~4 chunks per worker: large enough to amortize pickling, small enough to balance load
+    return max(1, min(16, n_items // (workers * 4) or 1))
+
+
+def run_parallel(
+    func: Callable[[Any], Any],
+    items: Sequence[Tuple[str, Any]],
+    workers: int = 1,
+    chunksize: Optional[int] = None,
+    on_result: Optional[Callable[[TaskResult, int, int], None]] = None,
+) -> list[TaskResult]:
+    """Run `func` over `items` on `workers` processes; returns results in input order.
+
+    `on_result(result, done, total)` is called in the parent as results arrive
+    (progress output). workers <= 1 runs in-process with identical semantics.
+    """
+    total = len(items)
+    results: list[Optional[TaskResult]] = [None] * total
+    indexed = [(i, key, payload) for i, (key, payload) in enumerate(items)]
+
+    if workers <= 1 or total <= 1:
+        for done, (i, key, payload) in enumerate(indexed, start=1):
+            res = _run_one(func, key, payload)
+            results[i] = res
+            if on_result:
+                on_result(res, done, total)
+        return results  # type: ignore[return-value]
+
+    # Forked workers must not share the parent's DB socket
+    try:
+        from django.db import connections
+        connections.close_all()
+    except Exception:
+        pass
+
+    size = chunksize or default_chunksize(total, workers)
+    chunks = [indexed[i:i + size] for i in range(0, total, size)]
+    done = 0
+    ctx = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {pool.submit(_run_chunk, func, chunk): chunk for chunk in chunks}
+        for fut in as_completed(futures):
+            try:
+                chunk_results = fut.result()
+            except Exception as e:
+                # Worker process died (OOM kill, segfault in a codec): fail the whole chunk
+                chunk_results = [
+                    (idx, TaskResult(key, False, error=f"worker crashed: {type(e).__name__}: {e}"))
+                    for idx, key, _payload in futures[fut]
+                ]
+            for idx, res in chunk_results:
+                results[idx] = res
+                done += 1
+                if on_result:
+                    on_result(res, done, total)
+    return results  # type: ignore[return-value]
+
+
+class ParallelCommandMixin:
+    """BaseCommand helpers: --workers/--chunk-size options, progress lines and a summary."""
+
+    def add_parallel_arguments(self, parser) -> None:
+        parser.add_argument("--workers", type=int, default=1,
+                            help=f"Encode on N processes (default: 1, this machine has {os.cpu_count()} cores)")
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="Items per task sent to a worker (default: auto)")
+
+    def run_tasks(self, func: Callable[[Any], Any], items: Sequence[Tuple[str, Any]], options: dict,
+                  describe: Optional[Callable[[TaskResult], str]] = None) -> list[TaskResult]:
+        """Run items through `func`, printing one line per finished item."""
+        workers = max(1, int(options.get("workers") or 1))
+        width = len(str(len(items)))
+
+        def _progress(res: TaskResult, done: int, total: int) -> None:
+            prefix = f"[{done:>{width}}/{total}]"
+            if res.ok:
+                detail = describe(res) if describe else ""
+                self.stdout.write(self.style.SUCCESS(f"{prefix} ✓ {res.key}{(' ' + detail) if detail else ''}"))
+            else:
+                self.stderr.write(self.style.ERROR(f"{prefix} ✗ {res.key}: {res.error}"))
+
+        started = time.perf_counter()
+        results = run_parallel(func, items, workers=workers, chunksize=options.get("chunk_size"),
+                               on_result=_progress)
+        self._parallel_elapsed = time.perf_counter() - started
+        self._parallel_workers = workers
+        return results
+
+    def write_parallel_summary(self, results: Sequence[TaskResult]) -> None:
+        failed = [r for r in results if not r.ok]
+        cpu = sum(r.elapsed for r in results)
+        wall = getattr(self, "_parallel_elapsed", cpu)
+        self.stdout.write(
+            f"   Items: {len(results)}, ok: {len(results) - len(failed)}, failed: {len(failed)}; "
+            f"wall {wall:.1f}s, work {cpu:.1f}s on {getattr(self, '_parallel_workers', 1)} worker(s)"
+        )
+        # Failures listed again in input order so reruns/diffs are easy to compare
+        for r in failed:
+            self.stderr.write(self.style.ERROR(f"   ✗ {r.key}: {r.error}"))
@@ -0,0 +1,113 @@
+"""
+Index of static category icons: static/deps/icons/<slug>[_<WxH>].<avif|webp|png>.
+
+Built once per process from the staticfiles finders plus the collectstatic
+manifest (when ManifestStaticFilesStorage is used), so category_icon_picture and
+category_best_img_src resolve icons with set lookups instead of walking
+STATICFILES_DIRS on every render.
+
+generate_static_icons and generate_category_icons call `bump_icon_index()`: it
+rebuilds the index of that process and stores a new version in the default cache;
+other processes compare versions at most every ICON_INDEX_RECHECK seconds and rebuild.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+ICON_DIR = "deps/icons"
+ICON_EXTENSIONS = (".avif", ".webp", ".png")
+INDEX_VERSION_KEY = "static_icon_index_version"
+ICON_INDEX_RECHECK = 60
+
+
+def _scan() -> frozenset[str]:
+    """Static paths ('deps/icons/<file>') of every icon the finders or the collectstatic manifest know."""
+    paths = set()
+    for directory in finders.find(ICON_DIR, all=True) or []:
+        try:
+            with os.scandir(directory) as it:
+                paths.update(
+                    f"{ICON_DIR}/{e.name}" for e in it
+                    if e.is_file() and e.name.lower().endswith(ICON_EXTENSIONS)
+                )
+        except OSError:
+            continue
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None) or {}
+    paths.update(p for p in hashed_files if p.startswith(ICON_DIR + "/") and p.lower().endswith(ICON_EXTENSIONS))
+    return frozenset(paths)
+
+
+class StaticIconIndex:
+    def __init__(self):
+        self._paths: frozenset[str] | None = None
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def _cached_version(self):
+        try:
+            return cache.get(INDEX_VERSION_KEY)
+        except Exception:
+            return self._version
+
+    def _rebuild(self, version) -> frozenset[str]:
+        self._paths = _scan()
+        self._version = version
+        self.builds += 1
+        logger.debug("static icon index: %d file(s), version %s", len(self._paths), version)
+        return self._paths
+
+    def paths(self) -> frozenset[str]:
+        now = time.monotonic()
+        paths = self._paths
+        if paths is not None and now - self._checked < ICON_INDEX_RECHECK:
+            return paths
+        with self._lock:
+            if self._paths is None or now - self._checked >= ICON_INDEX_RECHECK:
+                version = self._cached_version()
+                if self._paths is None or version != self._version:
+                    self._rebuild(version)
+                self._checked = now
+            return self._paths
+
+    @property
+    def version(self):
+        """Version of the index in use (None until a generate command bumped it)."""
+        self.paths()
+        return self._version
+
+    def refresh(self, version=None) -> None:
+        with self._lock:
+            self._rebuild(version)
+            self._checked = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"name": "static-icons", "size": len(self._paths or ()), "builds": self.builds}
+
+
+icon_index = StaticIconIndex()
+
+
+def has_static_icon(path: str) -> bool:
+    """True if static file `path` (e.g. 'deps/icons/seeds_128x128.webp') is in the icon index."""
+    return path in icon_index.paths()
+
+
+def bump_icon_index() -> None:
+    """Rebuild the index here and make every other process rebuild on its next recheck."""
+    version = time.time_ns()
+    try:
+        cache.set(INDEX_VERSION_KEY, version, None)
+    except Exception:
+        logger.warning("static icon index: could not store the new version", exc_info=True)
+    icon_index.refresh(version)
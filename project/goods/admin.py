@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categories, Products, ProductImage
+from .models import Categories, Products, ProductImage, ImageAsset, ImageVariant, ImageJob
 
 
 
@@ -72,3 +72,27 @@ class ProductsAdmin(admin.ModelAdmin):
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ("product", "alt_text")
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "source", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "task")
+    search_fields = ("source",)
+    readonly_fields = ("source", "task", "attempts", "last_error", "locked_at", "created_at", "updated_at")
+
+
+class ImageVariantInline(admin.TabularInline):
+    model = ImageVariant
+    extra = 0
+    can_delete = False
+    fields = ("name", "format", "size", "width", "height", "file_size", "updated_at")
+    readonly_fields = fields
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ("name", "width", "height", "updated_at")
+    search_fields = ("name",)
+    readonly_fields = ("name", "width", "height", "focal_x", "focal_y", "normalized_signature", "created_at", "updated_at")
+    inlines = [ImageVariantInline]
@@ -0,0 +1,308 @@
+"""
+DB-backed queue for image processing.
+
+Signals call `enqueue()`; `manage.py run_image_worker` claims jobs and runs the
+handler registered for the job's task. Encoding never happens in the request.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows dev machines: no cross-process lock
+    FCNTL_AVAILABLE = False
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from common.image_specs import spec_for_size, specs_for
+from common.image_utils import ImageTooLarge, VariantSpec
+from .manifest import sync_variants
+from .models import ImageJob, _normalize_image_file_inplace
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff: 30s, 2m, 8m, ... (base * 4**(attempt-1))
+RETRY_BASE_SECONDS = 30
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+def _fs_path(name: str) -> str:
+    try:
+        return default_storage.path(name)  # type: ignore[attr-defined]
+    except Exception:
+        return os.path.join(settings.MEDIA_ROOT, name)
+
+
+# ---------------------------------------------------------------------------
+# Task handlers: receive the storage name of the source file and bring the
+# outputs registered for its field (common.image_specs) up to date. The variant
+# manifest (goods.manifest) re-encodes only outputs whose source content or
+# encoder params changed.
+# ---------------------------------------------------------------------------
+
+def _generate(name: str, specs: list[VariantSpec]) -> None:
+    sync_variants(name, _fs_path(name), specs)
+
+
+def _task_product_image(name: str) -> None:
+    """Products.image: fix orientation and size, then every registered output from one decode."""
+    # A rotated original gets a new content hash, so its variants are re-encoded
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("goods.Products.image"))
+
+
+def _task_product_card(name: str) -> None:
+    """Products.card_image: fix orientation and size, card canvases."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("goods.Products.card_image"))
+
+
+def _task_gallery_image(name: str) -> None:
+    """ProductImage.image: cap the original, no-resize formats, responsive sizes and thumbs."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("goods.ProductImage.image"))
+
+
+def _task_category_icon(name: str) -> None:
+    """Categories.image: icon sizes used in lists/cards and the presentation fallback."""
+    _generate(name, specs_for("goods.Categories.image"))
+
+
+def _task_category_seo(name: str) -> None:
+    """Categories.seo_image: cap the original, no-resize formats and 800x450 cover for the presentation block."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("goods.Categories.seo_image"))
+
+
+# Article editor uploads in these formats get an article_image job (downscaled in place, AVIF/WebP
+# siblings); GIF (animation) and files that already are WebP/AVIF are stored as they are
+ARTICLE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _task_article_image(name: str) -> None:
+    """Editor upload in an article body: fix orientation and size, no-resize formats."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("articles.Article.body"))
+
+
+def _task_article_cover(name: str) -> None:
+    """Article.cover_image: fix orientation and size, no-resize formats."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("articles.Article.cover_image"))
+
+
+def _task_review_image(name: str) -> None:
+    """Review.image: cap the original (often a multi-MB PNG screenshot), no-resize formats and the card."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("reviews.Review.image"))
+
+
+def _task_user_avatar(name: str) -> None:
+    """User.image: fix orientation and size, avatar crop."""
+    _normalize_image_file_inplace(_fs_path(name), name)
+    _generate(name, specs_for("users.User.image"))
+
+
+TASKS: dict[str, Callable[[str], None]] = {
+    "product_image": _task_product_image,
+    "product_card": _task_product_card,
+    "gallery_image": _task_gallery_image,
+    "category_icon": _task_category_icon,
+    "category_seo": _task_category_seo,
+    "article_image": _task_article_image,
+    "article_cover": _task_article_cover,
+    "review_image": _task_review_image,
+    "user_avatar": _task_user_avatar,
+}
+
+# Registry key (common.image_specs) -> task that brings that field's outputs up to date
+FIELD_TASKS: dict[str, str] = {
+    "goods.Products.image": "product_image",
+    "goods.Products.card_image": "product_card",
+    "goods.ProductImage.image": "gallery_image",
+    "goods.Categories.image": "category_icon",
+    "goods.Categories.seo_image": "category_seo",
+    "articles.Article.body": "article_image",
+    "articles.Article.cover_image": "article_cover",
+    "reviews.Review.image": "review_image",
+    "users.User.image": "user_avatar",
+}
+
+
+# ---------------------------------------------------------------------------
+# On-demand generation (/media/v/<root>_<WxH>.<avif|webp>)
+# ---------------------------------------------------------------------------
+
+_VARIANT_NAME_RE = re.compile(r"^(?P<root>[\w\-./ ]+)_(?P<size>\d{1,4}x\d{1,4})\.(?P<fmt>avif|webp)$")
+# Originals are searched for by extension next to the requested variant
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".JPG", ".JPEG", ".PNG")
+
+
+@contextmanager
+def _variant_lock(name: str):
+    """Exclusive per-variant lock shared by all gunicorn workers on this host."""
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    lock_dir = os.path.join(settings.MEDIA_ROOT, ".variant-locks")
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, hashlib.sha1(name.encode("utf-8")).hexdigest()[:20] + ".lock")
+    with open(lock_path, "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _find_source(root: str) -> Optional[str]:
+    for ext in SOURCE_EXTENSIONS:
+        if os.path.isfile(_fs_path(root + ext)):
+            return root + ext
+    return None
+
+
+def ensure_variant(name: str) -> Optional[str]:
+    """Return the filesystem path of variant `name`, generating it first if needed.
+
+    Only sizes registered in common.image_specs are served; anything else, path
+    traversal or a missing original returns None.
+    """
+    m = _VARIANT_NAME_RE.match(name or "")
+    if not m or name.startswith("/") or ".." in name.split("/"):
+        return None
+    spec = spec_for_size(m.group("size"))
+    if spec is None or m.group("fmt") not in spec.formats:
+        return None
+
+    out_path = _fs_path(name)
+    if os.path.isfile(out_path):
+        return out_path
+
+    source = _find_source(m.group("root"))
+    if source is None:
+        return None
+    with _variant_lock(name):
+        # Another worker may have produced it while we waited
+        if not os.path.isfile(out_path):
+            sync_variants(source, _fs_path(source), [spec])
+    return out_path if os.path.isfile(out_path) else None
+
+
+# ---------------------------------------------------------------------------
+# Producer side
+# ---------------------------------------------------------------------------
+
+def enqueue(source: str, task: str) -> None:
+    """Queue `task` for the stored file `source` once the current transaction commits.
+
+    A pending job for the same (source, task) absorbs repeated saves.
+    With settings.IMAGE_JOBS_EAGER the task runs inline instead (local dev without a worker).
+    """
+    if not source or task not in TASKS:
+        return
+
+    def _submit():
+        if getattr(settings, "IMAGE_JOBS_EAGER", False):
+            try:
+                TASKS[task](source)
+            except Exception:
+                logger.exception("image task %s failed for %s", task, source)
+            return
+        try:
+            with transaction.atomic():
+                ImageJob.objects.get_or_create(source=source, task=task, status=ImageJob.Status.PENDING)
+        except IntegrityError:
+            # Another process queued the same job concurrently
+            pass
+
+    transaction.on_commit(_submit)
+
+
+# ---------------------------------------------------------------------------
+# Consumer side
+# ---------------------------------------------------------------------------
+
+def claim_next() -> Optional[ImageJob]:
+    """Atomically take the oldest due pending job; concurrent workers skip locked rows."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.Status.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImageJob.Status.RUNNING
+        job.attempts += 1
+        job.locked_at = now
+        job.save(update_fields=["status", "attempts", "locked_at", "updated_at"])
+    return job
+
+
+def _back_to_pending(job: ImageJob, run_after) -> None:
+    """Return a job to the queue; if a newer pending duplicate exists, this one is redundant."""
+    job.status = ImageJob.Status.PENDING
+    job.run_after = run_after
+    job.locked_at = None
+    try:
+        with transaction.atomic():
+            job.save(update_fields=["status", "run_after", "locked_at", "last_error", "updated_at"])
+    except IntegrityError:
+        job.delete()
+
+
+def run_job(job: ImageJob, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+    """Execute a claimed job. Returns True on success; failures are retried with backoff."""
+    handler = TASKS.get(job.task)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown image task '{job.task}'")
+        handler(job.source)
+    except Exception as e:
+        job.last_error = f"{type(e).__name__}: {e}"
+        logger.warning("image job #%s %s failed (attempt %s): %s", job.pk, job.task, job.attempts, job.last_error)
+        # An oversized source fails the same way every time: no retries
+        if handler is not None and job.attempts < max_attempts and not isinstance(e, ImageTooLarge):
+            delay = RETRY_BASE_SECONDS * (4 ** (job.attempts - 1))
+            _back_to_pending(job, timezone.now() + timedelta(seconds=delay))
+        else:
+            job.status = ImageJob.Status.FAILED
+            job.locked_at = None
+            job.save(update_fields=["status", "locked_at", "last_error", "updated_at"])
+        return False
+
+    job.status = ImageJob.Status.DONE
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=["status", "locked_at", "last_error", "updated_at"])
+    return True
+
+
+def requeue_stale(stale_after: int) -> int:
+    """Put back jobs left RUNNING by a killed worker (locked longer than `stale_after` seconds)."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    count = 0
+    for job in ImageJob.objects.filter(status=ImageJob.Status.RUNNING, locked_at__lt=cutoff):
+        _back_to_pending(job, timezone.now())
+        count += 1
+    return count
+
+
+def purge_done(older_than_days: int) -> int:
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = ImageJob.objects.filter(status=ImageJob.Status.DONE, updated_at__lt=cutoff).delete()
+    return deleted
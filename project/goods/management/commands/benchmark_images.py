@@ -0,0 +1,543 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.files.storage import default_storage
+from django.conf import settings
+from PIL import Image, ImageFilter
+
+from goods.models import Categories, Products
+from common import image_specs
+from common.image_metrics import NUMPY_AVAILABLE, psnr, ssim
+from common.image_utils import (
+    AVIF_AVAILABLE,
+    VariantSpec,
+    _blur_extend_canvas,
+    _decode_at_scale,
+    _downscale,
+    _fit_box,
+    _fit_box_contain,
+    _needed_scale,
+    _open_image,
+    _shared_downscale,
+    build_variant_paths,
+    card_specs,
+    generate_variants,
+    max_pixels,
+    max_side,
+    save_avif,
+    save_avif_optimized,
+    save_webp,
+    side_cap_scale,
+)
+
+
+def _fs_path(name: str) -> str:
+    try:
+        return default_storage.path(name)  # type: ignore[attr-defined]
+    except Exception:
+        return os.path.join(settings.MEDIA_ROOT, name)
+
+
+# Product save workload: no-resize AVIF/WebP + 230x160/200x160 cover cards
+CARD_SIZES = ((230, 160), (200, 160))
+
+
+def _legacy_product_variants(src: str) -> None:
+    """What a product save did before the pipeline: two full decodes, full-res resizes."""
+    img = _open_image(src)
+    if img.mode == "P":
+        img = img.convert("RGBA")
+    if img.mode not in ("RGB", "RGBA", "LA"):
+        img = img.convert("RGB")
+    root, _ext = os.path.splitext(src)
+    if AVIF_AVAILABLE:
+        save_avif_optimized(img, f"{root}.avif", image_type="product")
+    save_webp(img, f"{root}.webp", quality=80)
+
+    img = _open_image(src)
+    for w, h in CARD_SIZES:
+        canvas = _fit_box(img, (w, h))
+        save_webp(canvas, build_variant_paths(src, f"{w}x{h}", "webp"), quality=82)
+        if AVIF_AVAILABLE:
+            save_avif(canvas, build_variant_paths(src, f"{w}x{h}", "avif"), quality=60)
+
+
+def _pipeline_product_variants(src: str) -> None:
+    generate_variants(src, [
+        VariantSpec(image_type="product"),
+        *(VariantSpec(size=s, fit="cover", quality_webp=82, quality_avif=60) for s in CARD_SIZES),
+    ], overwrite=True)
+
+
+def _legacy_blur_extend_canvas(img: Image.Image, size, blur_radius: int = 24) -> Image.Image:
+    """_blur_extend_canvas() before the low-resolution blur: full-size blur, two resizes."""
+    bg = _fit_box(img, size).filter(ImageFilter.GaussianBlur(blur_radius))
+    fg = _fit_box_contain(img, size)
+    out = Image.new("RGBA", size)
+    out.paste(bg, (0, 0))
+    out.alpha_composite(fg)
+    return out
+
+
+def _per_call_ms(func, calls: int = 10) -> float:
+    func()  # warm-up
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) * 1000 / calls
+
+
+def _measure(func, src: str) -> dict:
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    func(src)
+    return {"cpu_ms": round((time.process_time() - cpu0) * 1000, 1),
+            "wall_ms": round((time.perf_counter() - wall0) * 1000, 1)}
+
+
+def _rss_kb(field: str) -> int:
+    """VmRSS / VmHWM of this process in KiB (Linux); ru_maxrss elsewhere."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _reset_peak_rss() -> None:
+    # Linux >= 4.0: "5" resets VmHWM to the current RSS
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+MEMORY_CASES = {
+    "legacy": _legacy_product_variants,
+    "bounded": _pipeline_product_variants,
+}
+
+
+def _peak_rss_child(payload: tuple[str, str, str]) -> dict:
+    """Run one case in a fresh worker process; returns its peak RSS growth."""
+    case, src, tmp = payload
+    copy = os.path.join(tmp, os.path.basename(src))
+    shutil.copyfile(src, copy)
+    _reset_peak_rss()
+    base_kb = _rss_kb("VmRSS")
+    MEMORY_CASES[case](copy)
+    peak_kb = _rss_kb("VmHWM")
+    return {"peak_mb": round((peak_kb - base_kb) / 1024, 1)}
+
+
+_CARD = image_specs.CARD_SIZES[0]
+_THUMB = image_specs.THUMB_SIZES[0]
+_Q_CARD_AVIF, _Q_CARD_WEBP = image_specs.Q_CARD
+_Q_ICON_AVIF, _Q_ICON_WEBP = image_specs.Q_ICON
+
+# name -> (transform or None, format, encoder); transforms get the source as the
+# pipeline sees it (capped to IMAGE_MAX_SIDE), with registry sizes and presets
+ENCODER_CASES = {
+    "webp": (None, "webp", lambda img, out: save_webp(img, out, quality=80)),
+    "avif": (None, "avif", lambda img, out: save_avif(img, out)),
+    "avif_optimized_product": (None, "avif", lambda img, out: save_avif_optimized(img, out, image_type="product")),
+    "avif_optimized_background": (None, "avif", lambda img, out: save_avif_optimized(img, out, image_type="background")),
+    "webp_adaptive": (None, "webp", lambda img, out: save_webp(img, out, target_ssim=image_specs.TARGET_SSIM_PHOTO)),
+    "avif_adaptive": (None, "avif", lambda img, out: save_avif_optimized(
+        img, out, image_type="product", target_ssim=image_specs.TARGET_SSIM_PHOTO)),
+    f"fit_box_{_CARD[0]}x{_CARD[1]}.webp": (
+        lambda img: _fit_box(img, _CARD), "webp", lambda img, out: save_webp(img, out, quality=_Q_CARD_WEBP)),
+    f"fit_box_{_CARD[0]}x{_CARD[1]}.avif": (
+        lambda img: _fit_box(img, _CARD), "avif", lambda img, out: save_avif(img, out, quality=_Q_CARD_AVIF)),
+    f"fit_box_contain_{_THUMB[0]}x{_THUMB[1]}.webp": (
+        lambda img: _fit_box_contain(img, _THUMB), "webp", lambda img, out: save_webp(img, out, quality=_Q_ICON_WEBP)),
+    f"fit_box_contain_{_THUMB[0]}x{_THUMB[1]}.avif": (
+        lambda img: _fit_box_contain(img, _THUMB), "avif", lambda img, out: save_avif(img, out, quality=_Q_ICON_AVIF)),
+    f"blur_extend_{_CARD[0]}x{_CARD[1]}.webp": (
+        lambda img: _blur_extend_canvas(img, _CARD), "webp", lambda img, out: save_webp(img, out, quality=_Q_CARD_WEBP)),
+    f"blur_extend_{_CARD[0]}x{_CARD[1]}.avif": (
+        lambda img: _blur_extend_canvas(img, _CARD), "avif", lambda img, out: save_avif(img, out, quality=_Q_CARD_AVIF)),
+}
+
+# Default regression thresholds against --baseline
+TIME_TOLERANCE = 0.25   # encode time may grow 25% (timings are noisy)
+BYTES_TOLERANCE = 0.02  # output may grow 2%
+SSIM_TOLERANCE = 0.005
+PSNR_TOLERANCE = 0.2    # dB, used when either report has no SSIM
+
+
+def _encoder_source(path: str) -> Image.Image:
+    """The source as generate_variants() encodes it: capped to IMAGE_MAX_SIDE, RGB/RGBA."""
+    with Image.open(path) as probe:
+        size = probe.size
+    scale = side_cap_scale(size)
+    img = _decode_at_scale(path, scale)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+    return _downscale(img, scale, size)
+
+
+def _run_encoder_case(img: Image.Image, case: str, out_path: str, repeat: int) -> dict:
+    transform, _fmt, encode = ENCODER_CASES[case]
+    best = None
+    for _ in range(repeat):
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        _reset_peak_rss()
+        base_kb = _rss_kb("VmRSS")
+        t0 = time.perf_counter()
+        canvas = transform(img) if transform else img
+        t1 = time.perf_counter()
+        encode(canvas, out_path)
+        t2 = time.perf_counter()
+        run = {
+            "transform_ms": round((t1 - t0) * 1000, 1),
+            "encode_ms": round((t2 - t1) * 1000, 1),
+            "peak_mb": round((_rss_kb("VmHWM") - base_kb) / 1024, 1),
+        }
+        if best is None or run["transform_ms"] + run["encode_ms"] < best["transform_ms"] + best["encode_ms"]:
+            best = run
+    best["bytes"] = os.path.getsize(out_path)
+    with Image.open(out_path) as encoded:
+        encoded.load()
+        best["psnr"] = psnr(canvas, encoded)
+        best["ssim"] = ssim(canvas, encoded)
+    return best
+
+
+def _regressions(report: dict, baseline: dict, tolerances: dict) -> list[str]:
+    """Human-readable regressions of `report` against `baseline` (files matched by basename)."""
+    base_rows = {os.path.basename(r["file"]): r["cases"] for r in baseline.get("files", [])}
+    found = []
+    for row in report["files"]:
+        base_cases = base_rows.get(os.path.basename(row["file"]))
+        if not base_cases:
+            continue
+        for case, cur in row["cases"].items():
+            old = base_cases.get(case)
+            if not old:
+                continue
+            label = f"{os.path.basename(row['file'])} {case}"
+            cur_ms, old_ms = cur["transform_ms"] + cur["encode_ms"], old["transform_ms"] + old["encode_ms"]
+            if old_ms and cur_ms > old_ms * (1 + tolerances["time"]):
+                found.append(f"{label}: time {old_ms:.0f}ms -> {cur_ms:.0f}ms")
+            if old["bytes"] and cur["bytes"] > old["bytes"] * (1 + tolerances["bytes"]):
+                found.append(f"{label}: size {old['bytes']}B -> {cur['bytes']}B")
+            if cur.get("ssim") is not None and old.get("ssim") is not None:
+                if cur["ssim"] < old["ssim"] - tolerances["ssim"]:
+                    found.append(f"{label}: SSIM {old['ssim']} -> {cur['ssim']}")
+            elif cur["psnr"] < old["psnr"] - tolerances["psnr"]:
+                found.append(f"{label}: PSNR {old['psnr']}dB -> {cur['psnr']}dB")
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the image pipeline on real product images (outputs go to a temp dir).\n"
+        "Suite 'pipeline': legacy two-decode product variants vs decode-once generate_variants().\n"
+        "Suite 'memory': peak RSS growth of one product save, full-resolution decode vs the bounded\n"
+        "pipeline (IMAGE_MAX_SIDE / IMAGE_MAX_PIXELS), each run in a fresh process.\n"
+        "Suite 'encoders': time, peak memory, bytes and PSNR/SSIM of every encoder path in\n"
+        "common.image_utils per file; --baseline compares against a previous --json report.\n"
+        "Suite 'blur': per-card time of the blur-extend canvas (common.image_utils.card_specs), full-size\n"
+        "blur vs the low-resolution blur, on the base the pipeline renders cards from.\n"
+        "Suite 'tags': render time of the <picture> template tags per product/category, built on\n"
+        "every call vs served from the fragment cache (IMAGE_FRAGMENT_CACHE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suite", choices=["pipeline", "memory", "encoders", "blur", "tags"], default="pipeline",
+                            help="Which benchmark to run (default: pipeline)")
+        parser.add_argument("--files", nargs="*", default=None,
+                            help="Explicit image paths instead of product images")
+        parser.add_argument("--corpus", default=None,
+                            help="Directory of fixture images (jpg/png/webp) instead of product images")
+        parser.add_argument("--limit", type=int, default=10,
+                            help="Max product images to benchmark (default: 10)")
+        parser.add_argument("--repeat", type=int, default=1,
+                            help="Runs per file; the fastest run is reported (default: 1)")
+        parser.add_argument("--synthetic", default=None, metavar="WxH",
+                            help="Benchmark a generated JPEG of this size (e.g. 8000x6000) instead")
+        parser.add_argument("--max-peak-mb", type=float, default=None,
+                            help="memory: fail if the bounded pipeline's peak RSS growth exceeds this")
+        parser.add_argument("--cases", default=None,
+                            help=f"encoders: comma-separated subset of {', '.join(ENCODER_CASES)}")
+        parser.add_argument("--baseline", default=None,
+                            help="encoders: fail on regressions against this earlier --json report")
+        parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+        parser.add_argument("--bytes-tolerance", type=float, default=BYTES_TOLERANCE)
+        parser.add_argument("--ssim-tolerance", type=float, default=SSIM_TOLERANCE)
+        parser.add_argument("--psnr-tolerance", type=float, default=PSNR_TOLERANCE)
+        parser.add_argument("--json", dest="json_out", default=None,
+                            help="Write the full report as JSON to this path")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as synthetic_dir:
+            if options["suite"] == "tags":
+                files = []
+            elif options["synthetic"]:
+                files = [self._synthetic_file(options["synthetic"], synthetic_dir)]
+            else:
+                files = self._collect_files(options)
+            if not files and options["suite"] != "tags":
+                raise CommandError("No images to benchmark")
+
+            if options["suite"] == "tags":
+                report = self._run_tags_suite(options["limit"], max(1, options["repeat"]))
+            elif options["suite"] == "memory":
+                report = self._run_memory_suite(files, options["max_peak_mb"])
+            elif options["suite"] == "blur":
+                report = self._run_blur_suite(files, max(1, options["repeat"]))
+            elif options["suite"] == "encoders":
+                report = self._run_encoders_suite(files, self._cases(options["cases"]), max(1, options["repeat"]))
+            else:
+                report = self._run_pipeline_suite(files, max(1, options["repeat"]))
+
+        if options["json_out"]:
+            with open(options["json_out"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Report written to {options['json_out']}")
+
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as f:
+                baseline = json.load(f)
+            regressions = _regressions(report, baseline, {
+                "time": options["time_tolerance"], "bytes": options["bytes_tolerance"],
+                "ssim": options["ssim_tolerance"], "psnr": options["psnr_tolerance"],
+            })
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {line}"))
+            if regressions:
+                report["failed"] = f"{len(regressions)} regression(s) against {options['baseline']}"
+            else:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+        if report.get("failed"):
+            raise CommandError(report["failed"])
+
+    def _synthetic_file(self, size: str, directory: str) -> str:
+        try:
+            width, height = (int(v) for v in size.lower().split("x"))
+        except ValueError:
+            raise CommandError(f"--synthetic expects WxH, got '{size}'")
+        # Gradient + noise, so the encoder has real detail to work on
+        img = Image.linear_gradient("L").resize((width, height))
+        noise = Image.effect_noise((width, height), 64)
+        path = os.path.join(directory, f"synthetic_{width}x{height}.jpg")
+        Image.merge("RGB", (img, noise, img.transpose(Image.FLIP_LEFT_RIGHT))).save(path, quality=90)
+        return path
+
+    def _cases(self, cases_str) -> list[str]:
+        cases = [c.strip() for c in cases_str.split(",") if c.strip()] if cases_str else list(ENCODER_CASES)
+        unknown = [c for c in cases if c not in ENCODER_CASES]
+        if unknown:
+            raise CommandError(f"Unknown case(s): {', '.join(unknown)}")
+        return cases
+
+    def _collect_files(self, options) -> list[str]:
+        if options["files"]:
+            return [p for p in options["files"] if os.path.isfile(p)]
+        if options["corpus"]:
+            return sorted(
+                e.path for e in os.scandir(options["corpus"])
+                if e.is_file() and e.name.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+            )
+        files = []
+        for p in Products.objects.exclude(image="").exclude(image__isnull=True)[: options["limit"]]:
+            path = _fs_path(p.image.name)
+            if os.path.isfile(path):
+                files.append(path)
+        return files
+
+    def _best_of(self, func, src: str, tmp: str, repeat: int) -> dict:
+        best = None
+        for _ in range(repeat):
+            # Fresh copy per run so nothing is skipped as "already exists"
+            for entry in os.scandir(tmp):
+                os.remove(entry.path)
+            copy = os.path.join(tmp, os.path.basename(src))
+            shutil.copyfile(src, copy)
+            run = _measure(func, copy)
+            if best is None or run["cpu_ms"] < best["cpu_ms"]:
+                best = run
+        return best
+
+    def _run_memory_suite(self, files: list[str], limit_mb) -> dict:
+        rows = []
+        self.stdout.write(
+            f"IMAGE_MAX_SIDE={max_side()}, IMAGE_MAX_PIXELS={max_pixels()}\n"
+            f"{'file':40} {'size':>11} {'legacy peak':>12} {'bounded peak':>13}"
+        )
+        # Forked workers must not share the parent's DB socket
+        from django.db import connections
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as tmp:
+            for src in files:
+                with Image.open(src) as probe:
+                    size = "%dx%d" % probe.size
+                row = {"file": src, "size": size}
+                for case in MEMORY_CASES:
+                    # One process per run: peak RSS never goes down within a process
+                    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                        try:
+                            row[case] = pool.submit(_peak_rss_child, (case, src, tmp)).result()
+                        except Exception as e:
+                            row[case] = {"peak_mb": None, "error": f"{type(e).__name__}: {e}"}
+                    for entry in os.scandir(tmp):
+                        os.remove(entry.path)
+                rows.append(row)
+                legacy, bounded = row["legacy"]["peak_mb"], row["bounded"]["peak_mb"]
+                self.stdout.write(
+                    f"{os.path.basename(src)[:40]:40} {size:>11} "
+                    f"{legacy if legacy is not None else 'error':>10}MB "
+                    f"{bounded if bounded is not None else 'error':>11}MB"
+                )
+                for case in MEMORY_CASES:
+                    if "error" in row[case]:
+                        self.stdout.write(self.style.WARNING(f"   {case}: {row[case]['error']}"))
+
+        peaks = [r["bounded"]["peak_mb"] for r in rows if r["bounded"]["peak_mb"] is not None]
+        worst = max(peaks) if peaks else None
+        report = {"suite": "memory", "max_side": max_side(), "max_pixels": max_pixels(),
+                  "files": rows, "bounded_peak_mb": worst}
+        if worst is not None:
+            self.stdout.write(self.style.SUCCESS(f"Worst bounded peak RSS growth: {worst}MB"))
+        if limit_mb is not None and (worst is None or worst > limit_mb):
+            report["failed"] = f"Bounded pipeline peak {worst}MB exceeds --max-peak-mb={limit_mb}"
+        return report
+
+    def _run_blur_suite(self, files: list[str], repeat: int) -> dict:
+        specs = card_specs()
+        rows = []
+        self.stdout.write(f"{'file':40} {'card':>8} {'before':>9} {'after':>9} {'speedup':>8} {'SSIM':>8}")
+        for src in files:
+            with Image.open(src) as probe:
+                source_size = probe.size
+            # The base generate_variants() cuts the cards from
+            scale = max(_needed_scale(source_size, spec) for spec in specs)
+            base = _shared_downscale(_decode_at_scale(src, scale), scale, source_size)
+            for spec in specs:
+                before = min(_per_call_ms(lambda: _legacy_blur_extend_canvas(base, spec.size)) for _ in range(repeat))
+                after = min(_per_call_ms(lambda: _blur_extend_canvas(base, spec.size)) for _ in range(repeat))
+                similarity = ssim(_legacy_blur_extend_canvas(base, spec.size), _blur_extend_canvas(base, spec.size))
+                rows.append({"file": src, "card": spec.size_name, "base": "%dx%d" % base.size,
+                             "before_ms": round(before, 2), "after_ms": round(after, 2), "ssim_vs_before": similarity})
+                self.stdout.write(
+                    f"{os.path.basename(src)[:40]:40} {spec.size_name:>8} {before:>7.2f}ms {after:>7.2f}ms "
+                    f"{before / after if after else 0:>7.1f}x {similarity if similarity is not None else '-':>8}"
+                )
+        total_before = sum(r["before_ms"] for r in rows)
+        total_after = sum(r["after_ms"] for r in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"Per card: before {total_before / len(rows):.2f}ms, after {total_after / len(rows):.2f}ms"
+        ))
+        return {"suite": "blur", "cards": rows,
+                "per_card_ms": {"before": round(total_before / len(rows), 2), "after": round(total_after / len(rows), 2)}}
+
+    def _run_tags_suite(self, limit: int, repeat: int) -> dict:
+        from goods.templatetags import media_extras as tags
+
+        cache, _timeout = tags._fragment_cache()
+        if cache is None:
+            raise CommandError("Fragment cache disabled (IMAGE_FRAGMENT_CACHE_TIMEOUT=0): nothing to compare")
+        products = list(
+            Products.objects.exclude(image="").order_by("pk")
+            .prefetch_related("images").with_image_manifest("image", "card_image", "images.image")[:limit]
+        )
+        categories = list(Categories.objects.order_by("pk").with_image_manifest("image")[:limit])
+        if not products and not categories:
+            raise CommandError("No products or categories to render")
+
+        cases = [
+            ("product_card_picture", tags.product_card_picture, products, ()),
+            ("responsive_product_picture", tags.responsive_product_picture, products, ()),
+            ("product_image_picture", tags.product_image_picture, products, ("400x300",)),
+            ("category_icon_picture", tags.category_icon_picture, categories, ("128x128",)),
+        ]
+        rows = []
+        self.stdout.write(f"{'tag':28} {'objects':>8} {'cacheable':>10} {'built':>9} {'cached':>9} {'speedup':>8}")
+        for name, tag, objects, args in cases:
+            if not objects:
+                continue
+            cacheable = sum(1 for obj in objects if tag.fragment_key(obj, *args))
+            for obj in objects:
+                tag(obj, *args)  # fill the fragment cache
+            built = min(_per_call_ms(lambda: [tag.render(obj, *args) for obj in objects]) for _ in range(repeat))
+            cached = min(_per_call_ms(lambda: [tag(obj, *args) for obj in objects]) for _ in range(repeat))
+            built_us, cached_us = built * 1000 / len(objects), cached * 1000 / len(objects)
+            rows.append({"tag": name, "objects": len(objects), "cacheable": cacheable,
+                         "built_us": round(built_us, 1), "cached_us": round(cached_us, 1)})
+            self.stdout.write(
+                f"{name:28} {len(objects):>8} {cacheable:>10} {built_us:>7.1f}us {cached_us:>7.1f}us "
+                f"{built_us / cached_us if cached_us else 0:>7.1f}x"
+            )
+        if products:
+            # The whole grid through resolve_pictures: one get_many() instead of a get() per card
+            batch = min(_per_call_ms(lambda: tags.resolve_pictures(products, "card")) for _ in range(repeat))
+            rows.append({"tag": "resolve_pictures (card)", "objects": len(products),
+                         "cached_us": round(batch * 1000 / len(products), 1)})
+            self.stdout.write(f"{'resolve_pictures (card)':28} {len(products):>8} {'':>10} {'':>9} "
+                              f"{batch * 1000 / len(products):>7.1f}us")
+        return {"suite": "tags", "cache": getattr(settings, "IMAGE_FRAGMENT_CACHE", "image_fragments"),
+                "cache_backend": type(cache).__name__, "repeat": repeat, "tags": rows}
+
+    def _run_encoders_suite(self, files: list[str], cases: list[str], repeat: int) -> dict:
+        if not AVIF_AVAILABLE:
+            cases = [c for c in cases if ENCODER_CASES[c][1] != "avif"]
+            self.stdout.write(self.style.WARNING("AVIF plugin not available: AVIF cases skipped"))
+        if not NUMPY_AVAILABLE:
+            self.stdout.write(self.style.WARNING("numpy not installed: SSIM not computed (PSNR only)"))
+        rows = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for src in files:
+                img = _encoder_source(src)
+                row = {"file": src, "size": "%dx%d" % img.size, "cases": {}}
+                self.stdout.write(f"{os.path.basename(src)} ({row['size']})")
+                for case in cases:
+                    out_path = os.path.join(tmp, f"out.{ENCODER_CASES[case][1]}")
+                    res = row["cases"][case] = _run_encoder_case(img, case, out_path, repeat)
+                    self.stdout.write(
+                        f"   {case:32} {res['transform_ms'] + res['encode_ms']:>8.0f}ms {res['bytes'] / 1024:>8.1f}KB "
+                        f"PSNR {res['psnr']:>6.2f}dB SSIM {res['ssim'] if res['ssim'] is not None else '-':>7} "
+                        f"peak {res['peak_mb']:>6.1f}MB"
+                    )
+                rows.append(row)
+        return {"suite": "encoders", "avif": AVIF_AVAILABLE, "numpy": NUMPY_AVAILABLE,
+                "max_side": max_side(), "repeat": repeat, "files": rows}
+
+    def _run_pipeline_suite(self, files: list[str], repeat: int) -> dict:
+        rows = []
+        self.stdout.write(f"{'file':40} {'legacy cpu':>11} {'pipeline cpu':>13} {'saved':>7}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for src in files:
+                legacy = self._best_of(_legacy_product_variants, src, tmp, repeat)
+                pipeline = self._best_of(_pipeline_product_variants, src, tmp, repeat)
+                saved = 100.0 * (legacy["cpu_ms"] - pipeline["cpu_ms"]) / legacy["cpu_ms"] if legacy["cpu_ms"] else 0.0
+                rows.append({"file": src, "legacy": legacy, "pipeline": pipeline, "cpu_saved_pct": round(saved, 1)})
+                self.stdout.write(
+                    f"{os.path.basename(src)[:40]:40} {legacy['cpu_ms']:>9.0f}ms {pipeline['cpu_ms']:>11.0f}ms {saved:>6.1f}%"
+                )
+
+        total_legacy = sum(r["legacy"]["cpu_ms"] for r in rows)
+        total_pipeline = sum(r["pipeline"]["cpu_ms"] for r in rows)
+        per_product = (total_legacy - total_pipeline) / len(rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"Total CPU: legacy {total_legacy:.0f}ms, pipeline {total_pipeline:.0f}ms; "
+            f"saved {per_product:.0f}ms per product"
+        ))
+        return {"suite": "pipeline", "avif": AVIF_AVAILABLE, "files": rows,
+                "total_cpu_ms": {"legacy": total_legacy, "pipeline": total_pipeline},
+                "saved_cpu_ms_per_product": round(per_product, 1)}
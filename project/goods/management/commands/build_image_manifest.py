@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+import re
+
+from django.core.management.base import BaseCommand
+from django.core.files.storage import default_storage
+from django.conf import settings
+from PIL import Image
+
+from goods.manifest import record_placeholder, record_variants, source_sha256
+from goods.models import Categories, ImageAsset, Products, ProductImage
+from common.image_specs import specs_for
+from common.image_utils import VariantResult
+
+
+def _fs_path(name: str) -> str:
+    try:
+        return default_storage.path(name)  # type: ignore[attr-defined]
+    except Exception:
+        return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def _sources() -> dict[str, str]:
+    """{storage name: registry key} of every original image."""
+    sources = {}
+    for p in Products.objects.all():
+        sources.setdefault(p.image.name, "goods.Products.image")
+        sources.setdefault(p.card_image.name, "goods.Products.card_image")
+    for pi in ProductImage.objects.all():
+        sources.setdefault(pi.image.name, "goods.ProductImage.image")
+    for c in Categories.objects.all():
+        sources.setdefault(c.image.name, "goods.Categories.image")
+        sources.setdefault(c.seo_image.name, "goods.Categories.seo_image")
+    sources.pop("", None)
+    sources.pop(None, None)
+    return sources
+
+
+class Command(BaseCommand):
+    help = (
+        "Record AVIF/WebP variants that already exist on disk in the variant manifest.\n"
+        "Run once after deploying the manifest; new variants are recorded by the image jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only print what would be recorded")
+        parser.add_argument("--trust-existing", action="store_true",
+                            help="Mark files of registered sizes as made from the current original with the "
+                                 "current presets, so they are not re-encoded (default: re-encode on next run)")
+
+    def handle(self, *args, **options):
+        dry_run: bool = options["dry_run"]
+        trust: bool = options["trust_existing"]
+        listings: dict[str, list[str]] = {}
+        sources = variants = placeholders = 0
+
+        for name, key in _sources().items():
+            src_path = _fs_path(name)
+            directory, filename = os.path.split(src_path)
+            if directory not in listings:
+                try:
+                    listings[directory] = [e.name for e in os.scandir(directory) if e.is_file()]
+                except OSError:
+                    listings[directory] = []
+            # <root>.<fmt> and <root>_<WxH>.<fmt>
+            pattern = re.compile(rf"^{re.escape(os.path.splitext(filename)[0])}(?:_(\d+x\d+))?\.(avif|webp)$")
+
+            result: dict = {}
+            for entry in listings[directory]:
+                m = pattern.match(entry)
+                if not m:
+                    continue
+                path = os.path.join(directory, entry)
+                try:
+                    with Image.open(path) as im:
+                        width, height = im.size
+                except Exception:
+                    # Unreadable variant (or no AVIF plugin): still record the file
+                    width, height = 0, 0
+                result.setdefault(m.group(1) or "", {})[m.group(2)] = VariantResult(
+                    path=path, format=m.group(2), width=width, height=height,
+                    bytes=os.path.getsize(path), created=False,
+                )
+
+            if not result:
+                continue
+            sources += 1
+            variants += sum(len(v) for v in result.values())
+            if dry_run:
+                sizes = ", ".join(sorted(k or "original" for k in result))
+                self.stdout.write(f"Would record {name}: {sizes}")
+                continue
+            sha, params = "", {}
+            if trust and os.path.exists(src_path):
+                sha = source_sha256(name, src_path)
+                params = {(spec.size_name, fmt): spec.params_hash(fmt) for spec in specs_for(key) for fmt in spec.formats}
+            record_variants(name, result, src_path, source_sha256=sha, params=params)
+            # Dimensions/LQIP for the <picture> tags; the image jobs keep them current from now on
+            if os.path.exists(src_path) and ImageAsset.objects.filter(name=name, dominant_color="").exists():
+                record_placeholder(name, src_path)
+                placeholders += 1
+
+        verb = "Would record" if dry_run else "Recorded"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {variants} variant(s) for {sources} source image(s); {placeholders} placeholder(s) computed"
+        ))
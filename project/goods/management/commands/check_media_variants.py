@@ -1,96 +1,192 @@
 from __future__ import annotations
 
+import dataclasses
+import json
 import os
-from typing import Iterable, Tuple
+import time
+from typing import Optional
 
+from django.apps import apps
+from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 from django.core.files.storage import default_storage
+from django.conf import settings
 
+from articles.models import Article
+from goods.image_jobs import FIELD_TASKS, enqueue
+from goods.manifest import sync_variants
 from goods.models import Categories, Products, ProductImage
+from common.image_specs import specs_for
+from common.image_utils import AVIF_AVAILABLE, VariantSpec
+from common.parallel import ParallelCommandMixin
 
 
-def _variant_name(orig_name: str, size: str, ext: str) -> str:
-    root, _ext = os.path.splitext(orig_name)
-    return f"{root}_{size}.{ext}"
-
-
-def _exists(path: str) -> bool:
+def _fs_path(name: str) -> str:
     try:
-        return default_storage.exists(path)
+        return default_storage.path(name)  # type: ignore[attr-defined]
     except Exception:
-        return False
+        return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def _size_label(spec: VariantSpec) -> str:
+    return spec.size_name or "original"
+
+
+# (label, registry key, rows of (title, image FieldFile))
+def _checked_fields():
+    yield "CATEGORY", "goods.Categories.image", (
+        (f"{c.slug or c.id} ({c.name})", c.image) for c in Categories.objects.all())
+    yield "CATEGORY-SEO", "goods.Categories.seo_image", (
+        (f"{c.slug or c.id} ({c.name})", c.seo_image) for c in Categories.objects.all())
+    yield "PRODUCT", "goods.Products.image", (
+        (f"{p.id} {p.name}", p.image) for p in Products.objects.all())
+    yield "PRODUCT-CARD", "goods.Products.card_image", (
+        (f"{p.id} {p.name}", p.card_image) for p in Products.objects.all())
+    yield "PRODUCT-IMG", "goods.ProductImage.image", (
+        (f"{pi.id} of {pi.product_id}", pi.image) for pi in ProductImage.objects.all())
+    yield "ARTICLE-COVER", "articles.Article.cover_image", (
+        (f"{a.id} {a.slug}", a.cover_image) for a in Article.objects.all())
+    if apps.is_installed("reviews"):
+        from reviews.models import Review
+        yield "REVIEW", "reviews.Review.image", (
+            (f"{r.id} {r.title}", r.image) for r in Review.objects.all())
+    yield "AVATAR", "users.User.image", (
+        (f"{u.id} {u.username}", u.image) for u in get_user_model().objects.exclude(image="").exclude(image=None))
+
+
+class _Listings:
+    """One os.scandir() per directory; membership checks are then set lookups."""
+
+    def __init__(self):
+        self._dirs: dict[str, set[str]] = {}
+
+    def exists(self, path: str) -> bool:
+        directory, filename = os.path.split(path)
+        if directory not in self._dirs:
+            try:
+                with os.scandir(directory) as it:
+                    self._dirs[directory] = {e.name for e in it}
+            except OSError:
+                self._dirs[directory] = set()
+        return filename in self._dirs[directory]
+
+    @property
+    def scanned(self) -> int:
+        return len(self._dirs)
 
 
-class Command(BaseCommand):
-    help = "Check presence of AVIF/WebP generated variants for categories and products."
+def _repair(payload) -> int:
+    """Worker: (name, src_path, [VariantSpec narrowed to missing formats]) -> sizes written."""
+    name, src_path, specs = payload
+    return len(sync_variants(name, src_path, specs))
+
+
+class Command(ParallelCommandMixin, BaseCommand):
+    help = (
+        "Check presence of AVIF/WebP generated variants for categories, products, article covers, reviews and avatars.\n"
+        "By default every output registered for the field in common.image_specs is checked\n"
+        "against one directory listing per media folder; --fix generates only what is missing."
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("--sizes", default="400x300,800x600,256x192,800x450",
-                            help="Comma-separated sizes to check (WxH)")
+        parser.add_argument("--sizes", default=None,
+                            help="Comma-separated registered sizes to check (WxH, 'original') instead of all")
         parser.add_argument("--only-missing", action="store_true",
                             help="Print only items missing any variant")
+        parser.add_argument("--json", dest="json_out", default=None,
+                            help="Write the report as JSON to this path ('-' for stdout)")
+        parser.add_argument("--fix", action="store_true",
+                            help="Generate the missing variants (in parallel with --workers)")
+        parser.add_argument("--queue", action="store_true",
+                            help="With --fix: queue image jobs for run_image_worker instead of generating here")
+        self.add_parallel_arguments(parser)
 
     def handle(self, *args, **options):
-        sizes_str: str = options["sizes"]
-        only_missing: bool = options.get("only_missing", False)
-        sizes: Tuple[str, ...] = tuple(s.strip() for s in sizes_str.split(",") if s.strip())
-
-        self.stdout.write(self.style.WARNING("Checking category images..."))
-        cat_total = 0
-        cat_missing = 0
-        for cat in Categories.objects.all():
-            img = getattr(cat, "image", None)
-            if not img or not getattr(img, "name", ""):
-                continue
-            cat_total += 1
-            missing_for_cat = []
-            for size in sizes:
-                avif = _variant_name(img.name, size, "avif")
-                webp = _variant_name(img.name, size, "webp")
-                ok_avif = _exists(avif)
-                ok_webp = _exists(webp)
-                if not (ok_avif or ok_webp):
-                    missing_for_cat.append(size)
-            if missing_for_cat:
-                cat_missing += 1
-                self.stdout.write(f"[CATEGORY] {cat.slug or cat.id} ({cat.name}): missing {', '.join(missing_for_cat)}")
-
-        self.stdout.write(self.style.WARNING("Checking product images..."))
-        prod_total = 0
-        prod_missing = 0
-        # main images
-        for p in Products.objects.all():
-            img = getattr(p, "image", None)
-            if not img or not getattr(img, "name", ""):
-                continue
-            prod_total += 1
-            missing_for_prod = []
-            for size in sizes:
-                avif = _variant_name(img.name, size, "avif")
-                webp = _variant_name(img.name, size, "webp")
-                if not (_exists(avif) or _exists(webp)):
-                    missing_for_prod.append(size)
-            if missing_for_prod:
-                prod_missing += 1
-                self.stdout.write(f"[PRODUCT] {p.id} {p.name}: missing {', '.join(missing_for_prod)}")
-
-        # additional images
-        for pi in ProductImage.objects.all():
-            img = getattr(pi, "image", None)
-            if not img or not getattr(img, "name", ""):
+        sizes_str: Optional[str] = options["sizes"]
+        only_sizes = {s.strip() for s in sizes_str.split(",") if s.strip()} if sizes_str else None
+        to_json = options["json_out"] == "-"
+        out = (lambda msg: None) if to_json else self.stdout.write
+
+        started = time.perf_counter()
+        listings = _Listings()
+        totals = {}
+        sources = []  # items with anything missing
+        for label, key, rows in _checked_fields():
+            specs = [s for s in specs_for(key) if only_sizes is None or _size_label(s) in only_sizes]
+            if not specs:
                 continue
-            prod_total += 1
-            missing_for_prod = []
-            for size in sizes:
-                avif = _variant_name(img.name, size, "avif")
-                webp = _variant_name(img.name, size, "webp")
-                if not (_exists(avif) or _exists(webp)):
-                    missing_for_prod.append(size)
-            if missing_for_prod:
-                prod_missing += 1
-                self.stdout.write(f"[PRODUCT-IMG] {pi.id} of {pi.product_id}: missing {', '.join(missing_for_prod)}")
-
-        self.stdout.write("")
-        self.stdout.write(self.style.SUCCESS(f"Categories: total={cat_total}, missing_any={cat_missing}"))
-        self.stdout.write(self.style.SUCCESS(f"Products: total_images={prod_total}, missing_any={prod_missing}"))
-        self.stdout.write(self.style.NOTICE("Tip: run 'python manage.py generate_category_icons --size 800x450' and 'python manage.py convert_product_images --sizes 400x300,800x600,256x192'"))
+            out(self.style.WARNING(f"Checking {key} ({', '.join(_size_label(s) for s in specs)})..."))
+            total = missing = missing_sources = 0
+            seen = set()
+            for title, img in rows:
+                name = getattr(img, "name", "") if img else ""
+                if not name or name in seen:
+                    continue
+                seen.add(name)
+                total += 1
+                src_path = _fs_path(name)
+                if not listings.exists(src_path):
+                    missing_sources += 1
+                    sources.append({"field": key, "title": title, "name": name, "source_missing": True, "missing": []})
+                    out(f"[{label}] {title}: source file missing ({name})")
+                    continue
+                todo = []
+                for spec in specs:
+                    formats = tuple(
+                        fmt for fmt in spec.formats
+                        if (fmt != "avif" or AVIF_AVAILABLE) and not listings.exists(spec.out_path(src_path, fmt))
+                    )
+                    if formats:
+                        todo.append(dataclasses.replace(spec, formats=formats))
+                if todo:
+                    missing += 1
+                    gaps = [f"{_size_label(s)}.{fmt}" for s in todo for fmt in s.formats]
+                    sources.append({"field": key, "title": title, "name": name, "source_missing": False,
+                                    "missing": gaps, "_specs": todo, "_path": src_path})
+                    out(f"[{label}] {title}: missing {', '.join(gaps)}")
+            totals[key] = {"total": total, "missing_any": missing, "source_missing": missing_sources}
+        elapsed = time.perf_counter() - started
+
+        out("")
+        for key, t in totals.items():
+            out(self.style.SUCCESS(
+                f"{key}: total={t['total']}, missing_any={t['missing_any']}, source_missing={t['source_missing']}"
+            ))
+        out(f"Scanned {listings.scanned} director(ies) in {elapsed:.2f}s")
+
+        fixable = [s for s in sources if not s["source_missing"]]
+        fixed = None
+        if options["fix"] and fixable:
+            fixed = self._fix(fixable, options, out)
+        elif not options["fix"] and fixable:
+            out(self.style.NOTICE("Tip: run with --fix (--workers N) to generate only the missing variants"))
+
+        if options["json_out"]:
+            report = {
+                "elapsed_s": round(elapsed, 3),
+                "directories_scanned": listings.scanned,
+                "avif": AVIF_AVAILABLE,
+                "totals": totals,
+                "items": [{k: v for k, v in s.items() if not k.startswith("_")} for s in sources],
+                "fix": fixed,
+            }
+            if to_json:
+                self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            else:
+                with open(options["json_out"], "w", encoding="utf-8") as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                self.stdout.write(f"Report written to {options['json_out']}")
+
+    def _fix(self, fixable: list[dict], options: dict, out) -> dict:
+        if options["queue"]:
+            for s in fixable:
+                enqueue(s["name"], FIELD_TASKS[s["field"]])
+            out(self.style.SUCCESS(f"Queued {len(fixable)} image job(s) for run_image_worker"))
+            return {"mode": "queue", "queued": len(fixable)}
+
+        items = [(f"{s['field']} {s['title']}", (s["name"], s["_path"], s["_specs"])) for s in fixable]
+        out(f"Generating missing variants for {len(items)} image(s)...")
+        results = self.run_tasks(_repair, items, options, describe=lambda r: f"({r.value} size(s))")
+        self.write_parallel_summary(results)
+        failed = [r.key for r in results if not r.ok]
+        return {"mode": "generate", "ok": len(results) - len(failed), "failed": failed}
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import os
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core.files.storage import default_storage
 from django.conf import settings
 
 from goods.models import Products, ProductImage
-from common.image_utils import generate_icon_variants
+from goods.manifest import sync_variants
+from common.image_specs import specs_for
+from common.parallel import ParallelCommandMixin
 
 
 def _fs_path(name: str) -> str:
@@ -16,25 +18,37 @@ def _fs_path(name: str) -> str:
         return os.path.join(settings.MEDIA_ROOT, name)
 
 
-class Command(BaseCommand):
+def _convert_sizes(payload) -> list[str]:
+    """Worker: (name, src_path, [VariantSpec, ...], force) -> size names that were re-encoded."""
+    name, src_path, specs, force = payload
+    # Stale sizes only, all from a single decode
+    result = sync_variants(name, src_path, specs, force=force)
+    return [size_name for size_name, created in result.items() if created]
+
+
+class Command(ParallelCommandMixin, BaseCommand):
     help = "Convert all product images to WebP/AVIF variants for better performance"
 
     def add_arguments(self, parser):
-        parser.add_argument("--sizes", default="400x300,800x600", 
-                          help="Comma-separated sizes like '400x300,800x600'")
+        parser.add_argument("--sizes", default=None,
+                          help="Comma-separated registered sizes like '400x300,800x600' to limit the run to "
+                               "(default: all sizes registered in common.image_specs)")
         parser.add_argument("--only-missing", action="store_true", 
                           help="Skip if variants already exist")
+        parser.add_argument("--force", action="store_true",
+                          help="Re-encode even variants that are up to date in the manifest")
         parser.add_argument("--dry-run", action="store_true", 
                           help="Show what would be converted without actually doing it")
+        self.add_parallel_arguments(parser)
 
     def handle(self, *args, **options):
-        sizes_str: str = options["sizes"]
+        sizes_str = options["sizes"] or ""
         dry_run: bool = options["dry_run"]
         only_missing: bool = options["only_missing"]
         
         # Parse sizes
         sizes = []
-        for size_str in sizes_str.split(","):
+        for size_str in (x for x in sizes_str.split(",") if x.strip()):
             try:
                 w, h = [int(x.strip()) for x in size_str.strip().split("x", 1)]
                 sizes.append((w, h))
@@ -42,75 +56,66 @@ class Command(BaseCommand):
                 self.stderr.write(self.style.ERROR(f"Invalid size '{size_str}', expected WxH"))
                 continue
 
-        if not sizes:
+        if sizes_str and not sizes:
             self.stderr.write(self.style.ERROR("No valid sizes provided"))
             return 1
 
+        # --sizes narrows the registered specs of each field; a size no field registers is an error
+        keys = ("goods.Products.image", "goods.ProductImage.image")
+        registered = {key: {spec.size: spec for spec in specs_for(key) if spec.size} for key in keys}
+        unknown = [f"{w}x{h}" for w, h in sizes if not any((w, h) in by_size for by_size in registered.values())]
+        if unknown:
+            raise CommandError(
+                f"Size(s) {', '.join(unknown)} not registered for {' or '.join(keys)} in common.image_specs"
+            )
+
         total_processed = 0
         total_converted = 0
+        items = []
 
-        # Process main product images
-        for product in Products.objects.all():
-            if product.image and getattr(product.image, "name", ""):
-                total_processed += 1
-                if self._process_image(product.image, sizes, only_missing, dry_run):
-                    total_converted += 1
-
-        # Process additional product images
-        for product_image in ProductImage.objects.all():
-            if product_image.image and getattr(product_image.image, "name", ""):
-                total_processed += 1
-                if self._process_image(product_image.image, sizes, only_missing, dry_run):
-                    total_converted += 1
+        # Main product images, then additional product images
+        fields = [(p.image, "goods.Products.image") for p in Products.objects.all()]
+        fields += [(pi.image, "goods.ProductImage.image") for pi in ProductImage.objects.all()]
+        for image_field, key in fields:
+            if not image_field or not getattr(image_field, "name", ""):
+                continue
+            total_processed += 1
+            src_path = _fs_path(image_field.name)
+            if not os.path.exists(src_path):
+                continue
+            by_size = registered[key]
+            specs = [by_size[size] for size in sizes if size in by_size] if sizes else list(by_size.values())
+            needed = self._specs_to_convert(src_path, specs, only_missing)
+            if not needed:
+                continue
+            if dry_run:
+                for spec in needed:
+                    self.stdout.write(f"Would convert: {image_field.name} → {spec.size_name}")
+                total_converted += 1
+                continue
+            items.append((image_field.name, (image_field.name, src_path, needed, options["force"])))
 
         if dry_run:
             self.stdout.write(
                 self.style.SUCCESS(f"DRY RUN: Would convert {total_converted} of {total_processed} images")
             )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(f"Converted {total_converted} of {total_processed} images")
-            )
-
-    def _process_image(self, image_field, sizes, only_missing, dry_run):
-        """Process a single image field"""
-        try:
-            src_path = _fs_path(image_field.name)
-            if not os.path.exists(src_path):
-                return False
-
-            converted_any = False
-            for size in sizes:
-                size_name = f"{size[0]}x{size[1]}"
-                
-                if only_missing:
-                    # Check if variants already exist
-                    root, _ = os.path.splitext(src_path)
-                    avif_path = f"{root}_{size_name}.avif"
-                    webp_path = f"{root}_{size_name}.webp"
-                    if os.path.exists(avif_path) and os.path.exists(webp_path):
-                        continue
-
-                if dry_run:
-                    self.stdout.write(f"Would convert: {image_field.name} → {size_name}")
-                    converted_any = True
-                else:
-                    try:
-                        variants = generate_icon_variants(src_path, size=size)
-                        if variants:
-                            self.stdout.write(
-                                self.style.SUCCESS(f"✓ {image_field.name} → {size_name}")
-                            )
-                            converted_any = True
-                    except Exception as e:
-                        self.stderr.write(
-                            self.style.WARNING(f"✗ {image_field.name}: {e}")
-                        )
-
-            return converted_any
-
-        except Exception as e:
-            self.stderr.write(
-                self.style.ERROR(f"Error processing {image_field.name}: {e}")
-            )
-            return False
+            return
+
+        results = self.run_tasks(_convert_sizes, items, options, describe=lambda r: "→ " + (", ".join(r.value) or "up to date"))
+        total_converted = sum(1 for r in results if r.ok and r.value)
+        self.stdout.write(
+            self.style.SUCCESS(f"Converted {total_converted} of {total_processed} images")
+        )
+        self.write_parallel_summary(results)
+
+    def _specs_to_convert(self, src_path, specs, only_missing):
+        """Sized outputs still to generate for one source file"""
+        if not only_missing:
+            return list(specs)
+        needed = []
+        for spec in specs:
+            # Check if variants already exist
+            if os.path.exists(spec.out_path(src_path, "avif")) and os.path.exists(spec.out_path(src_path, "webp")):
+                continue
+            needed.append(spec)
+        return needed
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from goods.models import ImageAsset
+
+# Apps whose ImageField uploads get AVIF/WebP siblings; apps that are not installed are skipped
+INDEXED_APPS = ("goods", "articles", "reviews", "users")
+
+# <stem>.<fmt>, <stem>_<WxH>.<fmt> and interrupted writes <file>.<pid>.tmp
+_VARIANT_RE = re.compile(r"^(?P<stem>.+?)(?:_\d+x\d+)?\.(?:avif|webp)$")
+_TMP_RE = re.compile(r"^.+\.(?:avif|webp)\.\d+\.tmp$")
+
+
+def _upload_root(field: models.FileField) -> str:
+    """Static directory prefix of upload_to ('reviews/%Y/%m/' -> 'reviews'); '' when callable."""
+    upload_to = field.upload_to
+    if callable(upload_to) or not upload_to:
+        return ""
+    return os.path.normpath(upload_to.split("%", 1)[0] or ".").strip("./")
+
+
+def _image_fields():
+    """Yield (model, field) for every FileField of the indexed apps that are installed."""
+    for label in INDEXED_APPS:
+        if not apps.is_installed(label):
+            continue
+        for model in apps.get_app_config(label).get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, models.FileField):
+                    yield model, field
+
+
+def _human(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.2f}GB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete AVIF/WebP variants whose source image is no longer referenced by any ImageField\n"
+        f"of {', '.join(INDEXED_APPS)}. Only the upload_to directories of those fields are scanned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report what would be deleted")
+        parser.add_argument("--min-age-hours", type=float, default=1.0,
+                            help="Keep files modified more recently than this (default: 1), "
+                                 "so uploads being processed right now are never touched")
+
+    def handle(self, *args, **options):
+        dry_run: bool = options["dry_run"]
+        min_age = options["min_age_hours"] * 3600
+        now = time.time()
+
+        referenced: set[str] = set()
+        roots: set[str] = set()
+        for model, field in _image_fields():
+            names = model._default_manager.exclude(**{field.name: ""}).exclude(**{f"{field.name}__isnull": True})
+            referenced.update(os.path.normpath(n) for n in names.values_list(field.name, flat=True))
+            roots.add(_upload_root(field))
+        skipped = [label for label in INDEXED_APPS if not apps.is_installed(label)]
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Not installed, not indexed: {', '.join(skipped)}"))
+        # Scanning MEDIA_ROOT itself would reach uploads no ImageField describes (e.g. editor images)
+        roots.discard("")
+        referenced_stems = {os.path.splitext(n)[0] for n in referenced}
+        self.stdout.write(f"Indexed {len(referenced)} referenced file(s) under: {', '.join(sorted(roots))}")
+
+        media_root = os.fspath(settings.MEDIA_ROOT)
+        orphans: list[tuple[str, int]] = []
+        kept = 0
+        seen_dirs: set[str] = set()
+        stack = [os.path.join(media_root, r) for r in sorted(roots)]
+        while stack:
+            directory = stack.pop()
+            if directory in seen_dirs:
+                continue
+            seen_dirs.add(directory)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            rel_dir = os.path.relpath(directory, media_root)
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith("."):
+                        stack.append(entry.path)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if now - st.st_mtime < min_age:
+                    continue
+                if _TMP_RE.match(entry.name):
+                    orphans.append((entry.path, st.st_size))
+                    continue
+                m = _VARIANT_RE.match(entry.name)
+                if not m:
+                    continue
+                rel = os.path.normpath(os.path.join(rel_dir, entry.name))
+                stems = {
+                    os.path.normpath(os.path.join(rel_dir, m.group("stem"))),
+                    os.path.splitext(rel)[0],  # e.g. a source named photo_800x600.jpg
+                }
+                if rel in referenced or stems & referenced_stems:
+                    kept += 1
+                else:
+                    orphans.append((entry.path, st.st_size))
+
+        total_bytes = sum(size for _path, size in orphans)
+        by_dir: dict[str, list[int]] = {}
+        for path, size in orphans:
+            stat = by_dir.setdefault(os.path.relpath(os.path.dirname(path), media_root), [0, 0])
+            stat[0] += 1
+            stat[1] += size
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"   {os.path.relpath(path, media_root)} ({_human(size)})")
+        for rel_dir, (count, size) in sorted(by_dir.items()):
+            self.stdout.write(f"{rel_dir}: {count} orphan(s), {_human(size)}")
+
+        # Manifest rows of sources that are gone (variants cascade)
+        stale_assets = ImageAsset.objects.exclude(name__in=referenced).filter(
+            name__regex=r"^(%s)/" % "|".join(re.escape(r) for r in sorted(roots))
+        ) if roots else ImageAsset.objects.none()
+
+        removed, assets = 0, stale_assets.count()
+        if not dry_run:
+            for path, _size in orphans:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as e:
+                    self.stderr.write(self.style.ERROR(f"   ✗ {path}: {e}"))
+            stale_assets.delete()
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(orphans) if dry_run else removed} orphaned variant(s), {_human(total_bytes)}, "
+            f"and {assets} manifest entr(ies); kept {kept} variant(s) of live sources"
+        ))
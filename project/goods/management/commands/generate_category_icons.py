@@ -6,7 +6,9 @@ from django.core.files.storage import default_storage
 from django.conf import settings
 
 from goods.models import Categories
-from common.image_utils import generate_icon_variants
+from goods.manifest import sync_variants
+from common.image_utils import icon_spec
+from common.static_icons import bump_icon_index
 
 
 def _fs_path(name: str) -> str:
@@ -22,6 +24,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--size", default="128x128", help="Size WxH, default 128x128")
         parser.add_argument("--only-missing", action="store_true", help="Skip if both variants already exist")
+        parser.add_argument("--force", action="store_true",
+                            help="Re-encode even if the source and params are unchanged")
         parser.add_argument("--mode", choices=["contain", "cover"], default="contain",
                             help="Resize mode: 'contain' fits inside without cropping, 'cover' crops to fill (default: contain)")
         parser.add_argument("--quality-avif", type=int, default=None,
@@ -55,10 +59,11 @@ class Command(BaseCommand):
                 if os.path.exists(avif) and os.path.exists(webp):
                     continue
             try:
-                generate_icon_variants(src, size=(w, h), mode=mode,
-                                       quality_avif=q_avif, quality_webp=q_webp)
+                spec = icon_spec((w, h), mode=mode, quality_avif=q_avif, quality_webp=q_webp)
+                sync_variants(img.name, src, [spec], force=options["force"])
                 ok += 1
                 self.stdout.write(self.style.SUCCESS(f"OK: {cat.name}"))
             except Exception as e:
                 self.stderr.write(self.style.WARNING(f"Skip {cat.name}: {e}"))
+        bump_icon_index()
         self.stdout.write(self.style.SUCCESS(f"Done. Processed={total}, generated={ok}"))
@@ -4,10 +4,21 @@ from django.conf import settings
 from django.db.models import Q
 
 from goods.models import Products, ProductImage
-from common.image_utils import generate_formats_noresize
+from goods.manifest import sync_variants
+from common.image_utils import VariantSpec
+from common.parallel import ParallelCommandMixin
 
 
-class Command(BaseCommand):
+def _generate_formats(payload) -> dict:
+    """Worker: (name, fs_path, q_avif, q_webp, overwrite) -> {'avif': bool, 'webp': bool}."""
+    name, fs_path, q_avif, q_webp, overwrite = payload
+    spec = VariantSpec(image_type="product", quality_avif=q_avif, quality_webp=q_webp)
+    # Incremental: only outputs whose source or params changed, unless --overwrite
+    created = sync_variants(name, fs_path, [spec], force=overwrite).get("", {})
+    return {"avif": "avif" in created, "webp": "webp" in created}
+
+
+class Command(ParallelCommandMixin, BaseCommand):
     help = (
         "Generate AVIF/WebP next to original product images WITHOUT resizing.\n"
         "Processes main product image, card_image, and gallery images by default.\n"
@@ -66,6 +77,7 @@ class Command(BaseCommand):
             default=None,
             help="Optional comma-separated product IDs to limit processing (e.g., '12,15,21')",
         )
+        self.add_parallel_arguments(parser)
 
     def handle(self, *args, **opts):
         dry = opts["dry_run"]
@@ -95,11 +107,14 @@ class Command(BaseCommand):
         created_webp = 0
         skipped = 0
         errors = 0
+        items = []
+        seen = set()
 
-        def process_path(fs_path: str, origin_label: str):
-            nonlocal total_files, created_avif, created_webp, skipped, errors
-            if not fs_path or not os.path.exists(fs_path):
+        def process_path(name: str, fs_path: str, origin_label: str):
+            nonlocal total_files, skipped
+            if not fs_path or not os.path.exists(fs_path) or fs_path in seen:
                 return
+            seen.add(fs_path)
 
             root, _ = os.path.splitext(fs_path)
             avif_path = f"{root}.avif"
@@ -118,41 +133,30 @@ class Command(BaseCommand):
                 )
                 return
 
-            try:
-                result = generate_formats_noresize(
-                    fs_path,
-                    image_type="product",
-                    quality_avif=q_avif,
-                    quality_webp=q_webp,
-                    overwrite=overwrite,
-                )
-                if result.get("avif"):
-                    created_avif += 1
-                if result.get("webp"):
-                    created_webp += 1
-                self.stdout.write(
-                    f"✅ Done: {origin_label} -> {os.path.basename(fs_path)}"
-                )
-            except Exception as e:
-                errors += 1
-                self.stdout.write(self.style.ERROR(f"❌ Error: {origin_label} -> {fs_path}: {e}"))
+            items.append((f"{origin_label} -> {os.path.basename(fs_path)}", (name, fs_path, q_avif, q_webp, overwrite)))
 
         # Iterate
-        for p in qs.iterator():
+        for p in qs.prefetch_related("images"):
             # main image
             if inc_main and getattr(p, "image", None) and getattr(p.image, "path", None):
-                process_path(p.image.path, f"Product #{p.id} main")
+                process_path(p.image.name, p.image.path, f"Product #{p.id} main")
             # card_image
             if inc_card and getattr(p, "card_image", None) and getattr(p.card_image, "path", None):
-                process_path(p.card_image.path, f"Product #{p.id} card")
+                process_path(p.card_image.name, p.card_image.path, f"Product #{p.id} card")
 
             # gallery images
             if inc_gallery:
-                imgs = getattr(p, "images", None)
-                if imgs is not None:
-                    for gi in imgs.all().iterator():
-                        if getattr(gi, "image", None) and getattr(gi.image, "path", None):
-                            process_path(gi.image.path, f"Product #{p.id} gallery #{gi.id}")
+                for gi in p.images.all():
+                    if getattr(gi, "image", None) and getattr(gi.image, "path", None):
+                        process_path(gi.image.name, gi.image.path, f"Product #{p.id} gallery #{gi.id}")
+
+        results = self.run_tasks(_generate_formats, items, opts)
+        for r in results:
+            if not r.ok:
+                errors += 1
+                continue
+            created_avif += int(r.value["avif"])
+            created_webp += int(r.value["webp"])
 
         # Summary
         self.stdout.write("\n📊 Summary:")
@@ -164,8 +168,11 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"   Errors:            {errors}"))
         else:
             self.stdout.write("   Errors:            0")
+        if results:
+            self.write_parallel_summary(results)
 
         self.stdout.write("\n💡 Tips:")
         self.stdout.write("   • Use --only-missing for idempotent runs on large datasets")
         self.stdout.write("   • Use --ids '1,2,3' to limit to certain products for testing")
         self.stdout.write("   • Combine with --dry-run before real run")
+        self.stdout.write("   • Use --workers N to encode on N cores")
@@ -9,6 +9,7 @@ from django.conf import settings
 from PIL import Image
 
 from common.image_utils import ensure_dir, _fit_box, save_avif, save_webp
+from common.static_icons import bump_icon_index
 
 
 class Command(BaseCommand):
@@ -103,4 +104,6 @@ class Command(BaseCommand):
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f"Error {src}: {e}"))
 
+        # Running servers pick the new files up from the icon index (on their next recheck)
+        bump_icon_index()
         self.stdout.write(self.style.SUCCESS(f"Done. Generated {processed} variants."))
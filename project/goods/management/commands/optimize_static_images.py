@@ -4,9 +4,44 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from PIL import Image
 from common.image_utils import save_avif_optimized, save_webp, ensure_dir
+from common.parallel import ParallelCommandMixin
 
 
-class Command(BaseCommand):
+def _optimize_file(payload) -> dict:
+    """Worker: encode one static image to AVIF + WebP, resizing very large files first."""
+    file_path, avif_path, webp_path, image_type, max_size, chosen_quality = payload
+    resized_to = None
+    with Image.open(file_path) as img:
+        # Preserve transparency where present. Do NOT flatten to white.
+        if img.mode == 'P':
+            # Convert palette images to RGBA to keep alpha
+            img = img.convert('RGBA')
+        # If image has alpha (RGBA/LA), keep it; AVIF/WebP support alpha.
+        # Only convert to RGB when there is no alpha channel.
+        if img.mode not in ('RGB', 'RGBA', 'LA'):
+            img = img.convert('RGB')
+
+        # For very large images, resize first (configurable for backgrounds)
+        if max_size and max(img.size) > max_size:
+            ratio = max_size / max(img.size)
+            resized_to = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+            img = img.resize(resized_to, Image.Resampling.LANCZOS)
+
+        # Save optimized AVIF (internal heuristics will adapt if chosen_quality is None)
+        save_avif_optimized(img, avif_path, image_type=image_type, quality=chosen_quality)
+
+        # Save WebP as fallback
+        # Keep backgrounds crisp enough
+        webp_quality = 82 if image_type == "background" else 80
+        save_webp(img, webp_path, quality=webp_quality)
+
+    return {
+        "resized_to": resized_to,
+        "avif_size": os.path.getsize(avif_path) if os.path.exists(avif_path) else None,
+    }
+
+
+class Command(ParallelCommandMixin, BaseCommand):
     help = "Optimize static images (backgrounds, hero images) with aggressive AVIF compression"
 
     def add_arguments(self, parser):
@@ -54,6 +89,7 @@ class Command(BaseCommand):
             default=2400,
             help='Max longest side for background images (0 disables resize, default: 2400)'
         )
+        self.add_parallel_arguments(parser)
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -90,6 +126,8 @@ class Command(BaseCommand):
         total_processed = 0
         total_size_before = 0
         total_size_after = 0
+        items = []
+        originals = {}
         
         self.stdout.write(f"\n🔍 Scanning for static images to optimize...")
         
@@ -156,65 +194,48 @@ class Command(BaseCommand):
                             total_processed += 1
                             continue
                         
-                        # Open and process image
-                        with Image.open(file_path) as img:
-                            # Preserve transparency where present. Do NOT flatten to white.
-                            if img.mode == 'P':
-                                # Convert palette images to RGBA to keep alpha
-                                img = img.convert('RGBA')
-                            # If image has alpha (RGBA/LA), keep it; AVIF/WebP support alpha.
-                            # Only convert to RGB when there is no alpha channel.
-                            if img.mode not in ('RGB', 'RGBA', 'LA'):
-                                img = img.convert('RGB')
-                            
-                            # For very large images, resize first (configurable for backgrounds)
-                            if is_background:
-                                max_size = int(bg_max_size) if isinstance(bg_max_size, int) else 2400
-                            else:
-                                max_size = 1200
-                            if max_size and max(img.size) > max_size:
-                                ratio = max_size / max(img.size)
-                                new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                                img = img.resize(new_size, Image.Resampling.LANCZOS)
-                                self.stdout.write(f"📏 Resized to {new_size}")
-                            
-                            # Choose quality per type: --bg-quality/--product-quality override, then --quality, else heuristics
-                            chosen_quality = None
-                            if is_background and isinstance(bg_quality, int):
-                                chosen_quality = bg_quality
-                            elif (not is_background) and isinstance(product_quality, int):
-                                chosen_quality = product_quality
-                            elif isinstance(quality, int):
-                                chosen_quality = quality
-
-                            # Save optimized AVIF (internal heuristics will adapt if chosen_quality is None)
-                            save_avif_optimized(img, avif_path, image_type=image_type, quality=chosen_quality)
-                            
-                            # Save WebP as fallback
-                            # Keep backgrounds crisp enough
-                            webp_quality = 82 if is_background else 80
-                            save_webp(img, webp_path, quality=webp_quality)
-                        
-                        # Calculate size after
-                        if os.path.exists(avif_path):
-                            new_size = os.path.getsize(avif_path)
-                            total_size_after += new_size
-                            reduction = ((original_size - new_size) / original_size) * 100
-                            
-                            self.stdout.write(
-                                f"✅ {filename}: {original_size//1024}KB → {new_size//1024}KB "
-                                f"(-{reduction:.1f}%, type: {image_type})"
-                            )
+                        # For very large images, resize first (configurable for backgrounds)
+                        if is_background:
+                            max_size = int(bg_max_size) if isinstance(bg_max_size, int) else 2400
                         else:
-                            total_size_after += original_size
-                            self.stdout.write(f"⚠️  Failed to create AVIF for {filename}")
-                        
-                        total_processed += 1
+                            max_size = 1200
+
+                        # Choose quality per type: --bg-quality/--product-quality override, then --quality, else heuristics
+                        chosen_quality = None
+                        if is_background and isinstance(bg_quality, int):
+                            chosen_quality = bg_quality
+                        elif (not is_background) and isinstance(product_quality, int):
+                            chosen_quality = product_quality
+                        elif isinstance(quality, int):
+                            chosen_quality = quality
+
+                        items.append((file_path, (file_path, avif_path, webp_path, image_type, max_size, chosen_quality)))
+                        originals[file_path] = (original_size, image_type)
                         
                     except Exception as e:
                         self.stdout.write(
                             self.style.ERROR(f"❌ Error processing {file_path}: {e}")
                         )
+
+        def _describe(res):
+            original_size, image_type = originals[res.key]
+            new_size = res.value["avif_size"]
+            resized = f", resized to {res.value['resized_to']}" if res.value["resized_to"] else ""
+            if not new_size:
+                return f"⚠️  AVIF not created{resized}"
+            reduction = ((original_size - new_size) / original_size) * 100
+            return (f"{original_size//1024}KB → {new_size//1024}KB "
+                    f"(-{reduction:.1f}%, type: {image_type}{resized})")
+
+        results = self.run_tasks(_optimize_file, items, options, describe=_describe) if items else []
+        for res in results:
+            original_size, _image_type = originals[res.key]
+            if res.ok and res.value["avif_size"]:
+                total_size_after += res.value["avif_size"]
+            else:
+                total_size_after += original_size
+            if res.ok:
+                total_processed += 1
         
         # Summary
         self.stdout.write(f"\n📊 Summary:")
@@ -233,6 +254,9 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(f"   No images processed")
         
+        if results:
+            self.write_parallel_summary(results)
+
         self.stdout.write(f"\n💡 Tips:")
         self.stdout.write(f"   • Use --quality 8 for even more aggressive compression")
         self.stdout.write(f"   • Background images use quality={quality} by default")
@@ -1,12 +1,34 @@
 import os
 from django.core.management.base import BaseCommand
+from django.apps import apps
 from django.conf import settings
+from django.db.models import Q
 from goods.models import Categories, Products, ProductImage
-from common.image_utils import generate_icon_variants
+from goods.manifest import sync_variants
+from common.image_specs import IMAGE_SPECS, specs_for
+from common.parallel import ParallelCommandMixin
 
 
-class Command(BaseCommand):
-    help = "Regenerate all AVIF files with optimized compression settings"
+def _has_file(field: str) -> Q:
+    """Rows where file field `field` is set."""
+    return Q(**{f"{field}__isnull": False}) & ~Q(**{field: ""})
+
+
+# Registry keys collected by the sections above; the rest are walked generically
+_COLLECTED_ABOVE = {
+    "goods.Categories.image", "goods.Categories.seo_image",
+    "goods.Products.image", "goods.Products.card_image", "goods.ProductImage.image",
+}
+
+
+def _regenerate(payload) -> int:
+    """Worker: (name, src_path, [VariantSpec, ...], force) -> number of sizes re-encoded."""
+    name, src_path, specs, force = payload
+    return len(sync_variants(name, src_path, specs, force=force))
+
+
+class Command(ParallelCommandMixin, BaseCommand):
+    help = "Regenerate all AVIF/WebP variants registered in common.image_specs with optimized compression settings"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,8 +39,9 @@ class Command(BaseCommand):
         parser.add_argument(
             '--force',
             action='store_true',
-            help='Regenerate even if AVIF files already exist',
+            help='Re-encode even variants whose source and params are unchanged',
         )
+        self.add_parallel_arguments(parser)
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -28,113 +51,73 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("DRY RUN MODE - No files will be modified"))
         
         total_processed = 0
-        
+        items = []
+
+        def collect(label, image_name, key):
+            nonlocal total_processed
+            src_path = os.path.join(settings.MEDIA_ROOT, image_name)
+            if not os.path.exists(src_path):
+                return
+            specs = specs_for(key)
+            # Up-to-date outputs are skipped by the manifest (source SHA-256 + params hash)
+            if dry_run:
+                self.stdout.write(f"🔍 Would {'regenerate' if force else 'check'}: {label}")
+            else:
+                items.append((label, (image_name, src_path, specs, force)))
+            total_processed += 1
+
         # Process category icons
-        self.stdout.write("\n🔄 Processing category icons...")
-        categories = Categories.objects.filter(image__isnull=False).exclude(image='')
-        
+        self.stdout.write("\n🔄 Collecting category icons...")
+        categories = Categories.objects.filter(_has_file('image') | _has_file('seo_image'))
         for category in categories:
-            if not category.image or not category.image.name:
-                continue
-                
-            try:
-                src_path = os.path.join(settings.MEDIA_ROOT, category.image.name)
-                if not os.path.exists(src_path):
-                    continue
-                
-                # Check if AVIF already exists
-                root, _ = os.path.splitext(src_path)
-                avif_path = f"{root}_128.avif"
-                
-                if os.path.exists(avif_path) and not force:
-                    self.stdout.write(f"⏭️  Skipping {category.name} - AVIF exists")
-                    continue
-                
-                if dry_run:
-                    self.stdout.write(f"🔍 Would regenerate: {category.name}")
-                else:
-                    generate_icon_variants(src_path, size=(128, 128), image_type="icon")
-                    self.stdout.write(f"✅ Regenerated: {category.name}")
-                
-                total_processed += 1
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"❌ Error processing {category.name}: {e}")
-                )
-        
+            if category.image and category.image.name:
+                collect(category.name, category.image.name, "goods.Categories.image")
+            if category.seo_image and category.seo_image.name:
+                collect(f"{category.name} (SEO)", category.seo_image.name, "goods.Categories.seo_image")
+
         # Process product main images
-        self.stdout.write("\n🔄 Processing product main images...")
-        products = Products.objects.filter(image__isnull=False).exclude(image='')
-        
+        self.stdout.write("\n🔄 Collecting product main images...")
+        products = Products.objects.filter(_has_file('image') | _has_file('card_image'))
         for product in products:
-            if not product.image or not product.image.name:
-                continue
-                
-            try:
-                src_path = os.path.join(settings.MEDIA_ROOT, product.image.name)
-                if not os.path.exists(src_path):
-                    continue
-                
-                # Check if AVIF files already exist
-                root, _ = os.path.splitext(src_path)
-                avif_400_path = f"{root}_400x300.avif"
-                avif_800_path = f"{root}_800x600.avif"
-                
-                if (os.path.exists(avif_400_path) and os.path.exists(avif_800_path) 
-                    and not force):
-                    self.stdout.write(f"⏭️  Skipping {product.name} - AVIF exists")
-                    continue
-                
-                if dry_run:
-                    self.stdout.write(f"🔍 Would regenerate: {product.name}")
-                else:
-                    generate_icon_variants(src_path, size=(400, 300), image_type="product")
-                    generate_icon_variants(src_path, size=(800, 600), image_type="product")
-                    self.stdout.write(f"✅ Regenerated: {product.name}")
-                
-                total_processed += 1
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"❌ Error processing {product.name}: {e}")
-                )
-        
+            if product.image and product.image.name:
+                collect(product.name, product.image.name, "goods.Products.image")
+            if product.card_image and product.card_image.name:
+                collect(f"{product.name} (card)", product.card_image.name, "goods.Products.card_image")
+
         # Process additional product images
-        self.stdout.write("\n🔄 Processing additional product images...")
-        product_images = ProductImage.objects.filter(image__isnull=False).exclude(image='')
-        
+        self.stdout.write("\n🔄 Collecting additional product images...")
+        product_images = (
+            ProductImage.objects.filter(_has_file('image')).select_related('product')
+        )
         for prod_img in product_images:
-            if not prod_img.image or not prod_img.image.name:
+            if prod_img.image and prod_img.image.name:
+                collect(f"Additional image #{prod_img.id} for {prod_img.product.name}",
+                        prod_img.image.name, "goods.ProductImage.image")
+
+        # Every other registered file field (article covers, review screenshots, avatars, ...)
+        self.stdout.write("\n🔄 Collecting other registered images...")
+        for key in IMAGE_SPECS:
+            if key in _COLLECTED_ABOVE:
                 continue
-                
+            app_label, model_name, field_name = key.split(".")
             try:
-                src_path = os.path.join(settings.MEDIA_ROOT, prod_img.image.name)
-                if not os.path.exists(src_path):
-                    continue
-                
-                # Check if AVIF files already exist
-                root, _ = os.path.splitext(src_path)
-                avif_400_path = f"{root}_400x300.avif"
-                avif_800_path = f"{root}_800x600.avif"
-                
-                if (os.path.exists(avif_400_path) and os.path.exists(avif_800_path) 
-                    and not force):
-                    continue
-                
-                if dry_run:
-                    self.stdout.write(f"🔍 Would regenerate: Additional image for {prod_img.product.name}")
-                else:
-                    generate_icon_variants(src_path, size=(400, 300), image_type="product")
-                    generate_icon_variants(src_path, size=(800, 600), image_type="product")
-                    self.stdout.write(f"✅ Regenerated: Additional image for {prod_img.product.name}")
-                
-                total_processed += 1
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"❌ Error processing additional image: {e}")
-                )
+                model = apps.get_model(app_label, model_name)
+                field = model._meta.get_field(field_name)
+            except LookupError:
+                continue  # app not installed
+            except Exception:
+                continue  # not a model field (e.g. images inside an HTML body)
+            if field.get_internal_type() not in ("FileField", "ImageField"):
+                continue
+            for obj in model.objects.filter(_has_file(field_name)).only("pk", field_name):
+                image = getattr(obj, field_name)
+                collect(f"{model_name} #{obj.pk} {field_name}", image.name, key)
+
+        if items:
+            self.stdout.write(f"\n🔄 Regenerating {len(items)} item(s)...")
+            results = self.run_tasks(_regenerate, items, options)
+            self.write_parallel_summary(results)
+            total_processed = sum(1 for r in results if r.ok)
         
         # Summary
         self.stdout.write(f"\n📊 Summary:")
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from goods import image_jobs
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_loop(stop, poll_interval: float, max_attempts: int, once: bool) -> None:
+    """Claim and run jobs until `stop` is set (or the queue is empty with --once)."""
+    # Parent handles Ctrl+C / SIGTERM and tells us via `stop`; finish the current job first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            job = image_jobs.claim_next()
+        except DatabaseError:
+            # Transient DB trouble (restart, lock timeout): back off instead of dying
+            logger.exception("image worker: failed to claim a job")
+            connections.close_all()
+            stop.wait(poll_interval)
+            continue
+        if job is None:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+        image_jobs.run_job(job, max_attempts=max_attempts)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Process the image job queue (orientation fix + AVIF/WebP variants) queued by model signals.\n"
+        "Run it under systemd next to gunicorn; use --workers to encode on several cores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Number of worker processes (default: 1)")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty (default: 2)")
+        parser.add_argument("--max-attempts", type=int, default=image_jobs.DEFAULT_MAX_ATTEMPTS,
+                            help=f"Attempts before a job is marked failed (default: {image_jobs.DEFAULT_MAX_ATTEMPTS})")
+        parser.add_argument("--stale-after", type=int, default=600,
+                            help="Requeue jobs stuck in 'running' longer than N seconds (default: 600)")
+        parser.add_argument("--purge-days", type=int, default=7,
+                            help="Delete finished jobs older than N days, 0 keeps them (default: 7)")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue and exit instead of polling forever")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        poll_interval: float = options["poll_interval"]
+        max_attempts: int = options["max_attempts"]
+        stale_after: int = options["stale_after"]
+        purge_days: int = options["purge_days"]
+        once: bool = options["once"]
+
+        requeued = image_jobs.requeue_stale(stale_after)
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale job(s)"))
+        if purge_days:
+            image_jobs.purge_done(purge_days)
+
+        self.stdout.write(self.style.SUCCESS(f"Image worker started: {workers} process(es)"))
+
+        # Children must not inherit the parent's DB connection
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")
+        stop = ctx.Event()
+        procs = [
+            ctx.Process(target=_worker_loop, args=(stop, poll_interval, max_attempts, once), daemon=False)
+            for _ in range(workers)
+        ]
+
+        def _shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGINT, _shutdown)
+        signal.signal(signal.SIGTERM, _shutdown)
+
+        for p in procs:
+            p.start()
+
+        last_maintenance = time.monotonic()
+        while any(p.is_alive() for p in procs):
+            for p in procs:
+                p.join(timeout=1.0)
+            if not once and not stop.is_set() and time.monotonic() - last_maintenance > stale_after:
+                close_old_connections()
+                image_jobs.requeue_stale(stale_after)
+                last_maintenance = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS("Image worker stopped"))
@@ -0,0 +1,291 @@
+"""
+Image variant manifest.
+
+The image jobs and bulk commands record every AVIF/WebP file they write
+(ImageAsset -> ImageVariant rows), so template tags resolve <picture> sources
+from the database instead of calling storage.exists() per candidate file.
+Querysets load the manifest in bulk with `.with_image_manifest(...)`.
+
+Each variant also stores the SHA-256 of the source it was made from and the
+params hash of its spec; `sync_variants()` re-encodes only outputs whose
+source content or encoder params changed (or whose file is gone).
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import os
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from common.image_utils import VariantSpec, generate_variants, image_focal_point, image_placeholder
+from common.lookup_cache import invalidate_source
+from .models import ImageAsset, ImageVariant, _file_signature
+
+logger = logging.getLogger(__name__)
+
+
+class Variants(dict):
+    """{(size, format): ImageVariant}; size '' is the original canvas (<root>.avif).
+
+    `.asset` is the ImageAsset row: source dimensions and inline placeholder.
+    """
+
+    def __init__(self, asset: ImageAsset):
+        super().__init__(((v.size, v.format), v) for v in asset.variants.all())
+        self.asset = asset
+
+
+def variant_name(source_name: str, size: str, fmt: str) -> str:
+    """Storage name of a variant: <root>_<WxH>.<fmt>, or <root>.<fmt> for the original canvas."""
+    root, _ext = os.path.splitext(source_name)
+    return f"{root}_{size}.{fmt}" if size else f"{root}.{fmt}"
+
+
+def _source_dimensions(path: Optional[str]) -> tuple[int, int]:
+    if not path:
+        return 0, 0
+    try:
+        # Header only, no decode
+        with Image.open(path) as im:
+            return im.size
+    except Exception:
+        return 0, 0
+
+
+def record_variants(source_name: str, result: dict, source_path: Optional[str] = None, *,
+                    source_sha256: str = "", params: Optional[dict] = None) -> Optional[ImageAsset]:
+    """Upsert the manifest for `source_name` from a generate_variants() result.
+
+    `result` is {size_name: {fmt: VariantResult}}. Only files that exist on disk
+    are recorded; rows for other sizes of the same source are left alone.
+    `params` maps (size_name, fmt) to the spec params hash the file was made with;
+    outputs recorded without it are treated as stale by sync_variants().
+    """
+    if not source_name or not result:
+        return None
+    params = params or {}
+    width, height = _source_dimensions(source_path)
+    with transaction.atomic():
+        asset, created = ImageAsset.objects.get_or_create(
+            name=source_name, defaults={"width": width, "height": height}
+        )
+        if not created and width and (asset.width, asset.height) != (width, height):
+            asset.width, asset.height = width, height
+            asset.save(update_fields=["width", "height", "updated_at"])
+        for size, by_format in result.items():
+            for fmt, res in by_format.items():
+                ImageVariant.objects.update_or_create(
+                    asset=asset, size=size, format=fmt,
+                    defaults={
+                        "name": variant_name(source_name, size, fmt),
+                        "file_size": res.bytes,
+                        "width": res.width,
+                        "height": res.height,
+                        "source_sha256": source_sha256,
+                        "params_hash": params.get((size, fmt), ""),
+                    },
+                )
+    invalidate_source(source_name)
+    return asset
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(source_name: str, source_path: str) -> str:
+    """SHA-256 of the original, cached on its ImageAsset by stat signature."""
+    signature = _file_signature(source_path)
+    asset = ImageAsset.objects.filter(name=source_name).only("id", "sha256", "sha256_signature").first()
+    if asset is not None and asset.sha256 and asset.sha256_signature == signature:
+        return asset.sha256
+    sha = _sha256_file(source_path)
+    ImageAsset.objects.update_or_create(name=source_name, defaults={"sha256": sha, "sha256_signature": signature})
+    return sha
+
+
+def stale_specs(source_name: str, source_path: str, specs: Iterable[VariantSpec], sha: str,
+                force: bool = False) -> list[VariantSpec]:
+    """Specs narrowed to the formats that must be (re)encoded.
+
+    An output is current when its manifest row has the same source SHA-256 and
+    params hash and its file still exists.
+    """
+    current = {
+        (v.size, v.format): v
+        for v in ImageVariant.objects.filter(asset__name=source_name)
+    }
+    todo = []
+    for spec in specs:
+        formats = []
+        for fmt in spec.formats:
+            v = current.get((spec.size_name, fmt))
+            up_to_date = (
+                not force and v is not None
+                and v.source_sha256 == sha and v.params_hash == spec.params_hash(fmt)
+                and os.path.exists(spec.out_path(source_path, fmt))
+            )
+            if not up_to_date:
+                formats.append(fmt)
+        if formats:
+            todo.append(dataclasses.replace(spec, formats=tuple(formats)))
+    return todo
+
+
+def sync_variants(source_name: str, source_path: str, specs: Iterable[VariantSpec], force: bool = False) -> dict:
+    """Bring the outputs of `specs` up to date, encoding only stale ones, and record them.
+
+    Returns the generate_variants() result for what was re-encoded ({} when all were current).
+    """
+    if not source_name or not source_path or not os.path.exists(source_path):
+        return {}
+    sha = source_sha256(source_name, source_path)
+    todo = stale_specs(source_name, source_path, specs, sha, force=force)
+    result = {}
+    if todo:
+        focus = None
+        if any(spec.fit == "cover" and spec.size for spec in todo):
+            focus = record_focal_point(source_name, source_path)
+        result = generate_variants(source_path, todo, overwrite=True, focus=focus)
+        params = {(spec.size_name, fmt): spec.params_hash(fmt) for spec in todo for fmt in spec.formats}
+        record_variants(source_name, result, source_path, source_sha256=sha, params=params)
+    if todo or ImageAsset.objects.filter(name=source_name, dominant_color="").exists():
+        record_placeholder(source_name, source_path)
+    return result
+
+
+def record_placeholder(source_name: str, source_path: str) -> None:
+    """Store the dimensions, dominant color and LQIP of the original on its ImageAsset.
+
+    Best effort: a source that cannot be read keeps its previous placeholder.
+    """
+    try:
+        color, lqip = image_placeholder(source_path)
+    except Exception:
+        logger.warning("no placeholder for %s", source_name, exc_info=True)
+        return
+    width, height = _source_dimensions(source_path)
+    ImageAsset.objects.filter(name=source_name).update(
+        width=width, height=height, dominant_color=color, lqip=lqip, updated_at=timezone.now()
+    )
+
+
+def record_focal_point(source_name: str, source_path: str) -> Optional[tuple[float, float]]:
+    """Compute the focal point of the original, store it on its ImageAsset and return it.
+
+    Best effort: None when the source cannot be read (generate_variants() then
+    computes it from its own decode).
+    """
+    try:
+        focus = image_focal_point(source_path)
+    except Exception:
+        logger.warning("no focal point for %s", source_name, exc_info=True)
+        return None
+    ImageAsset.objects.filter(name=source_name).update(focal_x=focus[0], focal_y=focus[1])
+    return focus
+
+
+def forget(source_name: str) -> None:
+    """Drop the manifest of a source (file replaced or deleted)."""
+    ImageAsset.objects.filter(name=source_name).delete()
+    invalidate_source(source_name)
+
+
+def load_assets(names: Iterable[str]) -> dict[str, ImageAsset]:
+    """{name: ImageAsset} for the recorded sources among `names`, variants prefetched (two queries)."""
+    names = {n for n in names if n}
+    if not names:
+        return {}
+    return {asset.name: asset for asset in ImageAsset.objects.filter(name__in=names).prefetch_related("variants")}
+
+
+def _load(names: Iterable[str]) -> dict[str, Variants]:
+    return {name: Variants(asset) for name, asset in load_assets(names).items()}
+
+
+def _walk(obj, path: list[str]):
+    """Yield (instance, field_name) for a dotted field path, following prefetched relations."""
+    if obj is None:
+        return
+    head, rest = path[0], path[1:]
+    if not rest:
+        yield obj, head
+        return
+    related = getattr(obj, head, None)
+    if related is None:
+        return
+    if hasattr(related, "all"):
+        for child in related.all():
+            yield from _walk(child, rest)
+    else:
+        yield from _walk(related, rest)
+
+
+def attach_manifest(objects: Iterable, fields: Iterable[str]) -> None:
+    """Load variants for `fields` of `objects` in one query and store them on each instance."""
+    pairs = []
+    for obj in objects:
+        for field in fields:
+            for inst, attr in _walk(obj, field.split(".")):
+                file = getattr(inst, attr, None)
+                pairs.append((inst, getattr(file, "name", "") or ""))
+    manifest = _load(name for _inst, name in pairs)
+    for inst, name in pairs:
+        if not name:
+            continue
+        cache = inst.__dict__.setdefault("_image_manifest", {})
+        # None = not recorded yet (tags fall back to a storage lookup)
+        cache[name] = manifest.get(name)
+
+
+def ensure_manifest(objects: Iterable, fields: Iterable[str]) -> None:
+    """attach_manifest() for the objects of `objects` that still miss a manifest entry for one of
+    `fields` (e.g. not fetched with with_image_manifest()); a no-op when every entry is cached."""
+    fields = list(fields)
+    missing = []
+    for obj in objects:
+        for field in fields:
+            for inst, attr in _walk(obj, field.split(".")):
+                name = getattr(getattr(inst, attr, None), "name", "") or ""
+                if name and name not in inst.__dict__.get("_image_manifest", {}):
+                    break
+            else:
+                continue
+            missing.append(obj)
+            break
+    if missing:
+        attach_manifest(missing, fields)
+
+
+def asset_for(image_field) -> Optional[ImageAsset]:
+    """ImageAsset of a FieldFile (dimensions, placeholder) from the same manifest lookup as variants_for()."""
+    variants = variants_for(image_field)
+    return variants.asset if variants is not None else None
+
+
+def variants_for(image_field) -> Optional[Variants]:
+    """Recorded variants of a FieldFile, or None when the source is not in the manifest.
+
+    Uses the instance cache filled by with_image_manifest(); otherwise runs one
+    query and memoizes it on the instance.
+    """
+    name = getattr(image_field, "name", "") or ""
+    if not name:
+        return None
+    inst = getattr(image_field, "instance", None)
+    cache = getattr(inst, "_image_manifest", None) if inst is not None else None
+    if cache is not None and name in cache:
+        return cache[name]
+    found = _load([name]).get(name)
+    if inst is not None:
+        inst.__dict__.setdefault("_image_manifest", {})[name] = found
+    return found
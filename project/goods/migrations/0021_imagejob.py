@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0020_alter_products_options_products_sort_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Файл')),
+                ('task', models.CharField(max_length=50, verbose_name='Задача')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Не раньше')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Задача обработки изображения',
+                'verbose_name_plural': 'Очередь обработки изображений',
+                'db_table': 'image_job',
+                'ordering': ('run_after', 'id'),
+                'indexes': [models.Index(fields=['status', 'run_after'], name='image_job_status_14a812_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('source', 'task'), name='image_job_pending_unique'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0021_imagejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='Высота')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Исходное изображение',
+                'verbose_name_plural': 'Исходные изображения',
+                'db_table': 'image_asset',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('format', models.CharField(max_length=10, verbose_name='Формат')),
+                ('size', models.CharField(blank=True, default='', max_length=20, verbose_name='Размер')),
+                ('file_size', models.PositiveIntegerField(default=0, verbose_name='Байт')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='Высота')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='goods.imageasset')),
+            ],
+            options={
+                'verbose_name': 'Вариант изображения',
+                'verbose_name_plural': 'Варианты изображений',
+                'db_table': 'image_variant',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('asset', 'size', 'format'), name='image_variant_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0022_image_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='normalized_signature',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Ориентация проверена'),
+        ),
+    ]
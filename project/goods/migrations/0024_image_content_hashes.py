@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0023_image_asset_normalized_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='sha256_signature',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256 для файла'),
+        ),
+        migrations.AddField(
+            model_name='imagevariant',
+            name='params_hash',
+            field=models.CharField(blank=True, default='', max_length=16, verbose_name='Параметры'),
+        ),
+        migrations.AddField(
+            model_name='imagevariant',
+            name='source_sha256',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256 исходника'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0024_image_content_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='dominant_color',
+            field=models.CharField(blank=True, default='', max_length=7, verbose_name='Основной цвет'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='lqip',
+            field=models.TextField(blank=True, default='', verbose_name='LQIP (data URI)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0025_image_asset_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='focal_x',
+            field=models.FloatField(blank=True, null=True, verbose_name='Фокус X'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='focal_y',
+            field=models.FloatField(blank=True, null=True, verbose_name='Фокус Y'),
+        ),
+    ]
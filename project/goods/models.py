@@ -1,11 +1,45 @@
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from tinymce.models import HTMLField
 from PIL import Image, ImageOps
 import os
 
+from common.mixins import FieldTrackerMixin
+from common.image_utils import ImageTooLarge, check_pixel_budget, draft_for_scale, max_side, side_cap_scale
 
-class Categories(models.Model):
+
+class ImageManifestQuerySet(models.QuerySet):
+    """QuerySet that attaches recorded image variants (ImageAsset/ImageVariant) to fetched rows.
+
+    `Products.objects.with_image_manifest('image', 'card_image', 'images.image')` loads the
+    manifest for every listed file in one extra query, so <picture> tags never stat storage.
+    Dotted names follow prefetched relations ('images.image' -> product.images.all()).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._manifest_fields = ()
+
+    def with_image_manifest(self, *fields):
+        clone = self._chain()
+        clone._manifest_fields = fields
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._manifest_fields = self._manifest_fields
+        return clone
+
+    def _fetch_all(self):
+        fresh = self._result_cache is None
+        super()._fetch_all()
+        if fresh and self._manifest_fields and self._iterable_class is models.query.ModelIterable:
+            from .manifest import attach_manifest
+            attach_manifest(self._result_cache, self._manifest_fields)
+
+
+class Categories(FieldTrackerMixin, models.Model):
     name = models.CharField(max_length=150, unique=True, verbose_name='Название')
     name_ru = models.CharField(max_length=150, unique=False, blank=True, null=True, verbose_name='Название (RU)')
     slug = models.SlugField(max_length=200, unique=True, blank=True, null=True, verbose_name='URL')
@@ -23,6 +57,9 @@ class Categories(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
 
+    objects = ImageManifestQuerySet.as_manager()
+    # Image signals enqueue work only for these fields when they change
+    tracked_fields = ('image', 'seo_image')
 
     class Meta:
         db_table = 'category'
@@ -34,7 +71,7 @@ class Categories(models.Model):
         return self.name
 
 
-class Products(models.Model):
+class Products(FieldTrackerMixin, models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name='Название')
     name_ru = models.CharField(max_length=255, unique=False, blank=True, null=True, verbose_name='Название (RU)')
     slug = models.SlugField(max_length=200, unique=True, blank=True, null=True, verbose_name='URL')
@@ -69,7 +106,8 @@ class Products(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
 
-
+    objects = ImageManifestQuerySet.as_manager()
+    tracked_fields = ('image', 'card_image')
 
     class Meta:
         db_table = 'product'
@@ -102,50 +140,184 @@ class Products(models.Model):
 
         return 0
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Normalize orientation for primary and card images, if present
-        try:
-            if self.image and getattr(self.image, 'path', None):
-                _normalize_image_file_inplace(self.image.path)
-            if self.card_image and getattr(self.card_image, 'path', None):
-                _normalize_image_file_inplace(self.card_image.path)
-        except Exception:
-            # Fail-safe: never block model save due to image processing
-            pass
-
-class ProductImage(models.Model):
+
+class ProductImage(FieldTrackerMixin, models.Model):
     product = models.ForeignKey(Products, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="products/")
     alt_text = models.CharField(max_length=255, blank=True)
 
-def _normalize_image_file_inplace(path: str) -> None:
-    """Open an image by path, auto-fix EXIF orientation, and resave in-place.
-    Keeps original format; for JPEG ensures RGB and uses sane save params.
+    objects = ImageManifestQuerySet.as_manager()
+    tracked_fields = ('image',)
+
+
+class ImageAsset(models.Model):
+    """Source image in media storage; its generated variants hang off it (the variant manifest)."""
+    name = models.CharField(max_length=255, unique=True, verbose_name='Файл')
+    width = models.PositiveIntegerField(default=0, verbose_name='Ширина')
+    height = models.PositiveIntegerField(default=0, verbose_name='Высота')
+    # "<size>:<mtime_ns>" of the original after its EXIF orientation was checked/fixed
+    normalized_signature = models.CharField(max_length=64, blank=True, default='', verbose_name='Ориентация проверена')
+    # Content hash of the original; recomputed only when its stat signature changes
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256')
+    sha256_signature = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256 для файла')
+    # Inline placeholder for <picture> tags (common.image_utils.image_placeholder), refreshed with the variants
+    dominant_color = models.CharField(max_length=7, blank=True, default='', verbose_name='Основной цвет')
+    lqip = models.TextField(blank=True, default='', verbose_name='LQIP (data URI)')
+    # Center of 'cover' crops as a fraction of width/height (common.image_utils.focal_point),
+    # computed when the cover variants are encoded; empty = not computed yet (center)
+    focal_x = models.FloatField(null=True, blank=True, verbose_name='Фокус X')
+    focal_y = models.FloatField(null=True, blank=True, verbose_name='Фокус Y')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        db_table = 'image_asset'
+        verbose_name = 'Исходное изображение'
+        verbose_name_plural = 'Исходные изображения'
+
+    def __str__(self):
+        return self.name
+
+
+class ImageVariant(models.Model):
+    """Generated AVIF/WebP file. size is 'WxH', or '' for the original canvas (<root>.avif)."""
+    asset = models.ForeignKey(ImageAsset, on_delete=models.CASCADE, related_name='variants')
+    name = models.CharField(max_length=255, unique=True, verbose_name='Файл')
+    format = models.CharField(max_length=10, verbose_name='Формат')
+    size = models.CharField(max_length=20, blank=True, default='', verbose_name='Размер')
+    file_size = models.PositiveIntegerField(default=0, verbose_name='Байт')
+    width = models.PositiveIntegerField(default=0, verbose_name='Ширина')
+    height = models.PositiveIntegerField(default=0, verbose_name='Высота')
+    # Made from this source content with these encoder params (VariantSpec.params_hash)
+    source_sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256 исходника')
+    params_hash = models.CharField(max_length=16, blank=True, default='', verbose_name='Параметры')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        db_table = 'image_variant'
+        verbose_name = 'Вариант изображения'
+        verbose_name_plural = 'Варианты изображений'
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'size', 'format'], name='image_variant_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageJob(models.Model):
+    """Queued image processing (orientation fix + AVIF/WebP variants) for a stored file.
+
+    Rows are created by post_save signals and consumed by `manage.py run_image_worker`,
+    so admin saves never wait for encoding.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    source = models.CharField(max_length=255, verbose_name='Файл')
+    task = models.CharField(max_length=50, verbose_name='Задача')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Не раньше')
+    locked_at = models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        db_table = 'image_job'
+        verbose_name = 'Задача обработки изображения'
+        verbose_name_plural = 'Очередь обработки изображений'
+        ordering = ('run_after', 'id')
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            # Dedup: at most one pending job per (file, task); repeated saves collapse into it
+            models.UniqueConstraint(
+                fields=['source', 'task'],
+                condition=models.Q(status='pending'),
+                name='image_job_pending_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task}: {self.source} ({self.status})'
+
+
+# EXIF tag 0x0112; 1 = normal, 2..8 = mirrored/rotated
+EXIF_ORIENTATION = 0x0112
+
+
+def _file_signature(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _needs_exif_transpose(img: Image.Image) -> bool:
+    """Orientation from the file header; pixel data is not decoded."""
+    try:
+        return img.getexif().get(EXIF_ORIENTATION, 1) not in (None, 1)
+    except Exception:
+        return False
+
+
+def _normalize_image_file_inplace(path: str, name: str = '') -> bool:
+    """Auto-fix EXIF orientation and cap the long side (IMAGE_MAX_SIDE) of an image in place.
+    Returns True if the file was rewritten.
+
+    Only files that are rotated/mirrored or too large are decoded and re-saved (JPEG is
+    decoded already reduced); others are left byte-for-byte intact. Raises ImageTooLarge
+    when the file cannot be decoded within IMAGE_MAX_PIXELS. With `name` (storage name)
+    the file's stat signature is remembered on its ImageAsset, so an unchanged original
+    is not even opened again.
     """
     if not path or not os.path.exists(path):
-        return
+        return False
+    asset = ImageAsset.objects.filter(name=name).only('id', 'normalized_signature').first() if name else None
+    if asset is not None and asset.normalized_signature == _file_signature(path):
+        return False
+
+    rewritten = False
     try:
         with Image.open(path) as img:
-            # Auto-rotate according to EXIF and drop the orientation metadata
-            fixed = ImageOps.exif_transpose(img)
-            fmt = (fixed.format or img.format or '').upper()
-            ext = os.path.splitext(path)[1].lower()
-
-            save_kwargs = {}
-            if fmt == 'JPEG' or ext in ('.jpg', '.jpeg'):
-                if fixed.mode in ('RGBA', 'P'):
-                    fixed = fixed.convert('RGB')
-                save_kwargs.update(dict(format='JPEG', quality=85, optimize=True, progressive=True))
-            elif fmt == 'PNG' or ext == '.png':
-                save_kwargs.update(dict(format='PNG', optimize=True))
-            else:
-                # Default: keep format if known, else PNG
-                if fixed.mode == 'RGBA' and ext in ('.jpg', '.jpeg'):
-                    fixed = fixed.convert('RGB')
-                save_kwargs.update(dict(format=fmt or 'PNG'))
-
-            fixed.save(path, **save_kwargs)
+            cap_scale = side_cap_scale(img.size)
+            if _needs_exif_transpose(img) or cap_scale < 1.0:
+                fmt = (img.format or '').upper()
+                draft_for_scale(img, cap_scale)
+                check_pixel_budget(img)
+                # Auto-rotate according to EXIF and drop the orientation metadata
+                fixed = ImageOps.exif_transpose(img)
+                if cap_scale < 1.0:
+                    if fixed.mode == 'P':
+                        fixed = fixed.convert('RGBA')
+                    fixed.thumbnail((max_side(), max_side()), Image.LANCZOS)
+                ext = os.path.splitext(path)[1].lower()
+
+                save_kwargs = {}
+                if img.info.get('icc_profile'):
+                    save_kwargs['icc_profile'] = img.info['icc_profile']
+                if fmt == 'JPEG' or ext in ('.jpg', '.jpeg'):
+                    if fixed.mode in ('RGBA', 'P'):
+                        fixed = fixed.convert('RGB')
+                    save_kwargs.update(dict(format='JPEG', quality=85, optimize=True, progressive=True))
+                elif fmt == 'PNG' or ext == '.png':
+                    save_kwargs.update(dict(format='PNG', optimize=True))
+                else:
+                    save_kwargs.update(dict(format=fmt or 'PNG'))
+
+                fixed.save(path, **save_kwargs)
+                rewritten = True
+    except ImageTooLarge:
+        raise
     except Exception:
         # Silently ignore processing failures
-        return
\ No newline at end of file
+        return False
+
+    if name:
+        ImageAsset.objects.update_or_create(name=name, defaults={'normalized_signature': _file_signature(path)})
+    return rewritten
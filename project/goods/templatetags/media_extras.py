@@ -1,23 +1,157 @@
 from __future__ import annotations
 
-import os
+import functools
+import hashlib
 from typing import Optional
 
 from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
 from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.templatetags.static import static
-from django.contrib.staticfiles import finders
 from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.urls import reverse
+from django.utils import translation
 import logging
 
+from common.image_specs import CARD_SIZES, RESPONSIVE_BREAKPOINTS, is_registered, spec_for_size
+from common.image_utils import AVIF_AVAILABLE
+from common.lookup_cache import media_lookups
+from common.static_icons import has_static_icon, icon_index
+from goods.manifest import asset_for, ensure_manifest, variant_name, variants_for
+
 register = template.Library()
 
 logger = logging.getLogger(__name__)
 
+# Part of every fragment cache key: bump when the markup of a cached tag changes
+FRAGMENT_VERSION = 1
+
+
+def _fragment_timeout() -> int:
+    return int(getattr(settings, "IMAGE_FRAGMENT_CACHE_TIMEOUT", 0) or 0)
+
+
+def _fragment_cache():
+    """(cache, timeout) for rendered <picture> fragments, or (None, 0) when disabled."""
+    timeout = _fragment_timeout()
+    if timeout <= 0:
+        return None, 0
+    try:
+        return caches[getattr(settings, "IMAGE_FRAGMENT_CACHE", "image_fragments")], timeout
+    except Exception:
+        return None, 0
+
+
+@functools.lru_cache(maxsize=None)
+def _fragment_salt() -> str:
+    """Settings the markup depends on besides the tag arguments and the image revision
+    (computed once per process; override_settings() clears it)."""
+    return repr((
+        FRAGMENT_VERSION, settings.MEDIA_URL, settings.STATIC_URL, AVIF_AVAILABLE,
+        getattr(settings, "IMAGE_NEGOTIATED_SRC", False), getattr(settings, "IMAGE_VARIANTS_ON_DEMAND", False),
+        # Hashed static names change with every collectstatic (ManifestStaticFilesStorage)
+        getattr(staticfiles_storage, "manifest_hash", ""),
+    ))
+
+
+@receiver(setting_changed)
+def _reset_fragment_salt(**kwargs):
+    _fragment_salt.cache_clear()
+
+
+def _media_revision(image_field) -> Optional[tuple]:
+    """(name, ImageAsset.updated_at) of a recorded source; None for sources not in the manifest,
+    whose markup depends on storage lookups and is not cached."""
+    variants = variants_for(image_field)
+    if variants is None:
+        return None
+    return image_field.name, variants.asset.updated_at.timestamp()
+
+
+def _cached_fragment(revision_of):
+    """Keep the html of a tag in the fragment cache under (tag, revision_of(obj), arguments).
+
+    `revision_of(obj)` returns whatever the output depends on besides the arguments (image
+    name and revision, default alt), or None when the output must not be cached. The
+    wrapped tag gets `.fragment_key(obj, ...)` and the uncached `.render(obj, ...)` for
+    batch lookups (resolve_pictures).
+    """
+    def decorator(func):
+        def fragment_key(obj, *args, **kwargs) -> Optional[str]:
+            if _fragment_timeout() <= 0:
+                return None
+            revision = revision_of(obj)
+            if revision is None:
+                return None
+            raw = repr((func.__name__, revision, args, sorted(kwargs.items()), _fragment_salt()))
+            return "picture:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+        @functools.wraps(func)
+        def wrapper(obj, *args, **kwargs):
+            key = fragment_key(obj, *args, **kwargs)
+            if key is None:
+                return func(obj, *args, **kwargs)
+            cache, timeout = _fragment_cache()
+            if cache is None:
+                return func(obj, *args, **kwargs)
+            try:
+                html = cache.get(key)
+            except Exception:
+                html = None
+            if html is None:
+                html = func(obj, *args, **kwargs)
+                try:
+                    cache.set(key, str(html), timeout)
+                except Exception:
+                    logger.debug("fragment cache: set failed for %s", func.__name__, exc_info=True)
+            return mark_safe(html)
+
+        wrapper.fragment_key = fragment_key
+        wrapper.render = func
+        return wrapper
+    return decorator
+
+
+def _card_field(product):
+    """Image a product card shows: card_image, else the main image."""
+    return getattr(product, "card_image", None) or getattr(product, "image", None)
+
+
+def _main_field(product):
+    """Main product image, else the first gallery image."""
+    img_field = getattr(product, "image", None)
+    if not img_field or not getattr(img_field, "name", ""):
+        img_field = _first_gallery_image(product)
+    return img_field
+
+
+def _product_revision(field_of):
+    def revision_of(product):
+        img_field = field_of(product)
+        if not img_field or not getattr(img_field, "name", ""):
+            return None
+        revision = _media_revision(img_field)
+        return revision and revision + (getattr(product, "name", ""),)
+    return revision_of
+
+
+def _category_revision(category):
+    img_field = getattr(category, "image", None)
+    if img_field and getattr(img_field, "name", ""):
+        revision = _media_revision(img_field)
+        return revision and revision + (getattr(category, "name", ""),)
+    # Static icon fallback: changes when generate_static_icons bumps the icon index
+    return "static", getattr(category, "slug", ""), icon_index.version, getattr(category, "name", "")
+
 
 @register.simple_tag
+@_cached_fragment(_product_revision(_main_field))
 def product_image_picture(product, size: str = "400x300", classes: str = "", alt: Optional[str] = None,
                          width: int = 400, height: int = 300, loading: str = "lazy", fetchpriority: Optional[str] = None):
     """
@@ -28,16 +162,8 @@ def product_image_picture(product, size: str = "400x300", classes: str = "", alt
     alt_attr = alt or getattr(product, "name", "")
     class_attr = classes or ""
 
-    # Try main product image first
-    img_field = getattr(product, "image", None)
-    if not img_field or not getattr(img_field, "name", ""):
-        # Try first additional image
-        try:
-            images = getattr(product, "images", None)
-            if images and images.exists():
-                img_field = images.first().image
-        except Exception:
-            pass
+    # Try main product image first, then the first additional image
+    img_field = _main_field(product)
 
     if img_field and getattr(img_field, "name", ""):
         try:
@@ -47,16 +173,16 @@ def product_image_picture(product, size: str = "400x300", classes: str = "", alt
 
         if orig_url:
             name = img_field.name
-            avif_name = _variant_name(name, size, "avif")
-            webp_name = _variant_name(name, size, "webp")
-
-            avif_url = _url_if_exists(avif_name)
-            webp_url = _url_if_exists(webp_name)
+            _warn_unregistered(img_field, size, "product_image_picture")
+            negotiated = _negotiated_img(img_field, size, alt_attr, class_attr, width, height, loading, fetchpriority)
+            if negotiated:
+                return negotiated
+            avif_url = _variant_url(img_field, size, "avif")
+            webp_url = _variant_url(img_field, size, "webp")
 
             # Root-level fallbacks without size suffix
-            root, _ext = os.path.splitext(name)
-            root_avif = _url_if_exists(f"{root}.avif")
-            root_webp = _url_if_exists(f"{root}.webp")
+            root_avif = _variant_url(img_field, "", "avif")
+            root_webp = _variant_url(img_field, "", "webp")
 
             if getattr(settings, 'DEBUG', False):
                 logger.debug(
@@ -77,9 +203,10 @@ def product_image_picture(product, size: str = "400x300", classes: str = "", alt
 
             # Fallback <img> src preference
             img_src = webp_url or avif_url or root_webp or root_avif or orig_url
+            width, height = _intrinsic_size(img_field, size, width, height)
             fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
             parts.append(
-                f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+                f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(img_field, size)}>"
             )
             parts.append("</picture>")
             return mark_safe("".join(parts))
@@ -92,12 +219,7 @@ def product_image_picture(product, size: str = "400x300", classes: str = "", alt
     )
 
 
-def _variant_name(orig_name: str, size: str, ext: str) -> str:
-    root, _ext = os.path.splitext(orig_name)
-    return f"{root}_{size}.{ext}"
-
-
-def _url_if_exists(name: str) -> Optional[str]:
+def _storage_url_if_exists(name: str) -> Optional[str]:
     try:
         if default_storage.exists(name):
             return default_storage.url(name)
@@ -105,17 +227,135 @@ def _url_if_exists(name: str) -> Optional[str]:
         return None
     return None
 
+
+def _url_if_exists(name: str) -> Optional[str]:
+    """URL of a media file if it exists, memoized per process (common.lookup_cache)."""
+    return media_lookups.get_or_load(name, lambda: _storage_url_if_exists(name))
+
+
+def _on_demand_url(image_field, size: str, ext: str) -> Optional[str]:
+    """/media/v/ URL for a registered size that is generated on first request (IMAGE_VARIANTS_ON_DEMAND)."""
+    if not size or not getattr(settings, "IMAGE_VARIANTS_ON_DEMAND", False):
+        return None
+    if ext == "avif" and not AVIF_AVAILABLE:
+        return None
+    spec = spec_for_size(size)
+    if spec is None or ext not in spec.formats:
+        return None
+    return reverse("media_variant", args=[variant_name(image_field.name, size, ext)])
+
+
+def _variant_url(image_field, size: str, ext: str) -> Optional[str]:
+    """URL of a generated variant (size '' = <root>.<ext>) taken from the variant manifest.
+    Missing registered sizes go to the on-demand endpoint when it is enabled; sources
+    that were never recorded otherwise fall back to a storage lookup."""
+    variants = variants_for(image_field)
+    variant = variants.get((size, ext)) if variants else None
+    if variant:
+        return default_storage.url(variant.name)
+    on_demand = _on_demand_url(image_field, size, ext)
+    if on_demand or variants is not None:
+        return on_demand
+    return _url_if_exists(variant_name(image_field.name, size, ext))
+
+
+def _served_size(image_field, size: str) -> str:
+    """`size` when a sized variant will be served for it, else '' (original canvas or original file)."""
+    variants = variants_for(image_field)
+    if not size or variants is None:
+        return size
+    if (size, "avif") in variants or (size, "webp") in variants or _on_demand_url(image_field, size, "webp"):
+        return size
+    return ""
+
+
+def _intrinsic_size(image_field, size: str, width: int, height: int) -> tuple[int, int]:
+    """<img> width/height with the aspect ratio of the file actually served: the box of a sized
+    variant, else the recorded source dimensions. The caller's width is kept; without a
+    manifest entry the caller's values are used as they are."""
+    variants = variants_for(image_field)
+    if variants is None or not width:
+        return width, height
+    served = _served_size(image_field, size)
+    if served:
+        w, h = (int(v) for v in served.split("x"))
+    else:
+        w, h = variants.asset.width, variants.asset.height
+    if not w or not h:
+        return width, height
+    return width, max(1, round(int(width) * h / w))
+
+
+def _placeholder_attr(image_field, size: str) -> str:
+    """Inline style painting the recorded dominant color and LQIP behind the <img> until it loads.
+    Empty for transparent sources and letterboxed 'contain' boxes, where it would stay visible."""
+    asset = asset_for(image_field)
+    if asset is None or not asset.lqip:
+        return ""
+    served = _served_size(image_field, size)
+    spec = spec_for_size(served) if served else None
+    if spec is not None and spec.fit == "contain" and asset.width and asset.height:
+        box_ratio = spec.size[0] / spec.size[1]
+        if abs(box_ratio - asset.width / asset.height) > 0.02 * box_ratio:
+            return ""
+    return f' style="background:{asset.dominant_color} url({asset.lqip}) center/cover no-repeat"'
+
+
+def _negotiated_url(image_field, size: str) -> Optional[str]:
+    """/media/n/ URL for `size` ('' = original canvas) when IMAGE_NEGOTIATED_SRC is on and the manifest
+    has an AVIF/WebP of that size to choose from. ?v= changes whenever the variants are re-encoded."""
+    if not getattr(settings, "IMAGE_NEGOTIATED_SRC", False):
+        return None
+    variants = variants_for(image_field)
+    if not variants or not any((size, fmt) in variants for fmt in ("avif", "webp")):
+        return None
+    url = reverse("media_negotiated", args=[size or "o", image_field.name])
+    return f"{url}?v={int(variants.asset.updated_at.timestamp())}"
+
+
+def _negotiated_img(image_field, size: str, alt: str, classes: str, width, height,
+                    loading: str, fetchpriority: Optional[str]) -> Optional[str]:
+    """Single <img> served by media_negotiated (size first, then the original canvas), or None."""
+    for candidate in (size, ""):
+        src = _negotiated_url(image_field, candidate)
+        if src:
+            width, height = _intrinsic_size(image_field, candidate, width, height)
+            fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
+            return mark_safe(
+                f"<img src=\"{src}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(image_field, candidate)}>"
+            )
+    return None
+
+
+def _first_gallery_image(product):
+    """First ProductImage.image of a product, using prefetch_related('images') when present
+    (otherwise one query, memoized on the instance)."""
+    try:
+        prefetched = getattr(product, "_prefetched_objects_cache", {}).get("images")
+        if prefetched is not None:
+            first = min(prefetched, key=lambda pi: pi.pk, default=None)
+        elif "_first_gallery_image" in product.__dict__:
+            first = product.__dict__["_first_gallery_image"]
+        else:
+            images = getattr(product, "images", None)
+            first = images.first() if images is not None else None
+            product.__dict__["_first_gallery_image"] = first
+    except Exception:
+        return None
+    return first.image if first else None
+
+
 def _orig_url_safe(image_field) -> Optional[str]:
     try:
         return image_field.url
     except Exception:
         return None
 
-def _best_variant_urls(name: str, size: str):
+
+def _best_variant_urls(image_field, size: str):
     """Return tuple (avif_url, webp_url) if those sized variants exist."""
-    avif_name = _variant_name(name, size, "avif")
-    webp_name = _variant_name(name, size, "webp")
-    return _url_if_exists(avif_name), _url_if_exists(webp_name)
+    return _variant_url(image_field, size, "avif"), _variant_url(image_field, size, "webp")
+
 
 def _append_sources_for_breakpoint(parts, media_query: str, avif_url: Optional[str], webp_url: Optional[str]):
     if avif_url:
@@ -124,17 +364,46 @@ def _append_sources_for_breakpoint(parts, media_query: str, avif_url: Optional[s
         parts.append(f'<source media="{media_query}" srcset="{webp_url}" type="image/webp">')
 
 
+def _warn_unregistered(image_field, size: str, tag: str) -> None:
+    """Sizes are generated from common.image_specs; a size missing there never exists on disk."""
+    if getattr(settings, 'DEBUG', False) and size and not is_registered(image_field, size):
+        logger.warning("%s: size %s is not registered for %s in common.image_specs",
+                       tag, size, getattr(image_field, "name", ""))
+
+
+def _responsive_sources(parts, image_field) -> Optional[str]:
+    """Append <source> tags for RESPONSIVE_BREAKPOINTS (widest first, last one without media).
+    Returns the <img> src: the default breakpoint, else the next one up, else root-level variants."""
+    fallbacks = []
+    for media_query, (w, h) in RESPONSIVE_BREAKPOINTS:
+        avif, webp = _best_variant_urls(image_field, f"{w}x{h}")
+        if media_query:
+            _append_sources_for_breakpoint(parts, media_query, avif, webp)
+        else:
+            if avif:
+                parts.append(f'<source srcset="{avif}" type="image/avif">')
+            if webp:
+                parts.append(f'<source srcset="{webp}" type="image/webp">')
+        fallbacks.append(webp or avif)
+    img_src = next((url for url in reversed(fallbacks[-2:]) if url), None)
+    if not img_src:
+        # Root-level variants without size suffix
+        img_src = _variant_url(image_field, "", "webp") or _variant_url(image_field, "", "avif")
+    return img_src
+
+
 @register.simple_tag
+@_cached_fragment(_product_revision(_card_field))
 def product_card_picture(product, classes: str = "tm-card-img", alt: Optional[str] = None,
                          loading: str = "lazy", fetchpriority: Optional[str] = None):
     """
     Render a <picture> for product card (bestsellers). Prefers product.card_image if provided,
-    otherwise falls back to product.image. Uses size 230x160 for >=768px and 200x160 for default.
+    otherwise falls back to product.image. Uses CARD_SIZES: 230x160 for >=768px and 200x160 for default.
     """
     alt_attr = alt or getattr(product, "name", "")
     class_attr = classes or "tm-card-img"
 
-    img_field = getattr(product, "card_image", None) or getattr(product, "image", None)
+    img_field = _card_field(product)
     if not img_field or not getattr(img_field, "name", ""):
         fallback = static("deps/images/placeholder.png")
         fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
@@ -142,13 +411,21 @@ def product_card_picture(product, classes: str = "tm-card-img", alt: Optional[st
             f"<img src=\"{fallback}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"230\" height=\"160\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
         )
 
-    name = img_field.name
+    (dw, dh), (mw, mh) = CARD_SIZES
+    # One <img>: the browser picks the canvas by width, /media/n/ picks the format
+    negotiated_m = _negotiated_url(img_field, f"{mw}x{mh}")
+    negotiated_d = _negotiated_url(img_field, f"{dw}x{dh}")
+    if negotiated_m and negotiated_d:
+        fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
+        return mark_safe(
+            f"<img src=\"{negotiated_m}\" srcset=\"{negotiated_m} {mw}w, {negotiated_d} {dw}w\" "
+            f"sizes=\"(min-width: 768px) {dw}px, {mw}px\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{mw}\" height=\"{mh}\" "
+            f"loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(img_field, f'{mw}x{mh}')}>"
+        )
     # Desktop
-    avif_230 = _url_if_exists(_variant_name(name, "230x160", "avif"))
-    webp_230 = _url_if_exists(_variant_name(name, "230x160", "webp"))
+    avif_230, webp_230 = _best_variant_urls(img_field, f"{dw}x{dh}")
     # Mobile/default
-    avif_200 = _url_if_exists(_variant_name(name, "200x160", "avif"))
-    webp_200 = _url_if_exists(_variant_name(name, "200x160", "webp"))
+    avif_200, webp_200 = _best_variant_urls(img_field, f"{mw}x{mh}")
 
     parts = ["<picture>"]
     # >=768px first (will be ignored on smaller viewports)
@@ -165,20 +442,103 @@ def product_card_picture(product, classes: str = "tm-card-img", alt: Optional[st
     except Exception:
         orig_url = None
     img_src = webp_200 or avif_200 or webp_230 or avif_230 or orig_url or static("deps/images/placeholder.png")
+    # Dimensions of the file in src: the mobile canvas, the desktop one, else the original's aspect
+    src_box = (mw, mh) if (webp_200 or avif_200) else (dw, dh)
+    src_size = f"{src_box[0]}x{src_box[1]}"
+    width, height = _intrinsic_size(img_field, src_size, *src_box)
     fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
     parts.append(
-        f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"230\" height=\"160\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+        f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(img_field, src_size)}>"
     )
     parts.append("</picture>")
     return mark_safe("".join(parts))
 
 
+# resolve_pictures kinds: image fields each tag reads (dotted names follow prefetched relations)
+_PICTURE_FIELDS = {
+    "card": ("image", "card_image"),
+    "image": ("image", "images.image"),
+}
+
+
+@register.simple_tag
+def resolve_pictures(products, kind: str = "card", size: str = "400x300", classes: str = "",
+                     width: int = 400, height: int = 300, eager: int = 0):
+    """
+    Resolve the pictures of a whole product list in one pass; returns {product.pk: <picture> html}.
+    Usage:
+      {% resolve_pictures goods 'card' eager=3 as pics %}
+      {% for product in goods %}{{ pics|picture_for:product }}{% endfor %}
+
+    kind 'card' renders product_card_picture, 'image' renders product_image_picture at
+    `size`/`width`/`height`. Gallery images come from prefetch_related('images') (fetched in one
+    query when the list has no prefetch) and the variant manifest of products not loaded
+    with_image_manifest() is fetched in one query, so the per-card tags make no queries;
+    fragments already in the fragment cache come back in one get_many().
+    The first `eager` pictures load eagerly; alt is the product name in the active language.
+    """
+    fields = _PICTURE_FIELDS.get(kind)
+    if fields is None:
+        raise template.TemplateSyntaxError(f"resolve_pictures: unknown kind {kind!r} (card, image)")
+    products = [p for p in (products or []) if p is not None]
+    if not products:
+        return {}
+    if any("." in f for f in fields):
+        prefetch_related_objects(products, "images")
+    ensure_manifest(products, fields)
+
+    use_ru = (translation.get_language() or "")[:2] == "ru"
+    tag = product_card_picture if kind == "card" else product_image_picture
+    calls = []
+    for index, product in enumerate(products):
+        alt = (use_ru and getattr(product, "name_ru", "")) or getattr(product, "name", "")
+        loading = "eager" if index < eager else "lazy"
+        if kind == "card":
+            args = (classes or "tm-card-img", alt, loading)
+        else:
+            args = (size, classes, alt, width, height, loading)
+        calls.append((product, args, tag.fragment_key(product, *args)))
+
+    # One cache round trip for the cached fragments of the whole list
+    cache, timeout = _fragment_cache()
+    keys = [key for _p, _a, key in calls if key] if cache is not None else []
+    try:
+        cached = cache.get_many(keys) if keys else {}
+    except Exception:
+        cached = {}
+    pictures, fresh = {}, {}
+    for product, args, key in calls:
+        html = cached.get(key) if key else None
+        if html is None:
+            html = tag.render(product, *args)
+            if key and cache is not None:
+                fresh[key] = str(html)
+        pictures[product.pk] = mark_safe(html)
+    if fresh:
+        try:
+            cache.set_many(fresh, timeout)
+        except Exception:
+            logger.debug("fragment cache: set_many failed", exc_info=True)
+    return pictures
+
+
+@register.filter
+def picture_for(pictures, product):
+    """The resolve_pictures() html of `product`; empty when it was not in the resolved list."""
+    try:
+        return pictures.get(product.pk, "")
+    except AttributeError:
+        return ""
+
+
 @register.simple_tag
+@_cached_fragment(_product_revision(_main_field))
 def responsive_product_picture(product, classes: str = "", alt: Optional[str] = None,
                                width: int = 800, height: int = 600,
                                loading: str = "lazy", fetchpriority: Optional[str] = None):
     """
-    Responsive <picture> for product main image with media breakpoints:
+    Responsive <picture> for product main image with media breakpoints
+    (common.image_specs.RESPONSIVE_BREAKPOINTS):
       - (min-width: 1200px): 1200x900
       - (min-width: 992px): 1024x768
       - (min-width: 768px): 800x600
@@ -187,15 +547,7 @@ def responsive_product_picture(product, classes: str = "", alt: Optional[str] =
     alt_attr = alt or getattr(product, "name", "")
     class_attr = classes or ""
 
-    img_field = getattr(product, "image", None)
-    if not img_field or not getattr(img_field, "name", ""):
-        try:
-            images = getattr(product, "images", None)
-            if images and images.exists():
-                img_field = images.first().image
-        except Exception:
-            pass
-
+    img_field = _main_field(product)
     if not img_field or not getattr(img_field, "name", ""):
         fallback = static("deps/images/placeholder.png")
         fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
@@ -203,41 +555,16 @@ def responsive_product_picture(product, classes: str = "", alt: Optional[str] =
             f"<img src=\"{fallback}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
         )
 
-    name = img_field.name
     orig = _orig_url_safe(img_field)
 
     parts = ["<picture>"]
-    # Desktop XL
-    avif, webp = _best_variant_urls(name, "1200x900")
-    _append_sources_for_breakpoint(parts, "(min-width: 1200px)", avif, webp)
-    # Desktop
-    avif, webp = _best_variant_urls(name, "1024x768")
-    _append_sources_for_breakpoint(parts, "(min-width: 992px)", avif, webp)
-    # Tablet
-    avif, webp = _best_variant_urls(name, "800x600")
-    _append_sources_for_breakpoint(parts, "(min-width: 768px)", avif, webp)
-    # Mobile default
-    avif_m, webp_m = _best_variant_urls(name, "640x480")
-    if avif_m:
-        parts.append(f'<source srcset="{avif_m}" type="image/avif">')
-    if webp_m:
-        parts.append(f'<source srcset="{webp_m}" type="image/webp">')
-
-    # Fallback img src preference, with extra root-level fallback (<root>.webp/.avif)
-    img_src = webp_m or avif_m
-    if not img_src:
-        avif_s, webp_s = _best_variant_urls(name, "800x600")
-        img_src = webp_s or avif_s
-    if not img_src:
-        # Try root-level variants without size suffix
-        root, _ext = os.path.splitext(name)
-        root_avif = _url_if_exists(f"{root}.avif")
-        root_webp = _url_if_exists(f"{root}.webp")
-        img_src = root_webp or root_avif or orig or static("deps/images/placeholder.png")
+    img_src = _responsive_sources(parts, img_field) or orig or static("deps/images/placeholder.png")
+    default_size = "x".join(map(str, RESPONSIVE_BREAKPOINTS[-1][1]))
+    width, height = _intrinsic_size(img_field, default_size, width, height)
 
     fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
     parts.append(
-        f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+        f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(img_field, default_size)}>"
     )
     parts.append("</picture>")
     return mark_safe("".join(parts))
@@ -258,11 +585,9 @@ def category_best_img_src(category, size: str = "128x128") -> Optional[str]:
         except Exception:
             orig_url = None
 
-        name = img_field.name
-        avif_name = _variant_name(name, size, "avif")
-        webp_name = _variant_name(name, size, "webp")
-        webp_url = _url_if_exists(webp_name)
-        avif_url = _url_if_exists(avif_name)
+        _warn_unregistered(img_field, size, "category_best_img_src")
+        webp_url = _variant_url(img_field, size, "webp")
+        avif_url = _variant_url(img_field, size, "avif")
         # Prefer modern src for <img>
         return webp_url or avif_url or orig_url
 
@@ -280,13 +605,14 @@ def category_best_img_src(category, size: str = "128x128") -> Optional[str]:
 
         # Prefer WebP -> AVIF -> PNG (for src attribute compatibility and weight)
         for path in (static_webp_sized, static_avif_sized, static_webp, static_avif, static_png):
-            if finders.find(path):
+            if has_static_icon(path):
                 return static(path)
 
     return None
 
 
 @register.simple_tag
+@_cached_fragment(_category_revision)
 def category_icon_picture(category, size: str = "128x128", classes: str = "", alt: Optional[str] = None,
                           width: int = 128, height: int = 128, loading: str = "lazy", fetchpriority: Optional[str] = None):
     """
@@ -308,11 +634,12 @@ def category_icon_picture(category, size: str = "128x128", classes: str = "", al
                 orig_url = None
 
         name = img_field.name
-        avif_name = _variant_name(name, size, "avif")
-        webp_name = _variant_name(name, size, "webp")
-
-        avif_url = _url_if_exists(avif_name)
-        webp_url = _url_if_exists(webp_name)
+        _warn_unregistered(img_field, size, "category_icon_picture")
+        negotiated = _negotiated_img(img_field, size, alt_attr, class_attr, width, height, loading, fetchpriority)
+        if negotiated:
+            return negotiated
+        avif_url = _variant_url(img_field, size, "avif")
+        webp_url = _variant_url(img_field, size, "webp")
 
         if getattr(settings, 'DEBUG', False):
             logger.debug("category_icon_picture: name=%s size=%s avif=%s webp=%s orig=%s", name, size, bool(avif_url), bool(webp_url), bool(orig_url))
@@ -325,9 +652,10 @@ def category_icon_picture(category, size: str = "128x128", classes: str = "", al
         # Prefer modern fallback in <img>: webp -> avif -> original
         if orig_url or webp_url or avif_url:
             img_src = webp_url or avif_url or orig_url
+            width, height = _intrinsic_size(img_field, size, width, height)
             fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
             parts.append(
-                f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+                f"<img src=\"{img_src}\" alt=\"{alt_attr}\" class=\"{class_attr}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(img_field, size)}>"
             )
         parts.append("</picture>")
         return mark_safe("".join(parts))
@@ -343,15 +671,17 @@ def category_icon_picture(category, size: str = "128x128", classes: str = "", al
         static_avif = f"{static_base}.avif"
         static_webp = f"{static_base}.webp"
         static_png = f"{static_base}.png"
-        
+
         # Check for sized variants first, then fallback to non-sized
-        has_avif = bool(finders.find(static_avif_sized)) or bool(finders.find(static_avif))
-        has_webp = bool(finders.find(static_webp_sized)) or bool(finders.find(static_webp))
-        has_png = bool(finders.find(static_png))
-        
+        has_avif_sized = has_static_icon(static_avif_sized)
+        has_webp_sized = has_static_icon(static_webp_sized)
+        has_avif = has_avif_sized or has_static_icon(static_avif)
+        has_webp = has_webp_sized or has_static_icon(static_webp)
+        has_png = has_static_icon(static_png)
+
         # Use the actual found files
-        final_avif = static_avif_sized if finders.find(static_avif_sized) else static_avif
-        final_webp = static_webp_sized if finders.find(static_webp_sized) else static_webp
+        final_avif = static_avif_sized if has_avif_sized else static_avif
+        final_webp = static_webp_sized if has_webp_sized else static_webp
         if has_avif or has_webp or has_png:
             parts = ["<picture>"]
             if has_avif:
@@ -395,11 +725,12 @@ def field_image_picture(image_field, size: str = "400x300", classes: str = "", a
         orig_url = None
 
     name = image_field.name
-    avif_name = _variant_name(name, size, "avif")
-    webp_name = _variant_name(name, size, "webp")
-
-    avif_url = _url_if_exists(avif_name)
-    webp_url = _url_if_exists(webp_name)
+    _warn_unregistered(image_field, size, "field_image_picture")
+    negotiated = _negotiated_img(image_field, size, alt, classes, width, height, loading, fetchpriority)
+    if negotiated:
+        return negotiated
+    avif_url = _variant_url(image_field, size, "avif")
+    webp_url = _variant_url(image_field, size, "webp")
 
     if getattr(settings, 'DEBUG', False):
         logger.debug("field_image_picture: name=%s size=%s avif=%s webp=%s orig=%s", name, size, bool(avif_url), bool(webp_url), bool(orig_url))
@@ -411,13 +742,29 @@ def field_image_picture(image_field, size: str = "400x300", classes: str = "", a
         parts.append(f"<source srcset=\"{webp_url}\" type=\"image/webp\">")
     fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
     img_src = webp_url or avif_url or orig_url or static("deps/images/placeholder.png")
+    width, height = _intrinsic_size(image_field, size, width, height)
     parts.append(
-        f"<img src=\"{img_src}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+        f"<img src=\"{img_src}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(image_field, size)}>"
     )
     parts.append("</picture>")
     return mark_safe("".join(parts))
 
 
+@register.simple_tag
+def field_best_img_src(image_field, size: str = "") -> Optional[str]:
+    """
+    Single best URL of an ImageField for places that take one src (lightbox, preload):
+    WebP -> AVIF -> original. size '' is the no-resize (capped original) output.
+    Usage:
+      <div data-full="{% field_best_img_src r.image %}">
+    """
+    if not image_field or not getattr(image_field, "name", ""):
+        return None
+    if size:
+        _warn_unregistered(image_field, size, "field_best_img_src")
+    return _variant_url(image_field, size, "webp") or _variant_url(image_field, size, "avif") or _orig_url_safe(image_field)
+
+
 @register.simple_tag
 def responsive_field_picture(image_field, classes: str = "", alt: str = "",
                               width: int = 800, height: int = 600,
@@ -432,29 +779,14 @@ def responsive_field_picture(image_field, classes: str = "", alt: str = "",
             f"<img src=\"{fallback}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
         )
 
-    name = image_field.name
     orig = _orig_url_safe(image_field)
     parts = ["<picture>"]
-    avif, webp = _best_variant_urls(name, "1200x900"); _append_sources_for_breakpoint(parts, "(min-width: 1200px)", avif, webp)
-    avif, webp = _best_variant_urls(name, "1024x768"); _append_sources_for_breakpoint(parts, "(min-width: 992px)", avif, webp)
-    avif, webp = _best_variant_urls(name, "800x600");  _append_sources_for_breakpoint(parts, "(min-width: 768px)", avif, webp)
-    avif_m, webp_m = _best_variant_urls(name, "640x480")
-    if avif_m: parts.append(f'<source srcset="{avif_m}" type="image/avif">')
-    if webp_m: parts.append(f'<source srcset="{webp_m}" type="image/webp">')
-
-    # Fallback with root-level variants
-    img_src = webp_m or avif_m
-    if not img_src:
-        avif_s, webp_s = _best_variant_urls(name, "800x600")
-        img_src = webp_s or avif_s
-    if not img_src:
-        root, _ext = os.path.splitext(name)
-        root_avif = _url_if_exists(f"{root}.avif")
-        root_webp = _url_if_exists(f"{root}.webp")
-        img_src = root_webp or root_avif or orig or static("deps/images/placeholder.png")
+    img_src = _responsive_sources(parts, image_field) or orig or static("deps/images/placeholder.png")
+    default_size = "x".join(map(str, RESPONSIVE_BREAKPOINTS[-1][1]))
+    width, height = _intrinsic_size(image_field, default_size, width, height)
     fp_attr = f" fetchpriority=\"{fetchpriority}\"" if fetchpriority else ""
     parts.append(
-        f"<img src=\"{img_src}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}>"
+        f"<img src=\"{img_src}\" alt=\"{alt}\" class=\"{classes}\" width=\"{width}\" height=\"{height}\" loading=\"{loading}\" decoding=\"async\"{fp_attr}{_placeholder_attr(image_field, default_size)}>"
     )
     parts.append("</picture>")
     return mark_safe("".join(parts))
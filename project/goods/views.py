@@ -1,10 +1,20 @@
-from django.http import Http404, HttpResponsePermanentRedirect
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponsePermanentRedirect
 from django.shortcuts import render, get_object_or_404
 from django.utils.translation import get_language
 from django.views.generic import DetailView, ListView
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_safe
 
+from .image_jobs import _fs_path, ensure_variant
+from .manifest import load_assets
 from .models import Products, Categories
 from .utils import q_search
 from django.core.cache import cache
@@ -20,8 +30,13 @@ class CatalogView(ListView):
     slug_url_kwarg = "category_slug"
 
     def get_queryset(self):
-        # Base queryset with prefetch of related images to avoid N+1 in templates
-        base_qs = Products.objects.all().prefetch_related('images')
+        # Base queryset with prefetch of related images to avoid N+1 in templates;
+        # the variant manifest lets <picture> tags skip storage lookups
+        base_qs = (
+            Products.objects.all()
+            .prefetch_related('images')
+            .with_image_manifest('image', 'card_image', 'images.image')
+        )
 
         category_slug = self.kwargs.get(self.slug_url_kwarg)
         species = (self.request.GET.get("species") or "").strip().lower()
@@ -36,7 +51,7 @@ class CatalogView(ListView):
         if query:
             goods = q_search(query)
             try:
-                goods = goods.prefetch_related('images')
+                goods = goods.prefetch_related('images').with_image_manifest('image', 'card_image', 'images.image')
             except AttributeError:
                 goods = base_qs.none()
         else:
@@ -66,7 +81,7 @@ class CatalogView(ListView):
         # Cache categories list to avoid repeated DB hits
         categories = cache.get('categories_ordered')
         if categories is None:
-            categories = Categories.objects.order_by('sort_order', 'name')
+            categories = Categories.objects.order_by('sort_order', 'name').with_image_manifest('image')
             cache.set('categories_ordered', categories, 1800)  # 30 minutes
         context["categories"] = categories
         context['current_category'] = self.kwargs.get(self.slug_url_kwarg, 'all')
@@ -74,7 +89,9 @@ class CatalogView(ListView):
         current_slug = context['current_category']
         context['current_category_obj'] = None
         if current_slug:
-            context['current_category_obj'] = Categories.objects.filter(slug=current_slug).first()
+            context['current_category_obj'] = (
+                Categories.objects.filter(slug=current_slug).with_image_manifest('image', 'seo_image').first()
+            )
 
         # Expose active species in context (default to cubensis for 'sporovi-vidbitki')
         species = (self.request.GET.get("species") or "").strip().lower()
@@ -140,7 +157,12 @@ class ProductView(DetailView):
     slug_url_kwarg = "product_slug"
 
     def get_queryset(self):
-        return super().get_queryset().prefetch_related('images').select_related('category')
+        return (
+            super().get_queryset()
+            .prefetch_related('images')
+            .select_related('category')
+            .with_image_manifest('image', 'images.image')
+        )
 
     def get_object(self, queryset=None):
         """
@@ -186,6 +208,7 @@ class ProductView(DetailView):
             Products.objects
             .filter(category=product.category)
             .exclude(pk=product.pk)
+            .with_image_manifest('image')
             .order_by('?')[:10]
         )
 
@@ -247,3 +270,92 @@ class CategoriesView(ListView):
         context["title"] = "Все категории"
         context["categories"] = Categories.objects.order_by('sort_order', 'name')
         return context
+
+
+logger = logging.getLogger(__name__)
+
+# Variant names are derived from immutable upload names; regeneration keeps quality, not content
+VARIANT_MAX_AGE = 60 * 60 * 24 * 30
+
+
+def _serve_media(name: str, path: str, content_type: str) -> HttpResponse:
+    accel_prefix = getattr(settings, "IMAGE_VARIANTS_ACCEL_PREFIX", "")
+    if accel_prefix:
+        # nginx serves the file from its internal location
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + name
+        return response
+    return FileResponse(open(path, "rb"), content_type=content_type)
+
+
+@require_safe
+def media_variant(request, name):
+    """Serve /media/v/<root>_<WxH>.<avif|webp>, generating the variant on first request."""
+    try:
+        path = ensure_variant(name)
+    except Exception:
+        logger.exception("media_variant: failed to generate %s", name)
+        path = None
+    if path is None:
+        raise Http404()
+
+    content_type = "image/avif" if path.endswith(".avif") else "image/webp"
+    response = _serve_media(name, path, content_type)
+    patch_cache_control(response, public=True, max_age=VARIANT_MAX_AGE)
+    return response
+
+
+# /media/n/ URLs carry ?v=<asset revision> (media_extras), so one URL never changes content
+NEGOTIATED_MAX_AGE = 60 * 60 * 24 * 365
+
+# Variant formats in order of preference, with the type the browser must list in Accept
+NEGOTIATED_FORMATS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+_NEGOTIATED_SIZE_RE = re.compile(r"^(o|\d{1,4}x\d{1,4})$")
+
+
+def _accepted_types(accept: str) -> set:
+    """Media types listed in an Accept header with q > 0. Wildcards do not count:
+    browsers send image/* without supporting every image format."""
+    accepted = set()
+    for item in accept.split(","):
+        mime, *params = [p.strip() for p in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if mime and q > 0:
+            accepted.add(mime.lower())
+    return accepted
+
+
+@require_safe
+def media_negotiated(request, size, name):
+    """Serve /media/n/<WxH|o>/<source name>: the AVIF or WebP variant of that size ('o' = original
+    canvas) that the Accept header allows, else the original file. Only manifest entries are served."""
+    if not _NEGOTIATED_SIZE_RE.match(size):
+        raise Http404()
+    asset = load_assets([name]).get(name)
+    if asset is None:
+        raise Http404()
+    size = "" if size == "o" else size
+    variants = {(v.size, v.format): v for v in asset.variants.all()}
+    accepted = _accepted_types(request.headers.get("Accept", ""))
+
+    served_name, content_type = name, mimetypes.guess_type(name)[0] or "application/octet-stream"
+    for fmt, mime in NEGOTIATED_FORMATS:
+        variant = variants.get((size, fmt))
+        if variant is not None and mime in accepted:
+            served_name, content_type = variant.name, mime
+            break
+    path = _fs_path(served_name)
+    if not os.path.isfile(path):
+        raise Http404()
+
+    response = _serve_media(served_name, path, content_type)
+    patch_cache_control(response, public=True, max_age=NEGOTIATED_MAX_AGE, immutable=True)
+    patch_vary_headers(response, ("Accept",))
+    return response
@@ -17,11 +17,16 @@ class HomeView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Categories.objects.order_by('sort_order', 'name')
-        context['bestsellers'] = Products.objects.filter(is_bestseller=True).order_by('name')
+        context['categories'] = Categories.objects.order_by('sort_order', 'name').with_image_manifest('image')
+        context['bestsellers'] = (
+            Products.objects.filter(is_bestseller=True).order_by('name')
+            .with_image_manifest('image', 'card_image')
+        )
         # Unique offer products for homepage slider
         context['unique_products'] = (
             Products.objects.filter(is_unique=True).order_by('-updated_at', '-id')
+            .prefetch_related('images')
+            .with_image_manifest('image', 'images.image')
         )
         return context
 
@@ -5,3 +5,7 @@ class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
     verbose_name = 'Отзывы'
+
+    def ready(self):
+        # Import signals to ensure post_save handlers are registered
+        from . import signals  # noqa: F401
@@ -1,7 +1,10 @@
 from django.db import models
 
+from common.mixins import FieldTrackerMixin
+from goods.models import ImageManifestQuerySet
 
-class Review(models.Model):
+
+class Review(FieldTrackerMixin, models.Model):
     image = models.ImageField(upload_to='reviews/%Y/%m/', verbose_name='Изображение')
     alt_text = models.CharField(max_length=255, verbose_name='Alt текст')
     title = models.CharField(max_length=255, blank=True, verbose_name='Заголовок')
@@ -9,6 +12,10 @@ class Review(models.Model):
     sort_order = models.PositiveIntegerField(default=0, db_index=True, verbose_name='Порядок')
     is_active = models.BooleanField(default=True, db_index=True, verbose_name='Активен')
 
+    objects = ImageManifestQuerySet.as_manager()
+    # Image signals enqueue work only when the screenshot changes
+    tracked_fields = ('image',)
+
     class Meta:
         db_table = 'review'
         verbose_name = 'Отзыв'
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from goods.image_jobs import enqueue
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+def reviews_generate_image_variants(sender, instance: Review, created=False, **kwargs):
+    """On review save, queue the screenshot downscale and AVIF/WebP generation (original canvas, card)."""
+    if created or instance.has_changed("image"):
+        enqueue(instance.image.name if instance.image else "", "review_image")
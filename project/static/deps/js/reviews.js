@@ -25,7 +25,9 @@
 
   root.querySelectorAll('.review-img').forEach(img => {
     img.style.cursor = 'zoom-in';
-    img.addEventListener('click', () => showModal(img.currentSrc || img.src, img.alt));
+    // The card shows a 480x640 crop; the lightbox opens the full screenshot
+    const media = img.closest('.review-media');
+    img.addEventListener('click', () => showModal((media && media.dataset.full) || img.currentSrc || img.src, img.alt));
   });
 
   if (modalClose) modalClose.addEventListener('click', hideModal);
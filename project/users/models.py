@@ -1,11 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from common.mixins import FieldTrackerMixin
 
-class User(AbstractUser):
+
+class User(FieldTrackerMixin, AbstractUser):
     image = models.ImageField(upload_to='users_images', blank=True, null=True, verbose_name='Аватар')
     phone_number = models.CharField(max_length=10, blank=True, null=True)
 
+    # Image signals enqueue work only when the avatar changes (not on every login)
+    tracked_fields = ('image',)
+
     class Meta:
         db_table = 'user'
         verbose_name = 'Пользователя'
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from goods.image_jobs import enqueue
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def users_generate_avatar_variants(sender, instance: User, created=False, **kwargs):
+    """On user save, queue the avatar crop when the avatar was set or replaced.
+    Logins (last_login) and profile edits without a new avatar cost no image work."""
+    if created or instance.has_changed("image"):
+        enqueue(instance.image.name if instance.image else "", "user_avatar")